@@ -1,31 +1,51 @@
 # dashboard ui
 from __future__ import annotations
 
+import threading
+import time
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import AbstractSet, Callable, List, Optional, Tuple
 
+from rich.text import Text
 from textual.app import App, ComposeResult
 from textual.containers import Grid, Horizontal, Vertical
 from textual.reactive import reactive
-from textual.widgets import Footer, Header, Static
-
-from config import CHARACTERS
-from helpers import heat_color, heat_tags, sparkline
-from models import DashboardStats, compute_stats
+from textual.widgets import Footer, Header, Input, Static
+
+from backends import compute_stats
+from config import STOPWORDS
+from daemon import DaemonClient
+from follow import LiveBoard
+from helpers import clamp, heat_color, sparkline
+from models import DashboardStats
+from palette import div, heat_bar, join_lines, spans, style
+from progressive import ProgressiveScan
 from render import (
-    div,
+    HEATMAP_ZOOMS,
+    estimate_mark,
+    heatmap_columns,
+    margin_text,
     render_cooc_heatmap,
     render_entropy_panel,
     render_meta_panel,
     render_mood_panel,
+    render_signal_panel,
     render_top_squads,
     render_top_trios,
+    sample_mark,
 )
-from widgets import Ticker
+from search import PostingsView, parse_query, run_query, window_texts
+from settings import LiveSettings, apply_settings, changed_parts
+from store import StoreSync
+from timeline import GRANULARITIES
+from widgets import ArticleView, Ticker
+from workspace import Workspace
 
 
 class ImaginationInsider(App):
     TITLE = "imagination insider"
+    # dont let the (hidden) search box grab keys on startup
+    AUTO_FOCUS = None
 
     # styles for the layout
     CSS = """
@@ -38,26 +58,106 @@ class ImaginationInsider(App):
     #layout { height: 1fr; } #bottom { height: 14; }
     #left { width: 36; } #center { width: 1fr; } #right { width: 52; }
     #center_grid { grid-size: 2; grid-gutter: 1 1; height: auto; }
+    #center_signal { height: auto; margin-top: 1; }
+    #search { display: none; height: 3; border: tall rgba(210, 200, 255, 0.22); background: #0b0b1c; }
     """
 
     BINDINGS = [
         ("q", "quit", "quit"),
         ("r", "refresh", "refresh"),
+        ("c", "next_campaign", "campaign"),
+        ("slash", "open_search", "search"),
+        ("escape", "close_search", "close search"),
+        ("pagedown", "articles_page(1)", "older"),
+        ("pageup", "articles_page(-1)", "newer"),
+        ("home", "articles_jump(0)", "newest"),
+        ("end", "articles_jump(1)", "oldest"),
+        ("w", "heatmap_pan(-1, 0)", "heatmap up"),
+        ("s", "heatmap_pan(1, 0)", "heatmap down"),
+        ("a", "heatmap_pan(0, -1)", "heatmap left"),
+        ("d", "heatmap_pan(0, 1)", "heatmap right"),
+        ("plus,equals_sign", "heatmap_zoom(1)", "zoom in"),
+        ("minus", "heatmap_zoom(-1)", "zoom out"),
+        ("comma", "window_shift(-1)", "earlier"),
+        ("full_stop", "window_shift(1)", "later"),
+        ("left_square_bracket", "window_resize(-1)", "narrower"),
+        ("right_square_bracket", "window_resize(1)", "wider"),
+        ("g", "trend_granularity", "trend by"),
         ("up", "move_up", "up"),
         ("down", "move_down", "down"),
         ("k", "move_up", "up"),
         ("j", "move_down", "down"),
     ]
 
-    folder: Path
+    folder: Optional[Path]
     stats: DashboardStats
     selected: reactive[str] = reactive("")
 
-    def __init__(self, folder: Path, **kwargs):
+    def __init__(
+        self,
+        folder: Optional[Path] = None,
+        loader: Optional[Callable[[], DashboardStats]] = None,
+        stats: Optional[DashboardStats] = None,
+        workspace: Optional[Workspace] = None,
+        settings: Optional[LiveSettings] = None,
+        progressive: Optional[Callable[[], ProgressiveScan]] = None,
+        follow: Optional[Callable[[], LiveBoard]] = None,
+        attached: Optional[DaemonClient] = None,
+        store: Optional[StoreSync] = None,
+        **kwargs,
+    ):
         super().__init__(**kwargs)
         self.folder = folder
-        self.stats = compute_stats(folder)
+        # loader is how refresh gets new stats (folder scan by default, merged partials etc otherwise)
+        if loader is None:
+            loader = lambda: compute_stats(folder)
+        self.loader = loader
+        # workspace mode: stats come from background scans instead of the loader
+        self.workspace = workspace
+        # config file that gets re-read while running (roster + word lists)
+        self.settings = settings
+        # what the last settings change had to do that you'd want to know about (logs read from disk again)
+        self.settings_note = ""
+        # approximate mode: makes a background scan that sends estimates until it has every file (on start and on r)
+        self.progressive = progressive
+        self._scan: Optional[ProgressiveScan] = None
+        # follow mode: makes a board with one growing log kept live (on start, on r and on config changes)
+        self.follow = follow
+        self.live: Optional[LiveBoard] = None
+        self.follow_error = ""
+        # a worker is reading the followed file, the next tick waits for it
+        self._follow_busy = False
+        # daemon mode: the board lives in a daemon process, this just maps whichever snapshot it says is current
+        self.attached = attached
+        self.attached_error = ""
+        # --store: totals and ties come out of the sqlite store once it has caught up with the board on screen
+        self.store = store
+        self.campaign = ""
+        if workspace is not None:
+            self.campaign = workspace.campaigns[0].name
+            stats = workspace.stats_for(self.campaign)
+        if follow is not None:
+            self.live = follow()
+            stats = self.live.stats
+        self.stats = stats if stats is not None else self.loader()
+        self._ui_thread = threading.get_ident()
         self.selected = self._pick_default_selected()
+        self.search_text = ""
+        # articles panel is a window over every matching line, this is where the window starts
+        self.articles_offset = 0
+        self._articles_total = 0
+        self._article_view: Optional[PostingsView] = None
+        # session window and width the panels below the heatmap were last built for (they dont depend on the
+        # selection, so moving around doesnt rebuild them), None = build them on the next render
+        self._panels_key: Optional[Tuple[Tuple[int, int], int]] = None
+        # heatmap viewport (the roster can be way bigger than the panel)
+        self.heat_row = 0
+        self.heat_col = 0
+        self.heat_zoom = len(HEATMAP_ZOOMS) - 1
+        # time scrubber: a window of sessions (end=None follows the newest one) and how the trend is bucketed
+        self.window_end: Optional[int] = None
+        self.window_size = 10
+        self.trend_grain = 0
         self.top: Static
         self.ticker: Ticker
         self.hotspots: Static
@@ -69,12 +169,12 @@ class ImaginationInsider(App):
         self.center_squads: Static
         self.right_box: Static
         self.controls: Static
-        self.articles: Static
+        self.articles: ArticleView
 
     def _pick_default_selected(self) -> str:
         # pick the character with most mentions
         if not self.stats.totals:
-            return CHARACTERS[0].name
+            return ""
         best = max(self.stats.totals.items(), key=lambda kv: kv[1])
         return best[0]
 
@@ -108,22 +208,147 @@ class ImaginationInsider(App):
                     yield self.center_trios
                     self.center_squads = Static(classes="dim")
                     yield self.center_squads
+                self.center_signal = Static(classes="dim", id="center_signal")
+                yield self.center_signal
             with Vertical(id="right", classes="panel"):
                 yield Static("[ intel ]", classes="tag")
                 self.right_box = Static(classes="dim")
                 yield self.right_box
                 yield Static("")
                 yield Static("[ controls ]", classes="tag")
-                self.controls = Static("character: up/down (j/k)\nr refresh  q quit", classes="dim")
+                controls = "character: up/down (j/k)\ntime window: , . move  [ ] size  g trend by\nr refresh  q quit"
+                if self.workspace is not None:
+                    controls = controls + "  c campaign"
+                self.controls = Static(controls, classes="dim")
                 yield self.controls
 
         with Vertical(id="bottom", classes="panel"):
             yield Static("[ articles ]", classes="tag")
-            self.articles = Static(classes="dim")
+            self.search_box = Input(placeholder="zephyr AND kal mentioning blade   (enter to search, esc to close)", id="search")
+            yield self.search_box
+            self.articles = ArticleView(classes="dim")
             yield self.articles
         yield Footer()
 
     def on_mount(self) -> None:
+        self._render_all()
+        # panel widths are only known once the layout ran
+        self.call_after_refresh(self._render_center)
+        if self.settings is not None:
+            self.set_interval(1.0, self._poll_settings)
+        if self.workspace is not None:
+            self.workspace.scan_all(self._on_campaign_scanned)
+        if self.progressive is not None:
+            self._start_scan()
+        if self.live is not None:
+            self.set_interval(1.0, self._poll_follow)
+        if self.attached is not None:
+            self.set_interval(1.0, self._poll_attached)
+
+    def on_resize(self) -> None:
+        self.call_after_refresh(self._render_center)
+
+    def on_unmount(self) -> None:
+        if self.workspace is not None:
+            self.workspace.shutdown()
+        if self._scan is not None:
+            self._scan.stop()
+        if self.attached is not None:
+            self.attached.close()
+        if self.store is not None:
+            self.store.close()
+
+    def _start_scan(self) -> None:
+        # drop whatever approximate scan was running and start over
+        if self._scan is not None:
+            self._scan.stop()
+        scan = self.progressive()
+        self._scan = scan
+        scan.start(lambda stats: self._on_estimate(scan, stats))
+        self._render_topbar()
+
+    def _on_estimate(self, scan: ProgressiveScan, stats: Optional[DashboardStats]) -> None:
+        # called from the scan thread, hop back onto the ui thread
+        if threading.get_ident() == self._ui_thread:
+            self._estimate_ready(scan, stats)
+            return
+        if not self.is_running:
+            # the app is closing (or closed), nothing left to show it on
+            scan.stop()
+            return
+        try:
+            self.call_from_thread(self._estimate_ready, scan, stats)
+        except RuntimeError:
+            # closed between the check and the call
+            scan.stop()
+
+    def _estimate_ready(self, scan: ProgressiveScan, stats: Optional[DashboardStats]) -> None:
+        if scan is not self._scan:
+            # a scan we already replaced, its numbers are stale
+            return
+        if stats is None:
+            self._render_topbar()
+            return
+        if stats.estimate is None and self.store is not None:
+            # the exact board, estimates never go in the store
+            self.store.submit(stats)
+        self._show_stats(stats)
+
+    def _poll_follow(self) -> None:
+        # only what got appended since the last poll is read, on a worker so a slow disk doesnt freeze the ui.
+        # parsing it stays here, it patches the record the panels are reading
+        if self._follow_busy:
+            return
+        self._follow_busy = True
+        live = self.live
+        threading.Thread(target=self._fetch_follow, args=(live,), name="insider-follow", daemon=True).start()
+
+    def _fetch_follow(self, live: LiveBoard) -> None:
+        data = None
+        error = ""
+        try:
+            data = live.fetch()
+        except OSError as exc:
+            error = str(exc)
+        try:
+            self.call_from_thread(self._follow_fetched, live, data, error)
+        except RuntimeError:
+            # the app already closed
+            pass
+
+    def _follow_fetched(self, live: LiveBoard, data: Optional[bytes], error: str) -> None:
+        self._follow_busy = False
+        if live is not self.live:
+            # r or a config change made a new board meanwhile, this read was for the old one
+            return
+        if error:
+            if error != self.follow_error:
+                self.follow_error = error
+                self._render_topbar()
+            return
+        if self.follow_error:
+            self.follow_error = ""
+            self._render_topbar()
+        if data is not None:
+            live.apply(data)
+            self._show_stats(live.stats)
+
+    def _poll_attached(self) -> None:
+        # one tiny request, the snapshot only gets mapped when the daemon has a new one
+        try:
+            stats = self.attached.poll()
+        except (OSError, ValueError) as exc:
+            if str(exc) != self.attached_error:
+                self.attached_error = str(exc)
+                self._render_topbar()
+            return
+        if self.attached_error:
+            self.attached_error = ""
+            self._render_topbar()
+        if stats is not None:
+            self._show_stats(stats)
+
+    def _render_all(self) -> None:
         self._render_topbar()
         self._render_ticker()
         self._render_hotspots()
@@ -131,36 +356,196 @@ class ImaginationInsider(App):
         self._render_center()
         self._render_articles()
 
+    def _on_campaign_scanned(self, name: str) -> None:
+        # called from the scan pool, hop back onto the ui thread
+        if threading.get_ident() == self._ui_thread:
+            self._campaign_ready(name)
+        else:
+            self.call_from_thread(self._campaign_ready, name)
+
+    def _campaign_ready(self, name: str) -> None:
+        if name == self.campaign:
+            self._show_stats(self.workspace.stats_for(name))
+        else:
+            self._render_topbar()
+
+    def _show_stats(self, stats: DashboardStats) -> None:
+        # re-pick the selection if it vanished or we were only showing an empty placeholder
+        was_empty = not any(self.stats.totals.values())
+        self.stats = stats
+        self._panels_key = None
+        if was_empty or self.selected not in self.stats.totals:
+            self.selected = self._pick_default_selected()
+        self._render_all()
+
+    def _poll_settings(self) -> None:
+        error = self.settings.error
+        old = self.settings.poll()
+        if self.settings.error != error:
+            self._render_topbar()
+        if old is None:
+            return
+        new = self.settings.current
+        parts = changed_parts(old, new)
+        self.settings_note = ""
+        # logs whose text wasnt kept (cache hits) get read again to re-score them
+        reread: List[str] = []
+        if self.workspace is not None:
+            # campaigns keep their own rosters from workspace.json, only the word lists apply
+            parts.discard("roster")
+            self.workspace.set_wordlists(new.words)
+            if "cooc" in parts or "aliases" in parts:
+                self.workspace.scan_all(self._on_campaign_scanned)
+                self._render_topbar()
+                return
+            for name, stats in list(self.workspace.stats.items()):
+                patched = apply_settings(stats, parts, new.words, self.workspace.campaign(name).characters, reread)
+                if patched is None:
+                    # a log that cant be read again, that campaign gets scanned over
+                    self.workspace.scan(name, self._on_campaign_scanned)
+                    continue
+                self.workspace.replace_stats(name, stats, patched)
+            self._note_reread(reread)
+            self._show_stats(self.workspace.stats_for(self.campaign))
+            return
+        if self.live is not None:
+            # the followed log's text isnt kept around to re-score, read everything again with the new settings
+            self.live = self.follow()
+            self._show_stats(self.live.stats)
+            return
+        patched = apply_settings(self.stats, parts, new.words, list(new.characters), reread)
+        if self.progressive is not None and (patched is None or self.stats.estimate is not None):
+            # approximate mode: start over with the new settings instead of one long blocking load
+            self._start_scan()
+            return
+        if patched is None:
+            patched = self.loader()
+        else:
+            self._note_reread(reread)
+            if self.store is not None:
+                self.store.submit(patched)
+        self._show_stats(patched)
+
+    def _note_reread(self, reread: List[str]) -> None:
+        if reread:
+            self.settings_note = f"re-read {len(reread)} {'log' if len(reread) == 1 else 'logs'} from disk to re-score"
+
+    def _stopwords(self) -> AbstractSet[str]:
+        if self.settings is not None:
+            return self.settings.current.words.stop
+        return STOPWORDS
+
     def _avg_tension(self) -> int:
         if not self.stats.per_file:
             return 0
         return int(round(sum(fs.tension for fs in self.stats.per_file) / len(self.stats.per_file)))
 
+    def _sorted_totals(self) -> List[Tuple[str, int]]:
+        # biggest first (ties keep roster order), the store's numbers when it has this board
+        totals = self.store.totals(self.stats) if self.store is not None else None
+        if totals is None:
+            totals = self.stats.totals
+        return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+
     def _ties_for(self, who: str, limit: int = 6) -> List[Tuple[str, int]]:
-        ties: Dict[str, int] = {}
-        for (a, b), w in self.stats.cooc.items():
-            if a == who:
-                ties[b] = ties.get(b, 0) + w
-            elif b == who:
-                ties[a] = ties.get(a, 0) + w
-        return sorted(ties.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+        # same order as the store query: biggest first, then by name
+        found = self.store.ties(self.stats, who, limit) if self.store is not None else None
+        if found is not None:
+            return found
+        ties = self.stats.neighbors.get(who, {})
+        return sorted(ties.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
 
     def _top_pairs(self, limit: int = 6) -> List[Tuple[str, str, int]]:
+        found = self.store.top_pairs(self.stats, limit) if self.store is not None else None
+        if found is not None:
+            return found
         items = [(*k, v) for k, v in self.stats.cooc.items()]
-        items.sort(key=lambda t: t[2], reverse=True)
+        items.sort(key=lambda t: (-t[2], t[0], t[1]))
         return items[:limit]
 
+    def _variants_for(self, who: str, limit: int = 4) -> List[Tuple[str, int]]:
+        # misspellings fuzzy matching counted as this character, most common first
+        counts = self.stats.variants.get(who, {})
+        return sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+
     def _top_keywords_for(self, who: str, limit: int = 10) -> List[Tuple[str, int]]:
-        counts = self.stats.keywords.get(who, {})
-        out = sorted(counts.items(), key=lambda kv: kv[1], reverse=True)
-        char_names = {c.name for c in CHARACTERS}
-        return [(w, n) for (w, n) in out if w not in char_names][:limit]
+        # the words that set them apart (not just the ones everybody says a lot), character names left out
+        return [(word, count) for word, count, _ in self.stats.terms.distinctive(who, limit)]
 
     def _render_topbar(self) -> None:
-        self.top.update("[b]imagination insider[/b] | made with love (and hate) by jax")
+        bar = spans(("imagination insider", "bold"), " | made with love (and hate) by jax")
+        if self.workspace is not None:
+            names = [campaign.name for campaign in self.workspace.campaigns]
+            idx = names.index(self.campaign) + 1
+            bar.append(" | campaign ")
+            bar.append(self.campaign, style("#9fe7ff"))
+            bar.append(f" ({idx}/{len(names)})")
+            if self.campaign in self.workspace.errors:
+                bar.append(f" error: {self.workspace.errors[self.campaign]}", style("#ffb3c1"))
+            elif self.workspace.is_scanning(self.campaign):
+                bar.append(" scanning...", style("#ffd6a5"))
+            busy = sum(1 for name in names if self.workspace.is_scanning(name))
+            if busy:
+                bar.append(f" ({busy} scanning)", style("#6f7398"))
+        if self.attached is not None:
+            status = self.attached.status
+            bar.append(" | ")
+            bar.append("attached", style("#9fe7ff"))
+            bar.append(f" to daemon ({status.get('files', 0)} files, {status.get('viewers', 0)} viewers)", style("#6f7398"))
+            if self.attached_error:
+                bar.append(f" daemon: {self.attached_error}", style("#ffb3c1"))
+            elif status.get("error"):
+                bar.append(f" daemon scan: {status['error']}", style("#ffb3c1"))
+            if status.get("config_error"):
+                bar.append(f" daemon config: {status['config_error']}", style("#ffb3c1"))
+        elif self.stats.snapshot is not None:
+            bar.append(" | snapshot ")
+            bar.append(self.stats.snapshot.path.name, style("#9fe7ff"))
+            bar.append(" (read-only)", style("#6f7398"))
+        estimate = self.stats.estimate
+        if self._scan is not None and self._scan.error:
+            bar.append(f" scan error: {self._scan.error}", style("#ffb3c1"))
+        elif estimate is not None:
+            bar.append(" | ")
+            bar.append("estimating", style("#ffd6a5"))
+            bar.append(f" {estimate.files_done}/{estimate.files_total} files ({estimate.fraction * 100:.0f}%)")
+        elif self._scan is not None and not self._scan.finished:
+            bar.append(" | ")
+            bar.append("estimating...", style("#ffd6a5"))
+        if self.stats.duplicates:
+            shown = set(fs.source for fs in self.stats.per_file)
+            left_out = sum(1 for duplicate in self.stats.duplicates if duplicate.source not in shown)
+            counted = len(self.stats.duplicates) - left_out
+            bar.append(" | ")
+            if left_out:
+                bar.append(f"{left_out} {'copy' if left_out == 1 else 'copies'}", style("#ffd6a5"))
+                bar.append(" left out", style("#6f7398"))
+            if counted:
+                if left_out:
+                    bar.append(", ", style("#6f7398"))
+                bar.append(f"{counted} {'copy' if counted == 1 else 'copies'}", style("#ffd6a5"))
+                bar.append(" counted anyway", style("#6f7398"))
+        if self.live is not None:
+            follower = self.live.follower
+            note = f"({follower.stats.lines} lines"
+            if follower.resyncs:
+                note = note + f", re-read {follower.resyncs}x"
+            bar.append(" | ")
+            bar.append("following", style("#9fe7ff"))
+            bar.append(f" {follower.path.name} ")
+            bar.append(note + ")", style("#6f7398"))
+            if self.follow_error:
+                bar.append(f" follow: {self.follow_error}", style("#ffb3c1"))
+        if self.store is not None and self.store.error:
+            bar.append(f" store: {self.store.error}", style("#ffb3c1"))
+        if self.settings is not None and self.settings.error:
+            bar.append(f" config: {self.settings.error}", style("#ffb3c1"))
+        elif self.settings_note:
+            bar.append(f" config: {self.settings_note}", style("#6f7398"))
+        self.top.update(bar)
 
     def _render_ticker(self) -> None:
-        totals_sorted = sorted(self.stats.totals.items(), key=lambda kv: kv[1], reverse=True)
+        totals_sorted = self._sorted_totals()
         top = [f"{k}:{v}" for k, v in totals_sorted[:6]]
 
         files = [f"ingested {fs.filename}" for fs in self.stats.per_file[-3:]]
@@ -168,32 +553,81 @@ class ImaginationInsider(App):
 
     def _render_hotspots(self) -> None:
         # character list with heat bars
-        totals_sorted = sorted(self.stats.totals.items(), key=lambda kv: kv[1], reverse=True)
+        totals_sorted = self._sorted_totals()
         max_count = totals_sorted[0][1] if totals_sorted else 0
         lines = []
         for i, (name, count) in enumerate(totals_sorted, start=1):
             if name == self.selected:
-                prefix = "[#e9ecff]›[/]"
+                prefix = ("›", "#e9ecff")
             else:
                 prefix = " "
-            tags = heat_tags(count, max_count, width=14)
-            lines.append(f"{prefix} {i:>2}. {name:<12}  {tags}  [#cbb7ff]{count}[/]")
-        self.hotspots.update("\n".join(lines) if lines else "[#6f7398]no data[/]")
+            bar = heat_bar(count, max_count, width=14)
+            if self.stats.estimate is not None:
+                margin = margin_text(self.stats.estimate.margins.get(name, float("inf")))
+                lines.append(spans(prefix, f" {i:>2}. {name:<12}  ", bar, "  ", (f"~{count}", "#ffd6a5"), " ", (margin, "#6f7398")))
+                continue
+            lines.append(spans(prefix, f" {i:>2}. {name:<12}  ", bar, "  ", (str(count), "#cbb7ff")))
+        self.hotspots.update(join_lines(lines) if lines else Text("no data", style("#6f7398")))
+
+    def _heatmap_names(self) -> List[str]:
+        totals_sorted = self._sorted_totals()
+        return [name for name, _ in totals_sorted]
+
+    def _heatmap_follow_selected(self) -> None:
+        # scroll just enough that the selected character stays on screen
+        names = self._heatmap_names()
+        if self.selected not in names:
+            return
+        idx = names.index(self.selected)
+        cols = heatmap_columns(self.center_matrix.size.width or 80, self.heat_zoom)
+        if idx < self.heat_row:
+            self.heat_row = idx
+        elif idx >= self.heat_row + 12:
+            self.heat_row = idx - 11
+        if idx < self.heat_col:
+            self.heat_col = idx
+        elif idx >= self.heat_col + cols:
+            self.heat_col = idx - cols + 1
 
     def _render_center(self) -> None:
-        totals_sorted = sorted(self.stats.totals.items(), key=lambda kv: kv[1], reverse=True)
-        top_names = [name for name, _ in totals_sorted[:12]]
+        names = self._heatmap_names()
         w = self.center_matrix.size.width or 80
-        self.center_matrix.update(render_cooc_heatmap(cooc=self.stats.cooc, names=top_names, selected=self.selected, max_width=w))
-        self.center_entropy.update(render_entropy_panel(self.stats))
+        cols = heatmap_columns(w, self.heat_zoom)
+        self.heat_row = clamp(self.heat_row, 0, max(0, len(names) - 12))
+        self.heat_col = clamp(self.heat_col, 0, max(0, len(names) - cols))
+        matrix = render_cooc_heatmap(
+            neighbors=self.stats.neighbors,
+            names=names,
+            selected=self.selected,
+            max_width=w,
+            max_rows=12,
+            row_offset=self.heat_row,
+            col_offset=self.heat_col,
+            zoom=self.heat_zoom,
+        )
+        if self.stats.estimate is not None:
+            matrix = join_lines([matrix, spans(("~est", "#ffd6a5"), " ", (f"ties {margin_text(self.stats.estimate.pairs_margin, 100.0, '%')}", "#6f7398"))])
+        self.center_matrix.update(matrix)
+        window = self._session_window()
+        signalwidth = self.center_signal.size.width or 80
+        if (window, signalwidth) == self._panels_key:
+            return
+        self._panels_key = (window, signalwidth)
+        self.center_entropy.update(render_entropy_panel(self.stats, window))
         self.center_meta.update(render_meta_panel(self.stats))
-        self.center_mood.update(render_mood_panel(self.stats))
+        self.center_mood.update(render_mood_panel(self.stats, window))
         self.center_trios.update(render_top_trios(self.stats, limit=6))
         self.center_squads.update(render_top_squads(self.stats, limit=5))
+        self.center_signal.update(render_signal_panel(self.stats, window, signalwidth))
+
+    def _session_window(self) -> Tuple[int, int]:
+        timeline = self.stats.timeline
+        end = timeline.session_count() if self.window_end is None else self.window_end
+        return timeline.clamp_window(end, self.window_size)
 
     def _render_right(self) -> None:
-        total = self.stats.totals.get(self.selected, 0)
-        totals_sorted = sorted(self.stats.totals.items(), key=lambda kv: kv[1], reverse=True)
+        totals_sorted = self._sorted_totals()
+        total = dict(totals_sorted).get(self.selected, 0)
 
         max_total = totals_sorted[0][1] if totals_sorted else 0
         ratio = (total / max_total) if max_total > 0 else 0.0
@@ -214,9 +648,12 @@ class ImaginationInsider(App):
             else:
                 label = "cool"
 
-        series = [m.get(self.selected, 0) for _, m in self.stats.trend]
+        grain = GRANULARITIES[self.trend_grain]
+        series = self.stats.timeline.bucket_series(self.selected, grain)
         sp = sparkline(series, width=24)
         latest_chapter = series[-1] if series else 0
+        start, end = self._session_window()
+        window_tension = self.stats.timeline.avg_tension(start, end)
         latest_file = self.stats.per_file[-1] if self.stats.per_file else None
         if latest_file and latest_file.session_tensions:
             latest_tension, tension_note = latest_file.session_tensions[-1], "latest session"
@@ -227,79 +664,233 @@ class ImaginationInsider(App):
         avg_tension = self._avg_tension()
         tcol = "#ffb3c1" if latest_tension >= 70 else "#ffd6a5" if latest_tension >= 45 else "#b8f2b2"
         acol = "#ffb3c1" if avg_tension >= 70 else "#ffd6a5" if avg_tension >= 45 else "#b8f2b2"
+        wcol = "#ffb3c1" if window_tension >= 70 else "#ffd6a5" if window_tension >= 45 else "#b8f2b2"
+        mentions = Text(str(total))
+        if self.stats.estimate is not None:
+            mentions = spans(f"~{total} {margin_text(self.stats.estimate.margins.get(self.selected, float('inf')))}", estimate_mark(self.stats))
         ties = self._ties_for(self.selected, limit=6)
         top_pairs = self._top_pairs(limit=5)
         kws = self._top_keywords_for(self.selected, limit=10)
 
-        lines: List[str] = [
-            f"[b]{self.selected}[/b]  [{hc}]{label}[/]",
-            f"[#cbb7ff]mentions[/] {total}  [#cbb7ff]latest chapter[/] {latest_chapter}",
-            f"[#cbb7ff]trend[/] {sp}",
-            f"[#cbb7ff]tension[/] {tension_note} [{tcol}]{latest_tension}[/]/100  avg [{acol}]{avg_tension}[/]/100",
-            "", div(f"ties for {self.selected}"),
+        none = spans("  ", ("none", "#6f7398"))
+        lines: List[Text] = [
+            spans((self.selected, "bold"), "  ", (label, hc)),
+            spans(("mentions", "#cbb7ff"), " ", mentions, "  ", (f"latest {grain}", "#cbb7ff"), f" {latest_chapter}"),
+            spans(("trend", "#cbb7ff"), f" {sp} ", (f"by {grain}", "#6f7398"), sample_mark(self.stats)),
+            spans(("tension", "#cbb7ff"), f" {tension_note} ", (str(latest_tension), tcol), "/100  avg ", (str(avg_tension), acol), "/100"),
+            spans(("window", "#cbb7ff"), f" sessions {start + 1}-{end}  avg tension ", (str(window_tension), wcol), "/100", sample_mark(self.stats)),
         ]
+        variants = self._variants_for(self.selected, limit=4)
+        if variants:
+            row = spans(("typos", "#cbb7ff"))
+            for word, n in variants:
+                row.append_text(spans(" ", (word, "#ffd6a5"), ("×" + str(n), "#6f7398")))
+            lines.append(row)
+        lines.extend([Text(), div(f"ties for {self.selected}")])
         if not ties:
-            lines.append("  [#6f7398]none[/]")
+            lines.append(none)
         else:
             mx = max((w for _, w in ties), default=1)
-            lines.extend(f"  {other:<10} [{heat_color(wgt / mx if mx else 0.0)}]{wgt}[/]" for other, wgt in ties)
+            lines.extend(spans(f"  {other:<10} ", (str(wgt), heat_color(wgt / mx if mx else 0.0))) for other, wgt in ties)
 
-        lines.extend(["", div("strongest ties overall")])
+        lines.extend([Text(), div("strongest ties overall")])
         if not top_pairs:
-            lines.append("  [#6f7398]none[/]")
+            lines.append(none)
         else:
             mx2 = max((w for _, _, w in top_pairs), default=1)
-            lines.extend(f"  {a} ↔ {b}  [{heat_color(wgt / mx2 if mx2 else 0.0)}]{wgt}[/]" for a, b, wgt in top_pairs)
+            lines.extend(spans(f"  {a} ↔ {b}  ", (str(wgt), heat_color(wgt / mx2 if mx2 else 0.0))) for a, b, wgt in top_pairs)
 
-        lines.extend(["", div("keywords")])
+        lines.extend([Text(), spans(div("keywords"), estimate_mark(self.stats))])
         if not kws:
-            lines.append("  [#6f7398]none[/]")
+            lines.append(none)
         else:
             mxk = max((n for _, n in kws), default=1)
-            chunk = [f"[{heat_color(n / mxk if mxk else 0.0)}]{wword}[/]([#9fe7ff]{n}[/])" for wword, n in kws[:10]]
-            lines.append("  " + "  ".join(chunk))
-        self.right_box.update("\n".join(lines))
+            row = Text("  ")
+            for i, (wword, n) in enumerate(kws[:10]):
+                if i:
+                    row.append("  ")
+                row.append_text(spans((wword, heat_color(n / mxk if mxk else 0.0)), "(", (str(n), "#9fe7ff"), ")"))
+            lines.append(row)
+        self.right_box.update(join_lines(lines))
+
+    def _articles_rows(self) -> int:
+        # one row goes to the header
+        height = self.articles.size.height or 11
+        return max(1, height - 1)
+
+    def _mention_view(self) -> PostingsView:
+        view = self._article_view
+        if view is None or view.stats is not self.stats or view.term != "@" + self.selected:
+            view = PostingsView(self.stats, "@" + self.selected)
+            self._article_view = view
+        return view
 
     def _render_articles(self) -> None:
-        blocks = []
-
-        for fs in reversed(self.stats.per_file[-6:]):
-            lines = fs.lines_for_selected.get(self.selected, [])
-            if not lines:
+        if self.search_text:
+            self._render_search()
+            return
+        # every line that mentions the selected character, newest first, only the visible rows get read
+        view = self._mention_view()
+        rows = self._articles_rows()
+        self._articles_total = len(view)
+        self.articles_offset = clamp(self.articles_offset, 0, max(0, len(view) - rows))
+        hits = view.window(self.articles_offset, rows)
+        if not hits:
+            self.articles.update(Text("no mentions found for selected character", style("#6f7398")))
+            return
+        head = spans(
+            (self.selected, "#9fe7ff"), " ",
+            (f"lines {self.articles_offset + 1}-{self.articles_offset + len(hits)} of {len(view)}  (pgup/pgdn home/end)", "#6f7398"),
+        )
+        self.articles.update(join_lines([head, *self._hit_rows(hits)]))
+
+    def _hit_rows(self, hits: List[Tuple[int, int]]) -> List[Text]:
+        # log text goes in as-is, brackets in it cant be mistaken for styling
+        lines = []
+        for (fileidx, lineno), text in zip(hits, window_texts(self.stats, hits)):
+            if text is None:
                 continue
-            head = f"[#9fe7ff]{fs.filename}[/] [#6f7398](words {fs.words}, tension {fs.tension}, sessions {fs.session_count})[/]"
-            blocks.append(head + "\n" + "\n".join(f"  - {ln}" for ln in lines[:6]))
+            fs = self.stats.per_file[fileidx]
+            lines.append(spans("  ", (f"{fs.filename}:{lineno + 1}", "#cbb7ff"), " " + text[:180]))
+        return lines
+
+    def _render_search(self) -> None:
+        started = time.perf_counter()
+        query = parse_query(self.search_text, list(self.stats.totals), self._stopwords())
+        rows = self._articles_rows()
+        result = run_query(self.stats, query, limit=self.articles_offset + rows)
+        self._articles_total = result.total
+        if self.articles_offset >= result.total:
+            self.articles_offset = max(0, result.total - rows)
+            result = run_query(self.stats, query, limit=self.articles_offset + rows)
+        hits = result.hits[self.articles_offset:]
+        took = (time.perf_counter() - started) * 1000.0
+
+        head = spans(("search", "#9fe7ff"), f" {self.search_text}  ", (f"({result.total} lines, {took:.1f}ms)", "#6f7398"))
+        if hits:
+            head.append(f" showing {self.articles_offset + 1}-{self.articles_offset + len(hits)}", style("#6f7398"))
+        if query.ignored:
+            head.append(f"  ignored: {' '.join(query.ignored)}", style("#6f7398"))
+        lines = [head, *self._hit_rows(hits)]
+        if not hits:
+            lines.append(spans("  ", ("no matching lines", "#6f7398")))
+        self.articles.update(join_lines(lines))
+
+    def _scroll_articles(self, delta: int) -> None:
+        rows = self._articles_rows()
+        offset = clamp(self.articles_offset + delta, 0, max(0, self._articles_total - rows))
+        if offset != self.articles_offset:
+            self.articles_offset = offset
+            self._render_articles()
+
+    def action_articles_page(self, direction: int) -> None:
+        self._scroll_articles(direction * self._articles_rows())
+
+    def action_articles_jump(self, to_end: int) -> None:
+        self.articles_offset = self._articles_total if to_end else 0
+        self._render_articles()
 
-        self.articles.update("\n\n".join(blocks) if blocks else "[#6f7398]no mentions found for selected character in recent files[/]")
+    def on_article_view_scrolled(self, event: ArticleView.Scrolled) -> None:
+        self._scroll_articles(event.delta)
 
-    def action_refresh(self) -> None:
-        self.stats = compute_stats(self.folder)
-        if self.selected not in self.stats.totals:
-            self.selected = self._pick_default_selected()
-        self._render_topbar()
-        self._render_ticker()
-        self._render_hotspots()
+    def action_open_search(self) -> None:
+        self.search_box.display = True
+        self.search_box.focus()
+
+    def action_close_search(self) -> None:
+        self.search_box.display = False
+        self.search_box.value = ""
+        self.search_text = ""
+        self.articles_offset = 0
+        self.set_focus(None)
+        self._render_articles()
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        self.search_text = event.value.strip()
+        self.articles_offset = 0
+        self.set_focus(None)
+        self._render_articles()
+
+    def action_heatmap_pan(self, rows: int, cols: int) -> None:
+        self.heat_row = self.heat_row + rows * 3
+        self.heat_col = self.heat_col + cols * 3
+        self._render_center()
+
+    def action_heatmap_zoom(self, step: int) -> None:
+        self.heat_zoom = clamp(self.heat_zoom + step, 0, len(HEATMAP_ZOOMS) - 1)
+        self._heatmap_follow_selected()
+        self._render_center()
+
+    def action_window_shift(self, direction: int) -> None:
+        # move by half a window so consecutive views overlap a bit
+        total = self.stats.timeline.session_count()
+        _, end = self._session_window()
+        step = max(1, self.window_size // 2)
+        end = clamp(end + direction * step, min(self.window_size, total), total)
+        self.window_end = None if end >= total else end
+        self._render_center()
         self._render_right()
+
+    def action_window_resize(self, direction: int) -> None:
+        total = max(1, self.stats.timeline.session_count())
+        if direction > 0:
+            self.window_size = min(total, self.window_size * 2)
+        else:
+            self.window_size = max(1, self.window_size // 2)
         self._render_center()
-        self._render_articles()
+        self._render_right()
+
+    def action_trend_granularity(self) -> None:
+        self.trend_grain = (self.trend_grain + 1) % len(GRANULARITIES)
+        self._render_right()
+
+    def action_refresh(self) -> None:
+        if self.workspace is not None:
+            # keep showing the old numbers until the rescan lands
+            self.workspace.scan(self.campaign, self._on_campaign_scanned)
+            self._render_topbar()
+            return
+        if self.progressive is not None:
+            self._start_scan()
+            return
+        if self.live is not None:
+            self.live = self.follow()
+            self._show_stats(self.live.stats)
+            return
+        if self.attached is not None:
+            # the daemon rescans on its own, this just picks up its newest board
+            self._poll_attached()
+            return
+        self._show_stats(self.loader())
+
+    def action_next_campaign(self) -> None:
+        if self.workspace is None:
+            return
+        names = [campaign.name for campaign in self.workspace.campaigns]
+        self.campaign = names[(names.index(self.campaign) + 1) % len(names)]
+        self._show_stats(self.workspace.stats_for(self.campaign))
 
     def action_move_up(self) -> None:
-        totals_sorted = [k for k, _ in sorted(self.stats.totals.items(), key=lambda kv: kv[1], reverse=True)]
+        totals_sorted = [k for k, _ in self._sorted_totals()]
         if not totals_sorted:
             return
         idx = totals_sorted.index(self.selected) if self.selected in totals_sorted else 0
         self.selected = totals_sorted[max(0, idx - 1)]
+        self.articles_offset = 0
+        self._heatmap_follow_selected()
         self._render_hotspots()
         self._render_right()
         self._render_center()
         self._render_articles()
 
     def action_move_down(self) -> None:
-        totals_sorted = [k for k, _ in sorted(self.stats.totals.items(), key=lambda kv: kv[1], reverse=True)]
+        totals_sorted = [k for k, _ in self._sorted_totals()]
         if not totals_sorted:
             return
         idx = totals_sorted.index(self.selected) if self.selected in totals_sorted else 0
         self.selected = totals_sorted[min(len(totals_sorted) - 1, idx + 1)]
+        self.articles_offset = 0
+        self._heatmap_follow_selected()
         self._render_hotspots()
         self._render_right()
         self._render_center()
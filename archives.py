@@ -0,0 +1,185 @@
+# logs that are gzipped / bzipped / xz'd or sitting inside a zip, read straight out of the archive
+# (decompressed a chunk at a time, nothing ever gets extracted to disk)
+from __future__ import annotations
+
+import bz2
+import gzip
+import os
+import zipfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import IO, Callable, Dict, Iterator, List, Optional, Union
+
+from helpers import read_lines_from
+
+try:
+    import lzma
+except ImportError:  # some python builds come without it, .xz files just get skipped then
+    lzma = None
+
+# how a zip member is written as one string: bundle.zip::season1/2026-01-05.txt
+MEMBER_SEP = "::"
+
+_OPENERS: Dict[str, Callable[..., IO[bytes]]] = {".gz": gzip.open, ".bz2": bz2.open}
+if lzma is not None:
+    _OPENERS[".xz"] = lzma.open
+
+# compressed logs get decompressed this much at a time, so a big .xz's bytes never sit in memory all at once
+READ_CHUNK = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class ArchiveMember:
+    archive: Path
+    member: str
+    # from the zip's directory, so the cache can tell members apart without opening anything
+    crc: int = 0
+    size: int = 0
+
+    @property
+    def name(self) -> str:
+        return PurePosixPath(self.member).name
+
+    def __str__(self) -> str:
+        return f"{self.archive}{MEMBER_SEP}{self.member}"
+
+
+LogPath = Union[Path, ArchiveMember]
+
+
+def compression_of(name: str) -> str:
+    # ".gz" / ".bz2" / ".xz" for a compressed log, "" otherwise
+    lowered = name.lower()
+    for suffix in _OPENERS:
+        if lowered.endswith(".txt" + suffix):
+            return suffix
+    return ""
+
+
+def is_log_name(name: str) -> bool:
+    return name.lower().endswith(".txt") or compression_of(name) != ""
+
+
+def zip_members(archive: Path) -> List[ArchiveMember]:
+    # every log inside a zip (a broken zip just counts as empty)
+    out = []
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not is_log_name(info.filename):
+                    continue
+                out.append(ArchiveMember(archive=archive, member=info.filename, crc=info.CRC, size=info.file_size))
+    except (OSError, zipfile.BadZipFile):
+        return []
+    return out
+
+
+@contextmanager
+def open_log(source: LogPath) -> Iterator[IO[bytes]]:
+    # a binary stream of the decompressed log
+    if isinstance(source, ArchiveMember):
+        with zipfile.ZipFile(source.archive) as zf:
+            with zf.open(source.member) as fh:
+                yield fh
+        return
+    opener = _OPENERS.get(compression_of(source.name))
+    if opener is None:
+        opener = open
+    with opener(source, "rb") as fh:
+        yield fh
+
+
+def is_streamed(source: LogPath) -> bool:
+    # compressed logs and zip members get read with read_log_chunks, plain ones in one go
+    return isinstance(source, ArchiveMember) or compression_of(source.name) != ""
+
+
+def read_log_bytes(source: LogPath) -> bytes:
+    if not is_streamed(source):
+        return source.read_bytes()
+    with open_log(source) as fh:
+        return fh.read()
+
+
+def read_log_chunks(source: LogPath, size: int = READ_CHUNK) -> Iterator[bytes]:
+    # the decompressed log, size bytes at a time
+    with open_log(source) as fh:
+        while True:
+            chunk = fh.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def log_size(source: LogPath) -> int:
+    # bytes on disk (the zip directory already knows member sizes), 0 if it cant be read
+    if isinstance(source, ArchiveMember):
+        return source.size
+    try:
+        return source.stat().st_size
+    except OSError:
+        return 0
+
+
+def decoded_size(source: LogPath) -> Optional[int]:
+    # bytes once decompressed, if that's known without decompressing anything: a plain log's size or a zip
+    # member's (the zip directory says). None for .gz/.bz2/.xz, 0 if it cant be read
+    if isinstance(source, ArchiveMember):
+        return source.size
+    if compression_of(source.name):
+        return None
+    try:
+        return source.stat().st_size
+    except OSError:
+        return 0
+
+
+def source_identity(source: LogPath) -> Optional[str]:
+    # what the cache keys on: the file's path/size/mtime, or for a zip member the member itself
+    # (so re-zipping a bundle with more files in it doesnt throw away the old members)
+    if isinstance(source, ArchiveMember):
+        return f"{source.archive.resolve()}{MEMBER_SEP}{source.member}|{source.crc}|{source.size}"
+    try:
+        st = os.stat(source)
+    except OSError:
+        return None
+    return f"{source.resolve()}|{st.st_size}|{st.st_mtime_ns}"
+
+
+def parse_source(text: str) -> LogPath:
+    # FileStats.source back into something readable
+    if MEMBER_SEP in text:
+        archive, member = text.rsplit(MEMBER_SEP, 1)
+        if archive.lower().endswith(".zip"):
+            return ArchiveMember(archive=Path(archive), member=member)
+    return Path(text)
+
+
+def resolve_source(text: str) -> Optional[LogPath]:
+    # like parse_source but checks it's really there (and fills in the zip member's crc/size)
+    source = parse_source(text)
+    if isinstance(source, ArchiveMember):
+        for member in zip_members(source.archive):
+            if member.member == source.member:
+                return member
+        return None
+    if source.is_file():
+        return source
+    return None
+
+
+def read_source_lines(source: str, offsets: List[int]) -> List[str]:
+    # read_lines_at for any source. plain files just seek, compressed ones get decompressed forward once, up to
+    # the last line asked for (offsets sorted first, a seek backwards would start the decompression over)
+    path = parse_source(source)
+    if not is_streamed(path):
+        with open(path, "rb") as fh:
+            return read_lines_from(fh, offsets)
+    order = sorted(range(len(offsets)), key=lambda i: offsets[i])
+    with open_log(path) as fh:
+        texts = read_lines_from(fh, [offsets[i] for i in order])
+    out = [""] * len(offsets)
+    for i, text in zip(order, texts):
+        out[i] = text
+    return out
@@ -0,0 +1,385 @@
+# analysis backends: different ways of turning log files into per-file stats. every backend has to come up with
+# exactly what the plain "python" one does (crosscheck.py runs them side by side to make sure), they only differ in
+# how the work gets spread out. analyze_reference is the odd one out: the old whole-file loop, slow and simple,
+# kept only so crosscheck has something that doesnt share the parser to check the real ones against
+from __future__ import annotations
+
+import os
+import re
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, AbstractSet, Callable, Dict, List, Optional, Set, Tuple
+
+from archives import LogPath, is_streamed, log_size, read_log_bytes
+from config import CHARACTERS, DEFAULT_WORDS, Character, WordLists
+from discovery import list_log_files
+from duplicates import content_digest
+from helpers import build_alias_regex, calc_tension, clamp, decode_text, parse_date_from_filename, split_session_spans, tokenize
+from lexicon import combat_lexicon, mood_lexicon
+from models import DashboardStats, FileStats, analyze_file, analyze_files, analyze_raw, build_dashboard
+from proximity import count_together
+from roster import FUZZY_LENGTHS, dedupe_characters, edit_distance
+
+if TYPE_CHECKING:
+    from cache import FileCache
+
+# auto goes parallel once the logs add up to this much (below that, starting the worker processes costs more
+# than they save)
+PARALLEL_MIN_BYTES = 24 * 1024 * 1024
+# each worker gets handed files in batches of about this many bytes, so small files dont pay one round trip each
+PARALLEL_BATCH_BYTES = 2 * 1024 * 1024
+
+Analyzer = Callable[[List[LogPath], List[Character], Optional["FileCache"], WordLists], List[FileStats]]
+
+
+def _analyze_batch(files: List[LogPath], characters: List[Character], wordlists: WordLists) -> List[FileStats]:
+    # runs inside a worker process, so only plain picklable args
+    # (copies inside one batch get spotted before parsing, across batches they just get parsed)
+    out = []
+    seen: Dict[str, FileStats] = {}
+    for filepath in files:
+        raw = None if is_streamed(filepath) else read_log_bytes(filepath)
+        out.append(analyze_raw(filepath, raw, characters, wordlists, seen))
+    return out
+
+
+def _batches(files: List[LogPath], indexes: List[int], workers: int) -> List[List[int]]:
+    # consecutive runs of files, at most PARALLEL_BATCH_BYTES each and at least one batch per worker
+    total = 0
+    for i in indexes:
+        total = total + log_size(files[i])
+    limit = max(1, min(PARALLEL_BATCH_BYTES, total // workers))
+    out: List[List[int]] = []
+    current: List[int] = []
+    size = 0
+    for i in indexes:
+        current.append(i)
+        size = size + log_size(files[i])
+        if size >= limit:
+            out.append(current)
+            current = []
+            size = 0
+    if current:
+        out.append(current)
+    return out
+
+
+def analyze_parallel(
+    files: List[LogPath],
+    characters: List[Character] = CHARACTERS,
+    cache: Optional[FileCache] = None,
+    wordlists: WordLists = DEFAULT_WORDS,
+    workers: Optional[int] = None,
+) -> List[FileStats]:
+    # cache hits get picked up here, every file that still needs parsing goes to a pool of worker processes
+    done: Dict[int, FileStats] = {}
+    missing = []
+    for i, filepath in enumerate(files):
+        hit = cache.get(filepath, characters, wordlists) if cache is not None else None
+        if hit is None:
+            missing.append(i)
+        else:
+            done[i] = hit
+    if len(missing) == 1:
+        done[missing[0]] = analyze_file(files[missing[0]], characters, None, wordlists)
+    elif missing:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            jobs = []
+            for batch in _batches(files, missing, workers):
+                jobs.append((batch, pool.submit(_analyze_batch, [files[i] for i in batch], characters, wordlists)))
+            for batch, job in jobs:
+                for i, filestats in zip(batch, job.result()):
+                    done[i] = filestats
+    if cache is not None:
+        for i in missing:
+            cache.put(files[i], characters, done[i], wordlists)
+    perfiles = []
+    for i in range(len(files)):
+        perfiles.append(done[i])
+    return perfiles
+
+
+# what analyze_reference fills in, crosscheck only compares these with it (the line index, byte offsets and
+# copy spotting come from the parser alone)
+REFERENCE_FIELDS = (
+    "filename", "date", "words", "lines", "tension", "mentions", "lines_for_selected", "pos", "neg", "exclaims",
+    "questions", "caps", "chars", "text", "session_count", "session_tensions", "session_pos", "session_neg",
+    "session_counts", "names", "source", "cooc", "trios", "squads", "keywords", "line_tension", "line_mood",
+    "session_lines", "variants", "digest",
+)
+
+_REF_WORD_RE = re.compile(r"\b\w+\b")
+_REF_TOKEN_RE = re.compile(r"\w+")
+
+
+def _reference_typo(word: str, singles: Dict[str, List[int]], max_edits: int, ignore: AbstractSet[str]) -> Optional[List[int]]:
+    # the character ids a word is a typo of, checked against every one-word alias (no index)
+    if len(word) < FUZZY_LENGTHS[0] - max_edits or word in ignore or word.isdigit():
+        return None
+    best = max_edits + 1
+    found = None
+    tied = False
+    for alias, charids in singles.items():
+        limit = 0
+        for threshold in FUZZY_LENGTHS:
+            if len(alias) >= threshold:
+                limit = limit + 1
+        limit = min(limit, max_edits)
+        distance = edit_distance(word, alias, limit)
+        if distance > limit:
+            continue
+        if distance < best:
+            best = distance
+            found = charids
+            tied = False
+        elif distance == best and charids != found:
+            tied = True
+    if tied:
+        return None
+    return found
+
+
+def _reference_hits(
+    line: str,
+    patterns: List[Tuple[int, re.Pattern[str]]],
+    singles: Dict[str, List[int]],
+    wordlists: WordLists,
+) -> Tuple[List[Tuple[int, int]], Dict[int, Dict[str, int]]]:
+    # every mention on the line as (word index, character id) with one regex per alias like the old code did,
+    # plus the typo'd words that got counted (character id -> word -> times)
+    starts = []
+    words = []
+    for match in _REF_TOKEN_RE.finditer(line):
+        starts.append(match.start())
+        words.append(match.group(0).lower())
+    hits = []
+    for charid, pattern in patterns:
+        for match in pattern.finditer(line):
+            hits.append((max(0, bisect_right(starts, match.start()) - 1), charid))
+    typos: Dict[int, Dict[str, int]] = {}
+    if wordlists.fuzzy > 0 and singles:
+        for tokenidx in range(len(words)):
+            word = words[tokenidx]
+            if word in singles:
+                continue
+            charids = _reference_typo(word, singles, wordlists.fuzzy, wordlists.fuzzy_ignore)
+            if charids is None:
+                continue
+            for charid in charids:
+                hits.append((tokenidx, charid))
+                spellings = typos.setdefault(charid, {})
+                spellings[word] = spellings.get(word, 0) + 1
+    return (hits, typos)
+
+
+def reference_file(filepath: LogPath, characters: List[Character], wordlists: WordLists) -> FileStats:
+    # one file the slow way: the whole text split into lines, sessions and windows worked out from the full list
+    raw = read_log_bytes(filepath)
+    text = decode_text(raw)
+    roster = dedupe_characters(characters)
+    names = [character.name for character in roster]
+    patterns = []
+    singles: Dict[str, List[int]] = {}
+    for charid, character in enumerate(roster):
+        for alias, pattern in zip(character.aliases, build_alias_regex(character.aliases)):
+            patterns.append((charid, pattern))
+            if re.match(r"^\w+$", alias):
+                singles.setdefault(alias.lower(), []).append(charid)
+    mood = mood_lexicon(wordlists)
+    combat = combat_lexicon(wordlists)
+    lines = text.splitlines()
+    spans = split_session_spans(lines)
+    session_of: Dict[int, int] = {}
+    for index, (start, end) in enumerate(spans):
+        for lineno in range(start, end):
+            session_of[lineno] = index
+
+    width = len(names)
+    mentions = {name: 0 for name in names}
+    snippets: Dict[str, List[str]] = {name: [] for name in names}
+    keywords: Dict[str, Dict[str, int]] = {name: {} for name in names}
+    variants: Dict[str, Dict[str, int]] = {}
+    cooc: Dict[Tuple[str, str], int] = {}
+    trios: Dict[Tuple[str, str, str], int] = {}
+    squads: Dict[Tuple[str, str, str, str], int] = {}
+    session_pos = array("I", [0] * len(spans))
+    session_neg = array("I", [0] * len(spans))
+    session_counts = array("I", [0] * (len(spans) * width))
+    session_lines = array("I", [0] * len(spans))
+    line_tension = array("B")
+    line_mood = array("b")
+    pos = 0
+    neg = 0
+    nonblank = 0
+    # who's been mentioned where in the current session: (position, character id), position in lines or words
+    seen: List[Tuple[int, int]] = []
+    current = -1
+    position = 0
+    size = max(1, wordlists.window.size)
+    for lineno, line in enumerate(lines):
+        if not line.strip():
+            continue
+        nonblank = nonblank + 1
+        tokens = tokenize(line)
+        linepos, lineneg = mood.sentiment(tokens)
+        pos = pos + linepos
+        neg = neg + lineneg
+        session = session_of.get(lineno)
+        if session is not None:
+            session_pos[session] = session_pos[session] + linepos
+            session_neg[session] = session_neg[session] + lineneg
+            session_lines[session] = session_lines[session] + 1
+            line_tension.append(calc_tension(line, combat))
+            line_mood.append(clamp(linepos - lineneg, -127, 127))
+            if session != current:
+                # nobody is near someone from the last session
+                seen = []
+                current = session
+        hits, typos = _reference_hits(line, patterns, singles, wordlists)
+        for charid, spellings in typos.items():
+            bag = variants.setdefault(names[charid], {})
+            for word, times in spellings.items():
+                bag[word] = bag.get(word, 0) + times
+        counts: Dict[int, int] = {}
+        for _, charid in hits:
+            counts[charid] = counts.get(charid, 0) + 1
+
+        # who's together: each new mention against everyone still inside the window behind it
+        if wordlists.window.unit == "token":
+            groups: Dict[int, Set[int]] = {}
+            for tokenidx, charid in hits:
+                groups.setdefault(tokenidx, set()).add(charid)
+            for tokenidx in sorted(groups):
+                at = position + tokenidx
+                for charid in groups[tokenidx]:
+                    seen.append((at, charid))
+                near = {names[charid] for where, charid in seen if where > at - size}
+                count_together(sorted(near), {names[charid] for charid in groups[tokenidx]}, cooc, trios, squads)
+            position = position + len(_REF_TOKEN_RE.findall(line))
+        else:
+            if counts:
+                for charid in counts:
+                    seen.append((position, charid))
+                near = {names[charid] for where, charid in seen if where > position - size}
+                count_together(sorted(near), {names[charid] for charid in counts}, cooc, trios, squads)
+            position = position + 1
+
+        if not counts:
+            continue
+        present = []
+        for charid, count in counts.items():
+            name = names[charid]
+            present.append(name)
+            mentions[name] = mentions[name] + count
+            if len(snippets[name]) < 14:
+                snippets[name].append(line.strip()[:180])
+            if session is not None:
+                session_counts[session * width + charid] = session_counts[session * width + charid] + count
+        # keywords: every word on the line for everyone on it, minus stopwords, their own name and typo'd names
+        skip: Set[str] = set()
+        for spellings in typos.values():
+            skip.update(spellings)
+        for name in sorted(present):
+            bag = keywords[name]
+            for token in tokens:
+                if token in wordlists.stop or token == name or token in skip:
+                    continue
+                bag[token] = bag.get(token, 0) + 1
+
+    session_tensions = array("B")
+    for start, end in spans:
+        session_tensions.append(calc_tension("\n".join(lines[start:end]).strip(), combat))
+    caps = 0
+    for ch in text:
+        if ch.isupper():
+            caps = caps + 1
+    return FileStats(
+        filename=filepath.name,
+        date=parse_date_from_filename(filepath.name),
+        words=len(_REF_WORD_RE.findall(text)),
+        lines=nonblank,
+        tension=calc_tension(text, combat),
+        mentions=mentions,
+        lines_for_selected=snippets,
+        pos=pos,
+        neg=neg,
+        exclaims=text.count("!"),
+        questions=text.count("?"),
+        caps=caps,
+        chars=len(text),
+        text=text,
+        session_count=len(spans),
+        session_tensions=session_tensions,
+        session_pos=session_pos,
+        session_neg=session_neg,
+        session_counts=session_counts,
+        names=tuple(names),
+        source=str(filepath),
+        cooc=cooc,
+        trios=trios,
+        squads=squads,
+        keywords=keywords,
+        line_tension=line_tension,
+        line_mood=line_mood,
+        session_lines=session_lines,
+        variants=variants,
+        digest=content_digest(raw),
+    )
+
+
+def analyze_reference(
+    files: List[LogPath],
+    characters: List[Character] = CHARACTERS,
+    cache: Optional[FileCache] = None,
+    wordlists: WordLists = DEFAULT_WORDS,
+) -> List[FileStats]:
+    # same shape as the other backends but never touches the cache and only fills REFERENCE_FIELDS, so it's not
+    # in BACKENDS (no search index behind it), crosscheck runs it on the side
+    perfiles = []
+    for filepath in files:
+        perfiles.append(reference_file(filepath, characters, wordlists))
+    return perfiles
+
+
+# name -> analyzer, "auto" picks one of these by how big the logs are
+BACKENDS: Dict[str, Analyzer] = {
+    "python": analyze_files,
+    "parallel": analyze_parallel,
+}
+BACKEND_CHOICES = ("auto", *BACKENDS)
+
+
+def pick_backend(files: List[LogPath], name: str = "auto") -> str:
+    if name != "auto":
+        if name not in BACKENDS:
+            raise ValueError(f"unknown backend: {name} (pick from {', '.join(BACKEND_CHOICES)})")
+        return name
+    if len(files) < 2 or (os.cpu_count() or 1) < 2:
+        return "python"
+    total = 0
+    for filepath in files:
+        total = total + log_size(filepath)
+        if total >= PARALLEL_MIN_BYTES:
+            return "parallel"
+    return "python"
+
+
+def compute_stats(
+    folder: Path,
+    files: Optional[List[LogPath]] = None,
+    characters: List[Character] = CHARACTERS,
+    cache: Optional[FileCache] = None,
+    wordlists: WordLists = DEFAULT_WORDS,
+    backend: str = "auto",
+    duplicates: str = "skip",
+) -> DashboardStats:
+    # files lets a caller do just a subset of the folder, cache skips files we already did
+    # duplicates: skip / near / keep / off for copies of other logs (see duplicates.py)
+    if files is None:
+        files = list_log_files(folder)
+    # now chew through each txt file
+    perfiles = BACKENDS[pick_backend(files, backend)](files, characters, cache, wordlists)
+    return build_dashboard(perfiles, characters, duplicates)
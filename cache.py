@@ -0,0 +1,164 @@
+# on-disk cache of per-file results so relaunching (or switching campaigns) skips files we already did
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+import zlib
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from archives import LogPath, source_identity
+from config import DEFAULT_WORDS, Character, WordLists, words_fingerprint
+from models import ANALYSIS_VERSION, FileStats
+
+# bump this if the cache entry layout changes (analysis changes bump models.ANALYSIS_VERSION instead)
+CACHE_VERSION = 4
+# entries nobody read in this long get thrown away (a file that changed or a roster nobody uses anymore leaves its
+# old entries behind), and past this many bytes the least recently read ones go too
+CACHE_MAX_AGE = 30 * 24 * 3600
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+# how often a FileCache goes through the whole directory looking for those (at most once a day, first write)
+PRUNE_EVERY = 24 * 3600
+# reading an entry bumps its mtime so it counts as used, but only if that's a day old (not a write per file per load)
+TOUCH_EVERY = 24 * 3600
+
+
+def analysis_fingerprint(characters: List[Character], wordlists: WordLists = DEFAULT_WORDS) -> str:
+    # everything that changes the numbers for a file (besides the file itself)
+    parts = [str(CACHE_VERSION), str(ANALYSIS_VERSION)]
+    for character in characters:
+        parts.append(character.name + "=" + ",".join(character.aliases))
+    parts.append(words_fingerprint(wordlists))
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class FileCache:
+    # one pickle per (file, size, mtime, fingerprint) or (zip member, crc, fingerprint), shared by every campaign that reads the same file.
+    # entries leave the text out (that's the log itself, models.file_text reads it again when it's needed) and are
+    # zlib'd, so a .txt.xz's entry isnt ten times the size of the .txt.xz
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self._fingerprints: Dict[Tuple[Tuple[Character, ...], WordLists], str] = {}
+        self._pruned = False
+        self._prune_lock = threading.Lock()
+
+    def _fingerprint(self, characters: List[Character], wordlists: WordLists) -> str:
+        key = (tuple(characters), wordlists)
+        if key not in self._fingerprints:
+            self._fingerprints[key] = analysis_fingerprint(characters, wordlists)
+        return self._fingerprints[key]
+
+    def _entry_path(self, filepath: LogPath, characters: List[Character], wordlists: WordLists) -> Optional[Path]:
+        source = source_identity(filepath)
+        if source is None:
+            return None
+        ident = f"{source}|{self._fingerprint(characters, wordlists)}"
+        digest = hashlib.sha1(ident.encode("utf-8")).hexdigest()
+        return self.directory / digest[:2] / (digest + ".pkl")
+
+    def get(self, filepath: LogPath, characters: List[Character], wordlists: WordLists = DEFAULT_WORDS) -> Optional[FileStats]:
+        entry = self._entry_path(filepath, characters, wordlists)
+        if entry is None:
+            return None
+        try:
+            with open(entry, "rb") as fh:
+                mtime = os.fstat(fh.fileno()).st_mtime
+                filestats = pickle.loads(zlib.decompress(fh.read()))
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, zlib.error, pickle.UnpicklingError, AttributeError, TypeError):
+            # half written or from an old version, just redo the file
+            return None
+        if not isinstance(filestats, FileStats):
+            return None
+        if time.time() - mtime > TOUCH_EVERY:
+            try:
+                os.utime(entry)
+            except OSError:
+                pass
+        return filestats
+
+    def put(self, filepath: LogPath, characters: List[Character], filestats: FileStats, wordlists: WordLists = DEFAULT_WORDS) -> None:
+        entry = self._entry_path(filepath, characters, wordlists)
+        if entry is None:
+            return
+        self._maybe_prune()
+        data = zlib.compress(pickle.dumps(replace(filestats, text=""), protocol=pickle.HIGHEST_PROTOCOL), 1)
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            # write then rename so two scans racing on the same file never see half a pickle
+            tmp = entry.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, entry)
+        except OSError:
+            pass
+
+    def _maybe_prune(self) -> None:
+        # once per FileCache, and only if no run pruned in the last PRUNE_EVERY (the marker file's mtime says when)
+        with self._prune_lock:
+            if self._pruned:
+                return
+            self._pruned = True
+            marker = self.directory / "pruned"
+            try:
+                if time.time() - marker.stat().st_mtime < PRUNE_EVERY:
+                    return
+            except OSError:
+                pass
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                marker.touch()
+            except OSError:
+                return
+            self.prune()
+
+    def prune(self, max_age: float = CACHE_MAX_AGE, max_bytes: int = CACHE_MAX_BYTES) -> int:
+        # throws out entries not read in max_age, then the least recently read ones until it's under max_bytes
+        # (plus tmp files some killed run left behind). returns how many files went
+        now = time.time()
+        entries: List[Tuple[float, int, str]] = []
+        removed = 0
+        try:
+            subdirs = [entry.path for entry in os.scandir(self.directory) if entry.is_dir(follow_symlinks=False)]
+        except OSError:
+            return 0
+        for subdir in subdirs:
+            try:
+                with os.scandir(subdir) as found:
+                    for entry in found:
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            # another run got to it first
+                            continue
+                        if entry.name.endswith(".pkl"):
+                            if now - st.st_mtime > max_age:
+                                removed = removed + _remove(entry.path)
+                            else:
+                                entries.append((st.st_mtime, st.st_size, entry.path))
+                        elif entry.name.endswith(".tmp"):
+                            if now - st.st_mtime > PRUNE_EVERY:
+                                removed = removed + _remove(entry.path)
+            except OSError:
+                continue
+        # newest first, everything past the size limit goes
+        entries.sort(reverse=True)
+        total = 0
+        for _, size, path in entries:
+            total = total + size
+            if total > max_bytes:
+                removed = removed + _remove(path)
+        return removed
+
+
+def _remove(path: str) -> int:
+    try:
+        os.remove(path)
+    except OSError:
+        return 0
+    return 1
@@ -1,9 +1,10 @@
 # config stuff
 from __future__ import annotations
 
+import hashlib
 import re
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import Dict, FrozenSet, List, Tuple
 
 
 @dataclass(frozen=True)
@@ -13,12 +14,13 @@ class Character:
 
 
 # update this list to match the game charcters (this is for my friends and i's psuedo dnd stuff!)
+# listing a name twice is fine, its aliases just get merged (see roster.py)
 CHARACTERS: List[Character] = [
     Character("zephyr", ("zephyr",)), Character("sunset", ("sunset",)), Character("azion", ("azion",)),
     Character("yuuyi", ("yuuyi",)), Character("ciel", ("ciel",)), Character("kal", ("kal",)),
     Character("john", ("john",)), Character("cory", ("cory",)), Character("brian", ("brian",)),
     Character("jax", ("jax",)), Character("cain", ("cain",)), Character("cecilia", ("cecilia",)),
-    Character("arc", ("arc",)), Character("azion", ("azion",)), Character("erik", ("erik",)), Character("shatter", ("shatter",)),
+    Character("arc", ("arc",)), Character("erik", ("erik",)), Character("shatter", ("shatter",)),
 ]
 
 # grabs date from filename if it looks like 2026-01-01
@@ -28,6 +30,12 @@ DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})")
 POS_WORDS = {"smile", "smiled", "laugh", "laughed", "happy", "hope", "hopeful", "relief", "safe", "calm", "win", "won", "victory", "love", "kind", "warm", "bright", "good", "nice", "okay"}
 NEG_WORDS = {"blood", "bleed", "bleeding", "wound", "wounded", "hurt", "pain", "panic", "fear", "afraid", "dead", "death", "kill", "killed", "hate", "anger", "angry", "scream", "screamed", "cruel", "dark", "cold", "bad", "worse"}
 
+# phrases (and single words) with their own weight for the mood meter, whole numbers, negative = bad vibes
+# these win over the plain lists above when they overlap ("good job" is +2, not "good" +1)
+MOOD_PHRASES: Dict[str, int] = {"well done": 2, "good job": 2, "thank you": 1, "made it": 1, "rest in peace": -2, "last breath": -3, "fell unconscious": -2}
+# words that flip the mood of whatever comes right after them ("not happy", "never safe")
+NEGATORS = {"not", "never", "nothing", "nobody", "without", "hardly", "don't", "doesn't", "didn't", "isn't", "wasn't", "aren't", "weren't", "can't", "couldn't", "won't", "wouldn't", "shouldn't"}
+
 # boring words skipped when pulling keywords
 _WORD_RE = re.compile(r"[a-zA-Z][a-zA-Z']+")
 STOPWORDS = {"the", "a", "an", "and", "or", "but", "if", "then", "than", "so", "to", "of", "in", "on", "at", "for", "with", "from", "into", "out", "up", "down", "over", "under", "as", "is", "are", "was", "were", "be", "been", "being", "it", "its", "this", "that", "these", "those", "i", "you", "he", "she", "they", "we", "me", "him", "her", "them", "my", "your", "his", "hers", "their", "our", "mine", "yours", "ours", "theirs", "not", "no", "yes", "just", "very", "really", "like", "got", "get", "gets", "getting", "do", "does", "did", "doing", "have", "has", "had", "having", "will", "would", "can", "could", "should", "may", "might", "must", "also", "too", "only", "again", "all", "any", "some", "more", "most", "much", "many", "few", "each", "every", "either", "neither"}
@@ -35,5 +43,63 @@ STOPWORDS = {"the", "a", "an", "and", "or", "but", "if", "then", "than", "so", "
 # combat words used for tension score
 COMBAT_WORDS = {"attack", "attacks", "attacked", "hit", "hits", "strike", "strikes", "struck", "stab", "stabs", "stabbed", "slash", "slashes", "slashed", "cut", "cuts", "parry", "parries", "parried", "block", "blocks", "blocked", "dodge", "dodges", "dodged", "blood", "wound", "wounds", "wounded", "kill", "kills", "killed", "dead", "fight", "fights", "fought", "battle", "battles", "combat", "spell", "spells", "cast", "casts", "casting", "arrow", "arrows", "blade", "sword", "dagger", "gun", "shot", "shots", "shoot", "shoots"}
 
+# weighted combat phrases for tension, same idea as MOOD_PHRASES
+COMBAT_PHRASES: Dict[str, int] = {"critical hit": 3, "roll initiative": 3, "death save": 3, "opportunity attack": 2, "finishing blow": 3, "sneak attack": 2}
+
 # punctuation counted for tension
 INTENSITY_CHARS = set("!?")
+
+
+@dataclass(frozen=True)
+class CoocWindow:
+    # how close two characters have to be to count as together: within size lines, or within size words
+    unit: str = "line"
+    size: int = 1
+
+
+# 1 line = only characters on the exact same line (the old way). prose logs where a scene runs over a few lines
+# do better with something like CoocWindow("line", 3) or CoocWindow("token", 40)
+COOC_WINDOW = CoocWindow("line", 1)
+COOC_UNITS = ("line", "token")
+
+
+@dataclass(frozen=True)
+class WordLists:
+    # the word lists above bundled up, so a config file can swap them without touching this one
+    # (the cooc window rides along, it's the other thing the config file can change about a file's numbers)
+    pos: FrozenSet[str]
+    neg: FrozenSet[str]
+    combat: FrozenSet[str]
+    stop: FrozenSet[str]
+    window: CoocWindow = COOC_WINDOW
+    # weighted entries on top of the plain lists, (phrase, weight) sorted by phrase (see lexicon.py)
+    mood_phrases: Tuple[Tuple[str, int], ...] = ()
+    combat_phrases: Tuple[Tuple[str, int], ...] = ()
+    negators: FrozenSet[str] = frozenset()
+    # typo'd aliases: how many slips to forgive (0 = exact only, see roster.py) and words that never count as a typo
+    fuzzy: int = 0
+    fuzzy_ignore: FrozenSet[str] = frozenset()
+
+
+DEFAULT_WORDS = WordLists(
+    pos=frozenset(POS_WORDS),
+    neg=frozenset(NEG_WORDS),
+    combat=frozenset(COMBAT_WORDS),
+    stop=frozenset(STOPWORDS),
+    window=COOC_WINDOW,
+    mood_phrases=tuple(sorted(MOOD_PHRASES.items())),
+    combat_phrases=tuple(sorted(COMBAT_PHRASES.items())),
+    negators=frozenset(NEGATORS),
+)
+
+
+def words_fingerprint(wordlists: WordLists) -> str:
+    # everything besides the roster that changes a file's numbers, cache entries and partial shards both key on it
+    parts = []
+    for wordset in (wordlists.pos, wordlists.neg, wordlists.combat, wordlists.stop, INTENSITY_CHARS, wordlists.negators):
+        parts.append(" ".join(sorted(wordset)))
+    for phrases in (wordlists.mood_phrases, wordlists.combat_phrases):
+        parts.append("|".join(f"{phrase}={weight}" for phrase, weight in phrases))
+    parts.append(f"{wordlists.window.unit}:{wordlists.window.size}")
+    parts.append(f"fuzzy:{wordlists.fuzzy} " + " ".join(sorted(wordlists.fuzzy_ignore)))
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
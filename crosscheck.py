@@ -0,0 +1,290 @@
+# run every analysis backend over the same logs and make sure they all come up with the same board, down to
+# the last tension point. random logs full of the stuff that trips parsers up (session breaks, odd line endings,
+# broken utf-8, aliases glued to punctuation) plus a few hand-made edge cases, or a real folder of yours.
+# every file also gets redone by backends.analyze_reference (the old whole-file loop, no shared parser) and the
+# fields it knows about have to match that too, so a bug all the parser-based backends share still shows up
+# run: python crosscheck.py [--rounds N] [--seed N] [--backends python parallel] [--folder FOLDER]
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+from dataclasses import fields, replace
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from archives import LogPath, read_log_bytes
+from backends import BACKENDS, REFERENCE_FIELDS, analyze_reference, compute_stats
+from config import CHARACTERS, DEFAULT_WORDS, Character, CoocWindow, WordLists
+from discovery import list_log_files
+from helpers import whole_lines
+from models import DashboardStats, FileStats, LogParser, build_dashboard
+from timeline import GRANULARITIES, Timeline
+
+# roster for the random logs: multi-word aliases, punctuation inside names, one alias that's a prefix of another
+FUZZ_CHARACTERS = [
+    Character("kal", ("kal", "kally")),
+    Character("mrx", ("mr. x", "mister x")),
+    Character("knight", ("red knight",)),
+    Character("oneil", ("o'neil",)),
+    Character("bob", ("bob", "bob bob", "robert")),
+    Character("zeph", ("zephyr",)),
+]
+
+FUZZ_WORDS = replace(
+    DEFAULT_WORDS,
+    mood_phrases=tuple(sorted({"not safe": -2, "critical hit": 3, "so very happy": 4}.items())),
+    combat_phrases=tuple(sorted({"critical hit": 3, "draws a blade": 2}.items())),
+    negators=frozenset({"not", "never", "no"}),
+    fuzzy=2,
+    fuzzy_ignore=frozenset({"roberta"}),
+)
+
+# cooc windows every round is checked with
+WINDOWS = (CoocWindow("line", 1), CoocWindow("line", 3), CoocWindow("token", 40))
+
+# bits the random logs get glued together from
+_PIECES = [
+    "Kal", "kal's", "KAL", "kally", "kal_x", "mr. x", "Mr. X", "mr.x", "mister  x", "red knight", "Red\tknight",
+    "o'neil", "O'NEIL", "zephyr", "zeph", "bob", "bob bob", "robert", "bobby",
+    # typos for fuzzy matching (roberta is on the ignore list)
+    "zephry", "Zepyhr", "zephyrr", "kallt", "robret", "roberta", "roebrt",
+    "blade", "blood", "struck", "critical hit", "draws a blade", "safe", "not safe", "never", "happy", "so very happy",
+    "hope", "dark", "tavern", "the", "and",
+    "!", "?", "!?", "...", "“hi”", "café", "ß", "-", "--", "---", "———", "–––",
+]
+_GLUE = [" ", " ", " ", "", "\n", "\n", "\n\n", "\n\n\n", "\n \n", "\r\n", "\r\n\r\n", "\r", "\t", "\x0c", "\x85", " "]
+
+# hand-made logs for the spots where backends are most likely to drift apart
+EDGE_CASES: Dict[str, bytes] = {
+    "empty": b"",
+    "only-breaks": b"---\n\n\n---\n   \n\t\n",
+    "break-first-and-last": b"---\nkal and bob\n---\n",
+    "no-final-newline": b"kal\n\n\nbob draws a blade",
+    "two-vs-three-blank": b"kal\n\nbob\n\n\nzephyr\n \n\t\nmr. x\n",
+    "crlf-blank-runs": b"kal\r\n\r\n\r\nbob\r\n---\r\nzephyr\r\n",
+    "dash-variants": "kal\n ——— \nbob\n--\nzephyr\n- - -\nred knight\n".encode("utf-8"),
+    # 12.5 (one short line, one long line, nothing else) has to round to 12 like python's round() does
+    "tension-half-up": b"quiet little line\n" + b"x" * 70 + b"\n",
+    "tension-half-again": b"plain text with no shouting at all but long enough to not count as short\nok\n",
+    "bom-and-latin1": b"\xef\xbb\xbfkal caf\xe9 BOB!\n\n\nzephyr\n",
+    "nul-and-odd-breaks": b"kal\x00bob\x0bzephyr\x1c\x1dred knight\x1e\n",
+}
+# a byte for byte copy: every backend has to hand it the original's numbers and leave it off the board the same way
+EDGE_CASES["two-vs-three-blank (1)"] = EDGE_CASES["two-vs-three-blank"]
+
+
+def fuzz_log(rng: random.Random) -> bytes:
+    parts = []
+    for _ in range(rng.randint(0, 400)):
+        parts.append(rng.choice(_PIECES))
+        parts.append(rng.choice(_GLUE))
+    data = "".join(parts).encode("utf-8")
+    if rng.random() < 0.2:
+        # not valid utf-8 anymore
+        data = data.replace("é".encode("utf-8"), b"\xe9")
+    if rng.random() < 0.1:
+        data = b"\xef\xbb\xbf" + data
+    return data
+
+
+def write_fuzz_folder(folder: Path, rng: random.Random, count: int) -> None:
+    # dates repeat on purpose (a few files per day) so the per-date tables get merged too
+    for i in range(count):
+        day = rng.randint(1, 5)
+        (folder / f"log{i:03d}-2026-03-{day:02d}.txt").write_bytes(fuzz_log(rng))
+
+
+def write_edge_folder(folder: Path) -> None:
+    for i, (name, data) in enumerate(EDGE_CASES.items()):
+        (folder / f"{name}-2026-04-{i % 28 + 1:02d}.txt").write_bytes(data)
+
+
+def stream_stats(
+    files: List[LogPath], characters: List[Character], wordlists: WordLists, rng: random.Random
+) -> DashboardStats:
+    # the follow mode path: every file fed to LogParser a few random sized writes at a time, whole lines only
+    perfiles = []
+    for filepath in files:
+        raw = read_log_bytes(filepath)
+        parser = LogParser(filepath, characters, wordlists)
+        done = 0
+        pos = 0
+        while pos < len(raw):
+            pos = min(len(raw), pos + rng.randint(1, 96))
+            cut = done + whole_lines(raw[done:pos])
+            if cut > done:
+                parser.feed(raw[done:cut])
+                done = cut
+        parser.feed(raw[done:], final=True)
+        perfiles.append(parser.stats)
+    return build_dashboard(perfiles, characters)
+
+
+def _show(value: object) -> str:
+    text = repr(value)
+    return text if len(text) <= 160 else text[:157] + "..."
+
+
+def _same(a: object, b: object) -> bool:
+    # dicts have to match in order too, ties in the panels get broken by it
+    if isinstance(a, dict) and isinstance(b, dict):
+        if list(a) != list(b):
+            return False
+        for key in a:
+            if not _same(a[key], b[key]):
+                return False
+        return True
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        if len(a) != len(b):
+            return False
+        for x, y in zip(a, b):
+            if not _same(x, y):
+                return False
+        return True
+    return a == b
+
+
+def _timeline_view(timeline: Timeline) -> Dict[str, object]:
+    # everything a panel can read out of a timeline
+    count = timeline.session_count()
+    view: Dict[str, object] = {
+        "sessions": count,
+        "session_dates": timeline.session_dates,
+        "session_files": timeline.session_files,
+        "entropies": timeline.entropies,
+        "sentiment": [timeline.sentiment(i, i + 1) for i in range(count)],
+        "tension": [timeline.avg_tension(i, i + 1) for i in range(count)],
+        "avg_tension": timeline.avg_tension(0, count),
+    }
+    for grain in GRANULARITIES:
+        buckets = timeline.buckets(grain)
+        view["buckets:" + grain] = buckets
+        for name in timeline.names:
+            view["series:" + grain + ":" + name] = timeline.bucket_series(name, grain, buckets)
+    return view
+
+
+def diff_stats(want: DashboardStats, got: DashboardStats, limit: int = 10) -> List[str]:
+    # what differs between two boards, empty if they're identical
+    out: List[str] = []
+    if not _same(want.totals, got.totals):
+        out.append(f"totals: {_show(want.totals)} != {_show(got.totals)}")
+    if len(want.per_file) != len(got.per_file):
+        out.append(f"files: {len(want.per_file)} != {len(got.per_file)}")
+        return out
+    for i, (a, b) in enumerate(zip(want.per_file, got.per_file)):
+        for f in fields(FileStats):
+            x = getattr(a, f.name)
+            y = getattr(b, f.name)
+            if not _same(x, y):
+                out.append(f"per_file[{i}] {a.filename} {f.name}: {_show(x)} != {_show(y)}")
+    for table in ("trend", "cooc", "trios", "squads", "keywords", "neighbors"):
+        x = getattr(want, table)
+        y = getattr(got, table)
+        if not _same(x, y):
+            out.append(f"{table}: {_show(x)} != {_show(y)}")
+    x = _timeline_view(want.timeline)
+    y = _timeline_view(got.timeline)
+    for key in x:
+        if not _same(x[key], y[key]):
+            out.append(f"timeline {key}: {_show(x[key])} != {_show(y[key])}")
+    return out[:limit]
+
+
+def diff_reference(want: DashboardStats, reference: List[FileStats], limit: int = 10) -> List[str]:
+    # the board's files against the slow reference records for the same files, REFERENCE_FIELDS only
+    out: List[str] = []
+    bysource = {}
+    for filestats in reference:
+        bysource[filestats.source] = filestats
+    totals = {name: 0 for name in want.totals}
+    for a in want.per_file:
+        b = bysource[a.source]
+        for name in totals:
+            totals[name] = totals[name] + b.mentions.get(name, 0)
+        for name in REFERENCE_FIELDS:
+            x = getattr(a, name)
+            y = getattr(b, name)
+            if not _same(x, y):
+                out.append(f"{a.filename} {name}: {_show(x)} != {_show(y)}")
+    if not _same(want.totals, totals):
+        out.append(f"totals: {_show(want.totals)} != {_show(totals)}")
+    return out[:limit]
+
+
+def check_folder(
+    folder: Path,
+    backends: List[str],
+    characters: List[Character],
+    wordlists: WordLists,
+    rng: Optional[random.Random] = None,
+) -> List[str]:
+    # every backend (and the chunked parser, if rng is given) against the python one, that one against the reference
+    files = list_log_files(folder)
+    want = compute_stats(folder, files, characters, wordlists=wordlists, backend="python")
+    out = []
+    for problem in diff_reference(want, analyze_reference(files, characters, None, wordlists)):
+        out.append(f"reference: {problem}")
+    for backend in backends:
+        if backend == "python":
+            continue
+        got = compute_stats(folder, files, characters, wordlists=wordlists, backend=backend)
+        for problem in diff_stats(want, got):
+            out.append(f"{backend}: {problem}")
+    if rng is not None:
+        for problem in diff_stats(want, stream_stats(files, characters, wordlists, rng)):
+            out.append(f"stream: {problem}")
+    return out
+
+
+def run(rounds: int, seed: int, files: int, backends: List[str]) -> int:
+    rng = random.Random(seed)
+    failed = 0
+    for roundno in range(rounds + 1):
+        with tempfile.TemporaryDirectory(prefix="insider-crosscheck-") as tmp:
+            folder = Path(tmp)
+            # round 0 is the hand-made edge cases, the rest are random
+            if roundno == 0:
+                write_edge_folder(folder)
+                label = "edge cases"
+            else:
+                write_fuzz_folder(folder, rng, files)
+                label = f"round {roundno}"
+            for window in WINDOWS:
+                for characters, wordlists in ((FUZZ_CHARACTERS, FUZZ_WORDS), (CHARACTERS, DEFAULT_WORDS)):
+                    problems = check_folder(folder, backends, characters, replace(wordlists, window=window), rng)
+                    if problems:
+                        failed = failed + 1
+                        print(f"{label} ({window.unit}:{window.size}): {len(problems)} differences")
+                        for problem in problems:
+                            print("  " + problem)
+    checked = (rounds + 1) * len(WINDOWS) * 2
+    print(f"{checked - failed}/{checked} checks identical across {', '.join(backends)} + stream + reference (seed {seed})")
+    return 1 if failed else 0
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="crosscheck", description="check that every analysis backend gives the same stats")
+    parser.add_argument("--rounds", type=int, default=20, help="random folders to try (default 20)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--files", type=int, default=12, help="logs per random folder (default 12)")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--folder", help="check a real folder of logs instead (default roster and word lists)")
+    args = parser.parse_args(argv[1:])
+    if args.folder:
+        folder = Path(args.folder).expanduser().resolve()
+        if not folder.is_dir():
+            print(f"error: not a folder: {folder}")
+            return 2
+        problems = check_folder(folder, args.backends, CHARACTERS, DEFAULT_WORDS)
+        for problem in problems:
+            print(problem)
+        print("identical" if not problems else f"{len(problems)} differences")
+        return 1 if problems else 0
+    return run(args.rounds, args.seed, args.files, args.backends)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
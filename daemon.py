@@ -0,0 +1,333 @@
+# one background process per campaign folder that does all the reading, caching and watching, and hands the board
+# out over a unix socket. every rescan gets written out as a snapshot file and viewers just map that file, so
+# however many people are looking at the campaign the logs get parsed once and the numbers sit in memory once
+# (the os page cache, shared by every viewer)
+# run: python imagination_insider.py FOLDER --daemon, then python imagination_insider.py FOLDER --attach
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from archives import LogPath, source_identity
+from backends import BACKENDS, pick_backend
+from discovery import FolderScanner
+from models import DashboardStats, FileStats, build_dashboard
+from settings import LiveSettings
+from snapshot import export_snapshot, load_snapshot
+
+if TYPE_CHECKING:
+    from cache import FileCache
+
+# how often the folder and the config file get checked for changes (and how often viewers ask for news)
+POLL_SECONDS = 1.0
+# snapshot generations kept on disk, a viewer that was just told about the one before can still open it
+KEEP_SNAPSHOTS = 2
+# requests are one json object per line, nothing legit comes close to this
+MAX_REQUEST = 64 * 1024
+
+
+def daemon_key(folder: Path) -> str:
+    # same folder = same key, no matter who asks
+    return hashlib.sha1(str(folder.resolve()).encode("utf-8")).hexdigest()[:16]
+
+
+def socket_path(directory: Path, folder: Path) -> Path:
+    return directory / (daemon_key(folder) + ".sock")
+
+
+def _check_unix_sockets() -> None:
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("the daemon needs unix sockets, this system doesnt have them")
+
+
+class StatsDaemon:
+    # owns the folder: keeps every file's stats in memory (keyed by path/size/mtime, so only changed files get
+    # parsed again), re-reads the config file, and writes a new snapshot generation whenever anything changed
+    def __init__(
+        self,
+        folder: Path,
+        settings: LiveSettings,
+        cache: Optional[FileCache] = None,
+        backend: str = "auto",
+        scanner: Optional[FolderScanner] = None,
+        duplicates: str = "skip",
+    ) -> None:
+        self.folder = folder
+        # which files count (subfolders, include/exclude), the manifest in it keeps refreshes to changed folders
+        self.scanner = scanner if scanner is not None else FolderScanner(folder)
+        self.settings = settings
+        self.cache = cache
+        self.backend = backend
+        self.duplicates = duplicates
+        # what viewers get told: which snapshot is current and what went wrong last (if anything)
+        self.generation = 0
+        self.snapshot: Optional[Path] = None
+        self.files = 0
+        self.error = ""
+        self.viewers = 0
+        self._records: Dict[str, FileStats] = {}
+        self._seen: Optional[List[Optional[str]]] = None
+        self._directory: Optional[Path] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _snapshot_path(self, generation: int) -> Path:
+        return self._directory / f"{daemon_key(self.folder)}-{generation}.iis"
+
+    def refresh(self) -> bool:
+        # True = something changed and a new generation went out
+        reconfigured = self.settings.poll() is not None
+        if reconfigured:
+            # different roster or word lists, nothing in memory counts anymore (the disk cache still might)
+            self._records = {}
+        files = self.scanner.list()
+        identities = [source_identity(filepath) for filepath in files]
+        if not reconfigured and identities == self._seen:
+            return False
+        current = self.settings.current
+        characters = list(current.characters)
+        perfiles: List[Optional[FileStats]] = []
+        missing: List[LogPath] = []
+        for ident in identities:
+            record = self._records.get(ident) if ident is not None else None
+            perfiles.append(record)
+        for filepath, record in zip(files, perfiles):
+            if record is None:
+                missing.append(filepath)
+        if missing:
+            parsed = BACKENDS[pick_backend(missing, self.backend)](missing, characters, self.cache, current.words)
+            pos = 0
+            for i in range(len(perfiles)):
+                if perfiles[i] is None:
+                    perfiles[i] = parsed[pos]
+                    pos = pos + 1
+        records = {}
+        for ident, record in zip(identities, perfiles):
+            if ident is not None:
+                records[ident] = record
+        self._records = records
+        self._publish(build_dashboard(perfiles, characters, self.duplicates))
+        self._seen = identities
+        return True
+
+    def _publish(self, stats: DashboardStats) -> None:
+        generation = self.generation + 1
+        path = self._snapshot_path(generation)
+        export_snapshot(stats, path)
+        with self._lock:
+            self.generation = generation
+            self.snapshot = path
+            self.files = len(stats.per_file)
+        try:
+            self._snapshot_path(generation - KEEP_SNAPSHOTS).unlink()
+        except OSError:
+            pass
+
+    def _refresh_safely(self) -> None:
+        try:
+            self.refresh()
+            error = ""
+        except (OSError, ValueError) as exc:
+            # a file vanished mid-scan, a log or snapshot couldnt be read or the disk is full: keep serving the last
+            # good board and try again. anything else is a bug and stops the daemon instead of failing every second
+            error = str(exc)
+        with self._lock:
+            self.error = error
+
+    def status(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "folder": str(self.folder),
+                "generation": self.generation,
+                "snapshot": str(self.snapshot) if self.snapshot is not None else None,
+                "files": self.files,
+                "viewers": self.viewers,
+                "error": self.error,
+                "config_error": self.settings.error,
+            }
+
+    def _viewer(self, delta: int) -> None:
+        with self._lock:
+            self.viewers = self.viewers + delta
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def serve(self, path: Path) -> None:
+        # blocks until stop() (or a "stop" request, or ctrl+c)
+        _check_unix_sockets()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            if _answers(path):
+                raise OSError(f"a daemon is already running for {self.folder} ({path})")
+            # left over from one that crashed
+            path.unlink()
+        self._directory = path.parent
+        for old in self._directory.glob(daemon_key(self.folder) + "-*.iis"):
+            try:
+                old.unlink()
+            except OSError:
+                pass
+        # anyone in the group can attach (people sharing a server usually share a group), nobody else ever can:
+        # the socket gets made with those permissions instead of being chmod'ed after it's already listening
+        oldmask = os.umask(0o117)
+        try:
+            server = socketserver.ThreadingUnixStreamServer(str(path), _Handler)
+        finally:
+            os.umask(oldmask)
+        server.daemon_threads = True
+        server.stats_daemon = self
+        thread = threading.Thread(target=server.serve_forever, name="insider-daemon", daemon=True)
+        thread.start()
+        try:
+            # socket's up first, viewers that show up during the first scan just wait for it
+            self._refresh_safely()
+            while not self._stop.wait(POLL_SECONDS):
+                self._refresh_safely()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+            server.server_close()
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            # viewers still open keep their mapping, the files just stop having names
+            for old in self._directory.glob(daemon_key(self.folder) + "-*.iis"):
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # one connection per viewer, kept open: one json request per line, one json reply per line
+    def handle(self) -> None:
+        daemon: StatsDaemon = self.server.stats_daemon
+        daemon._viewer(1)
+        try:
+            while True:
+                line = self.rfile.readline(MAX_REQUEST)
+                if not line or daemon._stop.is_set():
+                    return
+                try:
+                    request = json.loads(line)
+                    op = request.get("op")
+                except (ValueError, AttributeError):
+                    self._reply({"error": "requests are one json object per line"})
+                    continue
+                if op == "board":
+                    self._reply(daemon.status())
+                elif op == "stop":
+                    self._reply({"ok": True})
+                    daemon.stop()
+                    return
+                else:
+                    self._reply({"error": f"unknown op: {op}"})
+        except OSError:
+            # viewer went away mid-reply
+            return
+        finally:
+            daemon._viewer(-1)
+
+    def _reply(self, message: Dict[str, object]) -> None:
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+def _answers(path: Path) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(2.0)
+            sock.connect(str(path))
+        return True
+    except OSError:
+        return False
+
+
+class DaemonClient:
+    # a viewer's end: asks the daemon which snapshot is current and maps it, raises OSError once the daemon is gone
+    def __init__(self, path: Path, timeout: float = 10.0) -> None:
+        _check_unix_sockets()
+        self.path = path
+        self.timeout = timeout
+        # the last status reply, and the snapshot that's on screen
+        self.status: Dict[str, object] = {}
+        self.shown: Optional[str] = None
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+
+    def _ask(self, request: Dict[str, object]) -> Dict[str, object]:
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(str(self.path))
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+            self._reader = sock.makefile("rb")
+        try:
+            self._sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            line = self._reader.readline()
+        except OSError:
+            self.close()
+            raise
+        if not line:
+            self.close()
+            raise ConnectionError("the daemon went away")
+        reply = json.loads(line)
+        if "error" in reply and "generation" not in reply:
+            raise ValueError(f"daemon: {reply['error']}")
+        return reply
+
+    def board_status(self) -> Dict[str, object]:
+        self.status = self._ask({"op": "board"})
+        return self.status
+
+    def load(self) -> DashboardStats:
+        # the current board, waits out the daemon's first scan if it's still going
+        while True:
+            status = self.board_status()
+            if status["snapshot"] is not None:
+                break
+            time.sleep(POLL_SECONDS)
+        return self._open(status)
+
+    def poll(self) -> Optional[DashboardStats]:
+        # a new board if the daemon published one since the last load/poll, None otherwise
+        status = self.board_status()
+        if status["snapshot"] is None or status["snapshot"] == self.shown:
+            return None
+        return self._open(status)
+
+    def _open(self, status: Dict[str, object]) -> DashboardStats:
+        try:
+            stats = load_snapshot(Path(status["snapshot"]))
+        except FileNotFoundError:
+            # two generations went out since we asked, ask again
+            status = self.board_status()
+            stats = load_snapshot(Path(status["snapshot"]))
+        self.shown = status["snapshot"]
+        return stats
+
+    def stop_daemon(self) -> None:
+        self._ask({"op": "stop"})
+        self.close()
+
+    def close(self) -> None:
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
@@ -0,0 +1,241 @@
+# finding the logs: the whole folder tree (season/arc/session.txt and so on), walked with os.scandir so a folder
+# listing already says what's a file and what's a folder without a stat per entry, sibling folders listed side by
+# side in threads, and a manifest of every folder's listing kept on disk so a refresh only re-lists folders whose
+# mtime moved (adding, removing or renaming a file bumps its folder's mtime, nothing else does)
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from archives import MEMBER_SEP, ArchiveMember, LogPath, is_log_name, zip_members
+from models import sort_parts
+
+# bump this if the manifest layout changes, old ones just get thrown away
+MANIFEST_VERSION = 1
+# folders listed at once (listing is nearly all waiting on the disk, threads are fine for that)
+SCAN_THREADS = 8
+# a folder whose mtime is this close to when it got listed isnt trusted next time: something could have landed
+# in the same mtime tick right after the listing and the mtime wouldnt show it
+RACY_NS = 2_000_000_000
+
+
+@dataclass(frozen=True)
+class ScanOptions:
+    # include/exclude are shell patterns (*, ?, [abc]) matched against the path inside the folder with forward
+    # slashes ("season2/arc1/x.txt", a zip member is "old.zip::x.txt") or just the name; * goes across folders.
+    # an excluded folder doesnt get walked at all, with includes only matching logs are kept
+    recursive: bool = True
+    include: Tuple[str, ...] = ()
+    exclude: Tuple[str, ...] = ()
+
+
+def _matches(patterns: Tuple[str, ...], rel: str, name: str) -> bool:
+    for pattern in patterns:
+        if fnmatch.fnmatch(rel, pattern) or fnmatch.fnmatch(name, pattern):
+            return True
+    return False
+
+
+def _wanted(options: ScanOptions, rel: str, name: str) -> bool:
+    if _matches(options.exclude, rel, name):
+        return False
+    return not options.include or _matches(options.include, rel, name)
+
+
+def manifest_path(directory: Path, folder: Path) -> Path:
+    # one manifest per folder
+    key = hashlib.sha1(str(folder.resolve()).encode("utf-8")).hexdigest()[:16]
+    return directory / (key + ".json")
+
+
+def _list_dir(path: str, old: Optional[dict], old_zips: Dict[str, dict], now: int) -> Tuple[dict, Dict[str, dict], bool]:
+    # one folder's (listing, zips in it, whether it had to be read again); the old listing gets reused if the
+    # folder's mtime didnt move
+    st = os.stat(path)
+    if old is not None and old["mtime"] == st.st_mtime_ns and old["mtime"] < old["scanned"] - RACY_NS:
+        listing = old
+        fresh = False
+    else:
+        logs = []
+        zips = []
+        dirs = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                # folder links dont get followed (a link back up the tree would never end)
+                if entry.is_dir(follow_symlinks=False):
+                    # .git and friends
+                    if not entry.name.startswith("."):
+                        dirs.append(entry.name)
+                elif entry.is_file():
+                    if entry.name.lower().endswith(".zip"):
+                        zips.append(entry.name)
+                    elif is_log_name(entry.name):
+                        logs.append(entry.name)
+        listing = {"mtime": st.st_mtime_ns, "scanned": now, "logs": logs, "zips": zips, "dirs": dirs}
+        fresh = True
+    # a zip can be rewritten without its folder noticing, those get checked on their own
+    found_zips = {}
+    for name in listing["zips"]:
+        zippath = os.path.join(path, name)
+        try:
+            zst = os.stat(zippath)
+        except OSError:
+            continue
+        seen = old_zips.get(name)
+        if seen is not None and seen["size"] == zst.st_size and seen["mtime"] == zst.st_mtime_ns:
+            found_zips[name] = seen
+            continue
+        members = []
+        for member in zip_members(Path(zippath)):
+            members.append([member.member, member.crc, member.size])
+        found_zips[name] = {"size": zst.st_size, "mtime": zst.st_mtime_ns, "members": members}
+        fresh = True
+    return (listing, found_zips, fresh)
+
+
+class FolderScanner:
+    # lists a folder's logs over and over (every refresh), keeping the manifest in memory between calls and on
+    # disk between runs (manifest=None = in memory only)
+    def __init__(
+        self,
+        folder: Path,
+        options: ScanOptions = ScanOptions(),
+        manifest: Optional[Path] = None,
+        threads: int = SCAN_THREADS,
+    ) -> None:
+        self.folder = folder
+        self.options = options
+        self.manifest = manifest
+        self.threads = threads
+        # how many folders the last list() had to read again (the rest came out of the manifest)
+        self.relisted = 0
+        self._dirs: Dict[str, dict] = {}
+        self._zips: Dict[str, Dict[str, dict]] = {}
+        self._loaded = False
+
+    def _load(self) -> None:
+        self._loaded = True
+        if self.manifest is None:
+            return
+        try:
+            data = json.loads(self.manifest.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION or data.get("folder") != str(self.folder):
+            return
+        self._dirs = data.get("dirs", {})
+        self._zips = data.get("zips", {})
+
+    def _save(self) -> None:
+        if self.manifest is None:
+            return
+        data = {"version": MANIFEST_VERSION, "folder": str(self.folder), "dirs": self._dirs, "zips": self._zips}
+        try:
+            self.manifest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.manifest.with_name(self.manifest.name + f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp, self.manifest)
+        except OSError:
+            # no manifest next time just means a full walk
+            pass
+
+    def list(self) -> List[LogPath]:
+        # every log under the folder, sorted by path (see file_sort_key, the folder missing raises OSError)
+        if not self._loaded:
+            self._load()
+        options = self.options
+        now = time.time_ns()
+        dirs: Dict[str, dict] = {}
+        zips: Dict[str, Dict[str, dict]] = {}
+        filepairs = []
+        relisted = 0
+        # walked a level at a time, every folder on a level listed in parallel
+        level = [""]
+        pool = None
+        try:
+            while level:
+                jobs = []
+                for rel in level:
+                    path = os.path.join(self.folder, rel) if rel else str(self.folder)
+                    jobs.append((path, self._dirs.get(rel), self._zips.get(rel, {}), now))
+                if len(jobs) > 1 and self.threads > 1:
+                    if pool is None:
+                        pool = ThreadPoolExecutor(max_workers=self.threads)
+                    results = list(pool.map(_list_safely, jobs))
+                else:
+                    results = []
+                    for job in jobs:
+                        results.append(_list_safely(job))
+                below = []
+                for rel, result in zip(level, results):
+                    if isinstance(result, OSError):
+                        if not rel:
+                            # the folder itself, same error as always
+                            raise result
+                        # a subfolder that went away or cant be read counts as empty
+                        continue
+                    listing, found_zips, fresh = result
+                    dirs[rel] = listing
+                    if found_zips:
+                        zips[rel] = found_zips
+                    if fresh:
+                        relisted = relisted + 1
+                    prefix = rel + "/" if rel else ""
+                    # joined onto one Path per folder, parsing a whole path per file is most of a warm walk
+                    base = self.folder.joinpath(*rel.split("/")) if rel else self.folder
+                    # same key as models.file_sort_key, the folder's part only worked out once
+                    parts = sort_parts(str(base))
+                    for name in listing["logs"]:
+                        if _wanted(options, prefix + name, name):
+                            path = base / name
+                            filepairs.append(((parts + (name.lower(),), str(path)), path))
+                    for name, seen in found_zips.items():
+                        ziprel = prefix + name
+                        if _matches(options.exclude, ziprel, name):
+                            continue
+                        archive = base / name
+                        for member, crc, size in seen["members"]:
+                            source = ArchiveMember(archive=archive, member=member, crc=crc, size=size)
+                            if _wanted(options, ziprel + MEMBER_SEP + member, source.name):
+                                filepairs.append(((parts + (source.name.lower(),), str(source)), source))
+                    if options.recursive:
+                        for name in listing["dirs"]:
+                            if not _matches(options.exclude, prefix + name, name):
+                                below.append(prefix + name)
+                level = below
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        filepairs.sort(key=lambda pair: pair[0])
+
+        files = []
+        for _, path in filepairs:
+            files.append(path)
+        # folders that went away (or got excluded) drop out of the manifest
+        changed = relisted > 0 or len(dirs) != len(self._dirs) or len(zips) != len(self._zips)
+        self._dirs = dirs
+        self._zips = zips
+        self.relisted = relisted
+        if changed:
+            self._save()
+        return files
+
+
+def _list_safely(job: tuple) -> Union[Tuple[dict, Dict[str, dict], bool], OSError]:
+    try:
+        return _list_dir(*job)
+    except OSError as exc:
+        return exc
+
+
+def list_log_files(folder: Path, options: ScanOptions = ScanOptions()) -> List[LogPath]:
+    # gets all those stupid files and sorts them by name
+    # (.txt, .txt.gz/.bz2/.xz, and every .txt inside a .zip, in every subfolder too)
+    return FolderScanner(folder, options).list()
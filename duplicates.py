@@ -0,0 +1,123 @@
+# copies in the archive: "session-2026-03-01 (1).txt", a draft that got exported again, the same log zipped and
+# unzipped. every file's record carries a hash of its bytes and a minhash sketch of its lines (the SKETCH smallest
+# hashes out of every line's words, LogParser keeps both as it reads), so spotting copies never reads anything
+# again. byte for byte copies get dropped from the board instead of counting everything twice, near copies just
+# get listed (a draft and its final version can both be real sessions) unless asked to drop those too.
+# a shingle is a whole line rather than a run of words: logs are a line per message anyway, and hashing every
+# word run cost the parser ~15% where a line costs next to nothing
+from __future__ import annotations
+
+import hashlib
+import heapq
+import zlib
+from array import array
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, List, Set
+
+if TYPE_CHECKING:
+    from models import FileStats
+
+# how many of the smallest line hashes make up a file's sketch
+SKETCH = 128
+# estimated share of distinct lines two files have in common (1.0 = all of them) from which they count as the same log
+NEAR_SIMILARITY = 0.85
+# a file needs this many distinct lines before it can be a near copy of anything, short logs look alike by accident
+MIN_SHINGLES = 32
+# the smallest few hashes of every sketch go in a lookup, so only files that share one get compared
+PROBE = 16
+# skip = exact copies dont count, near copies do (both get listed), near = neither counts, keep = everything
+# counts and gets listed, off = nobody looks
+DUPLICATE_MODES = ("skip", "near", "keep", "off")
+
+
+@dataclass(frozen=True)
+class Duplicate:
+    # source = the copy, kept = the file it's a copy of
+    source: str
+    kept: str
+    # estimated share of lines in common, 1.0 for byte for byte copies
+    similarity: float
+    exact: bool
+
+
+def digester():
+    # LogParser feeds it the bytes as they come in, so a followed log ends up with the same hash
+    return hashlib.blake2b(digest_size=16)
+
+
+def content_digest(raw: bytes) -> str:
+    hasher = digester()
+    hasher.update(raw)
+    return hasher.hexdigest()
+
+
+def shingle_hash(tokens: List[str]) -> int:
+    # a line by its words, so line endings, spacing, case and punctuation dont matter
+    return zlib.crc32(" ".join(tokens).encode("utf-8"))
+
+
+def merge_sketch(sketch: array, hashes: Set[int]) -> array:
+    # the smallest SKETCH out of the old sketch plus new hashes = the smallest SKETCH of everything so far
+    if not hashes:
+        return sketch
+    pool = set(sketch)
+    pool.update(hashes)
+    return array("I", heapq.nsmallest(SKETCH, pool))
+
+
+def similarity(a: Iterable[int], b: Iterable[int]) -> float:
+    # estimated jaccard of two files' lines: of the smallest SKETCH hashes across both, the share both have
+    mine = set(a)
+    theirs = set(b)
+    union = heapq.nsmallest(SKETCH, mine | theirs)
+    if not union:
+        return 0.0
+    both = 0
+    for value in union:
+        if value in mine and value in theirs:
+            both = both + 1
+    return both / len(union)
+
+
+def dropped(duplicate: Duplicate, mode: str) -> bool:
+    # whether a copy gets left off the board in that mode
+    return mode == "near" or (mode == "skip" and duplicate.exact)
+
+
+def find_duplicates(perfiles: List[FileStats]) -> Dict[int, Duplicate]:
+    # file index -> what it's a copy of. the one kept is the biggest (a finished export beats its draft), then the
+    # shortest name ("x.txt" beats "x (1).txt"), then whichever sorts first
+    order = sorted(range(len(perfiles)), key=lambda i: (-perfiles[i].chars, len(perfiles[i].filename), i))
+    bydigest: Dict[str, int] = {}
+    probes: Dict[int, List[int]] = {}
+    found: Dict[int, Duplicate] = {}
+    for i in order:
+        filestats = perfiles[i]
+        # empty files (and records without a hash, like a snapshot's) are nobody's copy
+        if not filestats.chars or not filestats.digest:
+            continue
+        kept = bydigest.get(filestats.digest)
+        if kept is not None:
+            found[i] = Duplicate(filestats.source, perfiles[kept].source, 1.0, True)
+            continue
+        sketch = filestats.sketch
+        if len(sketch) >= MIN_SHINGLES:
+            best = 0.0
+            bestidx = -1
+            checked = set()
+            for value in sketch[:PROBE]:
+                for j in probes.get(value, ()):
+                    if j in checked:
+                        continue
+                    checked.add(j)
+                    score = similarity(sketch, perfiles[j].sketch)
+                    if score > best:
+                        best = score
+                        bestidx = j
+            if best >= NEAR_SIMILARITY:
+                found[i] = Duplicate(filestats.source, perfiles[bestidx].source, best, False)
+                continue
+            for value in sketch[:PROBE]:
+                probes.setdefault(value, []).append(i)
+        bydigest[filestats.digest] = i
+    return found
@@ -0,0 +1,166 @@
+# follow mode: a log that's still being written gets checked every second, only the bytes added since last time
+# get parsed and the board is patched with what they added (the rest of the archive never gets refolded)
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from config import CHARACTERS, DEFAULT_WORDS, Character, WordLists
+from discovery import FolderScanner, list_log_files
+from helpers import whole_lines
+from models import DashboardStats, FileStats, LogParser, ParseDelta, build_dashboard, file_sort_key
+
+# the start of the file gets compared every time it changes, if these bytes differ it was rewritten
+HEAD_BYTES = 256
+
+
+def newest_log(folder: Path, scanner: Optional[FolderScanner] = None) -> Optional[Path]:
+    # the plain .txt log written to most recently (compressed logs and zip members dont grow)
+    newest = None
+    newest_mtime = 0.0
+    files = scanner.list() if scanner is not None else list_log_files(folder)
+    for filepath in files:
+        if not isinstance(filepath, Path) or filepath.suffix.lower() != ".txt":
+            continue
+        try:
+            mtime = filepath.stat().st_mtime
+        except OSError:
+            continue
+        if newest is None or mtime > newest_mtime:
+            newest = filepath
+            newest_mtime = mtime
+    return newest
+
+
+class FileFollower:
+    # remembers how far into the file it got: byte offset, the parser's open session / blank run / window,
+    # and a half-written last line; starts over if the file got truncated, replaced or rewritten
+    def __init__(self, path: Path, characters: List[Character] = CHARACTERS, wordlists: WordLists = DEFAULT_WORDS) -> None:
+        self.path = path
+        self.characters = characters
+        self.wordlists = wordlists
+        # how many times it had to start over, and whether the last poll did
+        self.resyncs = 0
+        self.resynced = False
+        self._restart()
+
+    def _restart(self) -> None:
+        # text isnt kept, it's on disk anyway and it only keeps growing
+        self.parser = LogParser(self.path, self.characters, self.wordlists, keep_text=False)
+        self._pending_restart = False
+        self._reset_reading()
+
+    def _reset_reading(self) -> None:
+        # bytes after the last line break, they wait until the line is done
+        self._tail = b""
+        self._head = b""
+        self._inode: Optional[int] = None
+        self._mtime: Optional[int] = None
+        # bytes handed out by fetch so far (fetch can run ahead of feed, so this isnt parser.offset)
+        self._fetched = 0
+
+    @property
+    def stats(self) -> FileStats:
+        return self.parser.stats
+
+    def poll(self) -> Optional[ParseDelta]:
+        # None = nothing new, raises OSError if the file is gone
+        # after a re-sync (resynced=True) .stats is a brand new record, the delta is the whole file
+        self.resynced = False
+        data = self.fetch()
+        if data is None:
+            return None
+        return self.feed(data)
+
+    def fetch(self) -> Optional[bytes]:
+        # the reading half of poll, it never touches the parser so it can run on a worker thread while the
+        # board is on screen. the finished lines added since last time (None = nothing new), feed them next
+        info = os.stat(self.path)
+        seen = self._fetched + len(self._tail)
+        if self._inode is not None and (info.st_ino != self._inode or info.st_size < seen):
+            self._start_over()
+            seen = 0
+        elif info.st_size == seen and info.st_mtime_ns == self._mtime:
+            return None
+        with open(self.path, "rb") as handle:
+            if self._head and handle.read(len(self._head)) != self._head:
+                self._start_over()
+                seen = 0
+            handle.seek(seen)
+            new = handle.read(max(0, info.st_size - seen))
+        self._inode = info.st_ino
+        self._mtime = info.st_mtime_ns
+        if len(self._head) < HEAD_BYTES:
+            self._head = (self._head + new)[:HEAD_BYTES]
+
+        data = self._tail + new
+        cut = whole_lines(data)
+        self._tail = data[cut:]
+        if not cut and not self._pending_restart:
+            return None
+        self._fetched = self._fetched + cut
+        return data[:cut]
+
+    def feed(self, data: bytes) -> ParseDelta:
+        # the parsing half: whatever fetch returned, in order. the parser only starts over here
+        self.resynced = False
+        if self._pending_restart:
+            self.parser = LogParser(self.path, self.characters, self.wordlists, keep_text=False)
+            self._pending_restart = False
+            self.resyncs = self.resyncs + 1
+            self.resynced = True
+        return self.parser.feed(data)
+
+    def _start_over(self) -> None:
+        # the file was truncated, replaced or rewritten: read it from the top, the next feed gets a new parser
+        self._reset_reading()
+        self._pending_restart = True
+
+
+class LiveBoard:
+    # a folder's board with the followed file's record swapped for the follower's, kept current by poll()
+    def __init__(self, stats: DashboardStats, follower: FileFollower) -> None:
+        self.follower = follower
+        follower.poll()
+        self.stats = stats
+        self._index = 0
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        # put the follower's record where the file sorts (dropping the folder scan's copy of it) and refold
+        source = str(self.follower.path)
+        key = file_sort_key(self.follower.path.name, source)
+        perfiles = []
+        for filestats in self.stats.per_file:
+            if filestats.source != source:
+                perfiles.append(filestats)
+        idx = 0
+        while idx < len(perfiles) and file_sort_key(perfiles[idx].filename, perfiles[idx].source) < key:
+            idx = idx + 1
+        perfiles.insert(idx, self.follower.stats)
+        self._index = idx
+        # the folder's copies are already sorted out (and the followed file has to stay at idx)
+        duplicates = self.stats.duplicates
+        self.stats = build_dashboard(perfiles, self.follower.characters, "off")
+        self.stats.duplicates = duplicates
+
+    def poll(self) -> bool:
+        # True = new lines came in (or the file was re-read from scratch) and self.stats is a new board
+        data = self.fetch()
+        if data is None:
+            return False
+        self.apply(data)
+        return True
+
+    def fetch(self) -> Optional[bytes]:
+        # file reading only (worker thread), see FileFollower.fetch
+        return self.follower.fetch()
+
+    def apply(self, data: bytes) -> None:
+        # what fetch returned gets parsed and patched in, self.stats is a new board after this
+        delta = self.follower.feed(data)
+        if self.follower.resynced:
+            self._rebuild()
+        else:
+            self.stats = self.stats.with_grown_file(self._index, delta)
@@ -3,18 +3,20 @@ from __future__ import annotations
 
 import math
 import re
+from array import array
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import IO, Dict, List, Optional, Tuple
 
 from config import (
-    COMBAT_WORDS,
     DATE_RE,
+    DEFAULT_WORDS,
     INTENSITY_CHARS,
     NEG_WORDS,
     POS_WORDS,
     STOPWORDS,
     _WORD_RE,
 )
+from lexicon import Lexicon, combat_lexicon
 
 
 def clamp(value: int, low: int, high: int) -> int:
@@ -42,9 +44,46 @@ def parse_date_from_filename(name: str) -> str:
     return "unknown"
 
 
+def decode_text(raw: bytes) -> str:
+    # same as read_text would give: utf-8, bad bytes replaced, any newline style turned into \n
+    text = raw.decode("utf-8", errors="replace")
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return normalize(text)
+
+
 def read_txt(path: Path) -> str:
-    raw = path.read_text(encoding="utf-8", errors="replace")
-    return normalize(raw)
+    return decode_text(path.read_bytes())
+
+
+_NEWLINE_BYTES_RE = re.compile(rb"\r\n|\r|\n")
+
+
+def line_start_offsets(raw: bytes) -> array:
+    # byte offset where each line starts, lines match decode_text(raw).split("\n") one to one
+    offsets = array("Q", [0])
+    for match in _NEWLINE_BYTES_RE.finditer(raw):
+        offsets.append(match.end())
+    return offsets
+
+
+def whole_lines(data: bytes) -> int:
+    # how much of data is finished lines (a \r right at the end might still get its \n)
+    cut = max(data.rfind(b"\n"), data.rfind(b"\r")) + 1
+    if cut and cut == len(data) and data[cut - 1:cut] == b"\r":
+        cut = max(data.rfind(b"\n", 0, cut - 1), data.rfind(b"\r", 0, cut - 1)) + 1
+    return cut
+
+
+def read_lines_from(fh: IO[bytes], offsets: List[int]) -> List[str]:
+    # pull a few lines back out of an open log without reading the whole thing
+    out = []
+    for offset in offsets:
+        fh.seek(offset)
+        raw = fh.readline()
+        # readline only stops at \n, a bare \r ends the line too
+        raw = _NEWLINE_BYTES_RE.split(raw, maxsplit=1)[0]
+        out.append(decode_text(raw))
+    return out
 
 
 def heat_color(ratio: float) -> str:
@@ -58,20 +97,6 @@ def heat_color(ratio: float) -> str:
     return "#b8f2b2"
 
 
-def heat_tags(count: int, max_count: int, width: int = 14) -> str:
-    if max_count <= 0:
-        filled = 0
-        ratio = 0.0
-    else:
-        ratio = count / max_count
-        filled = int(round(ratio * width))
-        filled = clamp(filled, 0, width)
-
-    empty = width - filled
-    color = heat_color(ratio)
-    return f"[{color}]" + ("#" * filled) + "[/]" + "[#5c607f]" + ("·" * empty) + "[/]"
-
-
 def sparkline(values: List[int], width: int = 26) -> str:
     # turns numbers into little block characters (the mini bar chart thing)
     blocks = "▁▂▃▄▅▆▇█"
@@ -118,48 +143,41 @@ def tokenize(text: str) -> List[str]:
     return result
 
 
-def calc_tension(text: str) -> int:
-    # rough tension score 0 to 100
-    if not text.strip():
-        return 0
+def tension_parts(line: str, tokens: List[str], combat: Lexicon) -> List[int]:
+    # one non-blank line's share of calc_tension (tokens = tokenize(line)), so a growing log can keep running totals:
+    # [chars, ! and ?, words, combat weight, caps, short lines, lines]
+    punct = 0
+    for ch in INTENSITY_CHARS:
+        punct = punct + line.count(ch)
+    combathits = combat.total(tokens)
+    caps = 0
+    for ch in line:
+        if ch.isupper():
+            caps = caps + 1
+    return [len(line), punct, len(tokens), combathits, caps, 1 if len(line) <= 60 else 0, 1]
+
+
+def add_tension_parts(total: List[int], parts: List[int]) -> None:
+    for i in range(len(parts)):
+        total[i] = total[i] + parts[i]
 
-    lines = []
-    for line in text.splitlines():
-        if line.strip():
-            lines.append(line)
-    if not lines:
-        return 0
 
-    joined = "\n".join(lines)
-    total_chars = len(joined)
+def tension_score(total: List[int]) -> int:
+    # rough tension score 0 to 100 from tension_parts added up
+    chars, punct, words, combathits, caps, shortlines, lines = total
+    if lines < 1:
+        return 0
+    # the lines get joined with \n between them
+    total_chars = chars + lines - 1
     if total_chars < 1:
         total_chars = 1
-
-    punct = 0
-    for ch in INTENSITY_CHARS:
-        punct = punct + joined.count(ch)
     punct_rate = punct / total_chars
-
-    words = tokenize(joined)
-    total_words = len(words)
+    total_words = words
     if total_words < 1:
         total_words = 1
-    combathits = 0
-    for word in words:
-        if word in COMBAT_WORDS:
-            combathits = combathits + 1
     combat_rate = combathits / total_words
-
-    caps = 0
-    for ch in joined:
-        if ch.isupper():
-            caps = caps + 1
     caps_rate = caps / total_chars
-    shortlines = 0
-    for line in lines:
-        if len(line) <= 60:
-            shortlines = shortlines + 1
-    pace = shortlines / len(lines)
+    pace = shortlines / lines
 
     # mash it all together into one score (punct + combat + caps + pace)
     p1 = int(punct_rate * 6000)
@@ -181,6 +199,17 @@ def calc_tension(text: str) -> int:
     return clamp(final, 0, 100)
 
 
+def calc_tension(text: str, combat: Optional[Lexicon] = None) -> int:
+    # rough tension score 0 to 100 (combat = weighted combat words/phrases, config.py's by default)
+    if combat is None:
+        combat = combat_lexicon(DEFAULT_WORDS)
+    total = [0] * 7
+    for line in text.splitlines():
+        if line.strip():
+            add_tension_parts(total, tension_parts(line, tokenize(line), combat))
+    return tension_score(total)
+
+
 def build_alias_regex(aliases: Tuple[str, ...]) -> List[re.Pattern[str]]:
     # one regex per alias so we dont match "sunset" inside "sunsetter" or whatever
     result = []
@@ -215,56 +244,67 @@ def extract_lines_with_mentions(text: str, alias_patterns: List[re.Pattern[str]]
     return out
 
 
-def div(title: str = "") -> str:
-    # divider line for the ui, optional title in the middle
-    if title:
-        return f"[#6f7398]──── {title} ────[/]"
-    return "[#6f7398]────────────────────[/]"
-
-
 # line that is just dashes (session separator)
 _DASH_SEP_RE = re.compile(r"^\s*[-–—]{3,}\s*$")
 
 
-def _chunk_has_content(chunk: List[str]) -> bool:
-    for line in chunk:
-        if line.strip():
-            return True
-    return False
-
+class SessionSplitter:
+    # split_session_spans one line at a time: sessions are split by --- or by 2+ blank lines
+    def __init__(self) -> None:
+        self.count = 0
+        self.curstart = 0
+        self.has_content = False
+        self.blank_run = 0
 
-def split_sessions(text: str) -> List[str]:
-    # sessions are split by --- or by 2+ blank lines
-    lines = text.splitlines()
-    out = []
-    cur = []
-    blank_run = 0
-
-    for line in lines:
+    def feed(self, line: str) -> Tuple[bool, Optional[Tuple[int, int]]]:
+        # (was this a session break, the (start, end) span it closed if the session had anything in it)
+        i = self.count
+        self.count = i + 1
         if _DASH_SEP_RE.match(line):
-            if _chunk_has_content(cur):
-                out.append(cur)
-            cur = []
-            blank_run = 0
-            continue
+            closed = (self.curstart, i) if self.has_content else None
+            self.curstart = i + 1
+            self.has_content = False
+            self.blank_run = 0
+            return (True, closed)
         if not line.strip():
-            blank_run = blank_run + 1
-            cur.append(line)
-            if blank_run >= 2:
-                if _chunk_has_content(cur):
-                    out.append(cur)
-                cur = []
-                blank_run = 0
-            continue
-        blank_run = 0
-        cur.append(line)
-
-    if _chunk_has_content(cur):
-        out.append(cur)
+            self.blank_run = self.blank_run + 1
+            if self.blank_run >= 2:
+                closed = (self.curstart, i + 1) if self.has_content else None
+                self.curstart = i + 1
+                self.has_content = False
+                self.blank_run = 0
+                return (True, closed)
+            return (False, None)
+        self.blank_run = 0
+        self.has_content = True
+        return (False, None)
+
+    def open_span(self) -> Optional[Tuple[int, int]]:
+        # the session still going at the end, if it has anything in it
+        if self.has_content:
+            return (self.curstart, self.count)
+        return None
+
+
+def split_session_spans(lines: List[str]) -> List[Tuple[int, int]]:
+    # gives (start, end) line ranges so callers can add up per-line numbers per session
+    out = []
+    splitter = SessionSplitter()
+    for line in lines:
+        _, closed = splitter.feed(line)
+        if closed is not None:
+            out.append(closed)
+    last = splitter.open_span()
+    if last is not None:
+        out.append(last)
+    return out
+
 
+def split_sessions(text: str) -> List[str]:
+    lines = text.splitlines()
     sessions = []
-    for chunk in out:
-        s = "\n".join(chunk).strip()
+    for start, end in split_session_spans(lines):
+        s = "\n".join(lines[start:end]).strip()
         if s:
             sessions.append(s)
     return sessions
@@ -308,19 +348,6 @@ def shannon_entropy(counts: Dict[str, int]) -> float:
     return float(raw / 1000.0)
 
 
-def entropy_bar(x: float, width: int = 10) -> str:
-    if x < 0.0:
-        x = 0.0
-    elif x > 1.0:
-        x = 1.0
-    filled = int(round(x * width))
-    filled = clamp(filled, 0, width)
-
-    empty = width - filled
-    color = heat_color(x)
-    return f"[{color}]" + ("█" * filled) + "[/]" + "[#3b3f5c]" + ("·" * empty) + "[/]"
-
-
 def entropy_spark(values: List[float], width: int = 7) -> str:
     blocks = "▁▂▃▄▅▆▇█"
     if not values:
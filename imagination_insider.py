@@ -1,11 +1,28 @@
 # run: python imagination_insider.py [folder]
 from __future__ import annotations
 
+import argparse
+import multiprocessing
+import sqlite3
 import sys
 from pathlib import Path
 from typing import List
 
 from app import ImaginationInsider
+from archives import resolve_source
+from backends import BACKEND_CHOICES, compute_stats
+from cache import FileCache
+from daemon import DaemonClient, StatsDaemon, socket_path
+from discovery import FolderScanner, ScanOptions, manifest_path
+from duplicates import DUPLICATE_MODES
+from follow import FileFollower, LiveBoard, newest_log
+from models import DashboardStats, build_dashboard
+from partials import compute_partial, load_merged, partial_to_dashboard, write_partial
+from progressive import ProgressiveScan
+from settings import LiveSettings
+from snapshot import export_snapshot, load_snapshot
+from store import StoreSync, files_mentioning, open_store, run_sql, tension_by_month
+from workspace import Workspace, add_campaign, load_workspace, remove_campaign
 
 
 def _config_dir() -> Path:
@@ -25,28 +42,350 @@ def _read_last_folder() -> Path | None:
     return Path(s).expanduser().resolve() if s else None
 
 
+def _cache_dir() -> Path:
+    return _config_dir() / "cache"
+
+
+def _scanner(args: argparse.Namespace, folder: Path) -> FolderScanner:
+    # the folder's listing is remembered in ~/.imagination_insider/manifests, so a rescan only re-reads changed folders
+    options = ScanOptions(recursive=not args.top_level, include=tuple(args.include or ()), exclude=tuple(args.exclude or ()))
+    return FolderScanner(folder, options, manifest_path(_config_dir() / "manifests", folder))
+
+
+def _workspace_path() -> Path:
+    return _config_dir() / "workspace.json"
+
+
+def _store_path() -> Path:
+    return _config_dir() / "stats.sqlite"
+
+
+def _socket_path(args: argparse.Namespace, folder: Path) -> Path:
+    # --socket for a spot everyone on the server can reach, otherwise one per folder in ~/.imagination_insider/daemon
+    if args.socket:
+        return Path(args.socket).expanduser().resolve()
+    return socket_path(_config_dir() / "daemon", folder)
+
+
+def _settings_path(args: argparse.Namespace) -> Path:
+    # --config, otherwise whichever of config.toml / config.json exists in ~/.imagination_insider
+    if args.config:
+        return Path(args.config).expanduser().resolve()
+    for name in ("config.toml", "config.json"):
+        path = _config_dir() / name
+        if path.exists():
+            return path
+    return _config_dir() / "config.json"
+
+
 def _write_last_folder(folder: Path) -> None:
     # persist folder for next time
     _config_dir().mkdir(parents=True, exist_ok=True)
     _last_folder_path().write_text(str(folder), encoding="utf-8")
 
 
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="imagination_insider", description="terminal dashboard for text game logs")
+    parser.add_argument("folder", nargs="?", help="folder with your .txt logs (defaults to the last one used)")
+    parser.add_argument("--emit-partial", metavar="OUT", help="write a partial stats file instead of opening the dashboard")
+    parser.add_argument("--files", nargs="+", metavar="FILE", help="only crunch these files (relative to the folder, zip members as bundle.zip::name.txt)")
+    parser.add_argument("--merge", nargs="+", metavar="PARTIAL", help="combine partial stats files and open (or --emit-partial) the result")
+    parser.add_argument("--workspace", action="store_true", help="open every registered campaign and switch between them with c")
+    parser.add_argument("--add-campaign", nargs=2, metavar=("NAME", "FOLDER"), help="register a campaign folder in the workspace")
+    parser.add_argument("--remove-campaign", metavar="NAME", help="drop a campaign from the workspace")
+    parser.add_argument("--list-campaigns", action="store_true", help="show the registered campaigns")
+    parser.add_argument("--config", metavar="FILE", help="roster and word lists (toml or json), re-read while running (default ~/.imagination_insider/config.toml or .json)")
+    parser.add_argument("--store", nargs="?", const="", metavar="DB", help="keep a sqlite copy of the stats (default ~/.imagination_insider/stats.sqlite)")
+    parser.add_argument("--sql", metavar="QUERY", help="run a query against the sqlite store and print the rows")
+    parser.add_argument("--tension-by-month", nargs="*", metavar="NAME", help="avg session tension per month (only sessions where all NAMEs show up)")
+    parser.add_argument("--files-mentioning", metavar="NAME", help="the logs in the sqlite store that mention NAME the most")
+    parser.add_argument("--export-snapshot", metavar="OUT", help="write the whole dashboard to one snapshot file (opens without the logs)")
+    parser.add_argument("--snapshot", metavar="FILE", help="open a snapshot file read-only instead of a folder")
+    parser.add_argument("--approx", action="store_true", help="show estimates from a sample of files right away and refine them in the background")
+    parser.add_argument("--backend", choices=BACKEND_CHOICES, default="auto", help="how logs get parsed: one process, all cores (parallel), or auto by how big the folder is")
+    parser.add_argument("--follow", nargs="?", const="", metavar="FILE", help="keep the board live while FILE (default: the newest .txt log) is being written")
+    parser.add_argument("--daemon", action="store_true", help="keep the folder's board in a background process that --attach viewers share")
+    parser.add_argument("--attach", action="store_true", help="open the board a running --daemon keeps for the folder (no parsing of your own)")
+    parser.add_argument("--stop-daemon", action="store_true", help="tell the folder's daemon to shut down")
+    parser.add_argument("--include", nargs="+", metavar="PATTERN", help="only logs whose path inside the folder (or name) matches, e.g. 'season2/*'")
+    parser.add_argument("--exclude", nargs="+", metavar="PATTERN", help="skip logs and subfolders whose path inside the folder (or name) matches, e.g. drafts '*.bak.txt'")
+    parser.add_argument("--top-level", action="store_true", help="only the logs sitting right in the folder, not in its subfolders")
+    parser.add_argument("--duplicates", choices=DUPLICATE_MODES, default="skip", help="copies of other logs: leave out byte for byte ones (default), near ones too, count them all anyway, or don't look for them")
+    parser.add_argument("--list-duplicates", action="store_true", help="print which logs are copies of which and exit")
+    parser.add_argument("--socket", metavar="PATH", help="unix socket the daemon listens on (default: one per folder in ~/.imagination_insider/daemon)")
+    return parser.parse_args(argv[1:])
+
+
+def _run_merge(args: argparse.Namespace) -> int:
+    paths = [Path(p).expanduser().resolve() for p in args.merge]
+    for path in paths:
+        if not path.is_file():
+            print(f"error: not a file: {path}")
+            return 2
+    try:
+        merged = load_merged(paths)
+        if args.emit_partial:
+            write_partial(merged, Path(args.emit_partial).expanduser())
+            print(f"merged {len(paths)} partials ({len(merged.files)} files) -> {args.emit_partial}")
+            return 0
+        stats = partial_to_dashboard(merged, args.duplicates)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}")
+        return 2
+
+    # r re-reads the partial files in case a shard job rewrote one
+    app = ImaginationInsider(loader=lambda: partial_to_dashboard(load_merged(paths), args.duplicates), stats=stats)
+    app.run()
+    return 0
+
+
+def _print_duplicates(stats: DashboardStats) -> None:
+    for duplicate in stats.duplicates:
+        alike = "same bytes" if duplicate.exact else f"{duplicate.similarity:.0%} alike"
+        print(f"{duplicate.source}\n  copy of {duplicate.kept} ({alike})")
+    print(f"{len(stats.duplicates)} of {len(stats.per_file)} logs are copies")
+
+
+def _store_file(args: argparse.Namespace) -> Path:
+    return Path(args.store).expanduser() if args.store else _store_path()
+
+
+def _open_store(args: argparse.Namespace) -> sqlite3.Connection:
+    return open_store(_store_file(args))
+
+
+def _run_store_query(args: argparse.Namespace) -> int:
+    # answers come straight from the store, no logs get read
+    try:
+        conn = _open_store(args)
+        # a folder given = just its logs, otherwise every folder the store has
+        folder = Path(args.folder).expanduser().resolve() if args.folder else None
+        if args.sql:
+            columns, rows = run_sql(conn, args.sql)
+            if columns:
+                print("\t".join(columns))
+        elif args.files_mentioning:
+            rows = files_mentioning(conn, args.files_mentioning.lower(), folder)
+            print("\t".join(["folder", "file", "date", "mentions"]))
+        else:
+            columns = ["month", "avg_tension", "sessions"]
+            found = tension_by_month(conn, args.tension_by_month, folder)
+            rows = [(month, round(avg, 1), count) for month, avg, count in found]
+            print("\t".join(columns))
+    except (OSError, sqlite3.Error) as exc:
+        print(f"error: {exc}")
+        return 2
+    for row in rows:
+        print("\t".join(str(value) for value in row))
+    return 0
+
+
+def _run_snapshot(args: argparse.Namespace) -> int:
+    path = Path(args.snapshot).expanduser().resolve()
+    try:
+        stats = load_snapshot(path)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}")
+        return 2
+    # read-only: r just re-opens the file (in case a newer export replaced it)
+    app = ImaginationInsider(loader=lambda: load_snapshot(path), stats=stats)
+    app.run()
+    return 0
+
+
+def _run_daemon(args: argparse.Namespace, folder: Path, settings: LiveSettings) -> int:
+    path = _socket_path(args, folder)
+    daemon = StatsDaemon(
+        folder, settings, FileCache(_cache_dir()), backend=args.backend, scanner=_scanner(args, folder), duplicates=args.duplicates
+    )
+    print(f"serving {folder} on {path} (ctrl+c or --stop-daemon to stop)")
+    try:
+        daemon.serve(path)
+    except OSError as exc:
+        print(f"error: {exc}")
+        return 2
+    return 0
+
+
+def _run_attached(args: argparse.Namespace, folder: Path) -> int:
+    path = _socket_path(args, folder)
+    try:
+        client = DaemonClient(path)
+        if args.stop_daemon:
+            client.stop_daemon()
+            print(f"stopped the daemon for {folder}")
+            return 0
+        if client.board_status()["snapshot"] is None:
+            print("waiting for the daemon's first scan...")
+        stats = client.load()
+    except (OSError, ValueError) as exc:
+        print(f"error: no daemon answering on {path} ({exc}), start one with --daemon")
+        return 2
+    # roster and word lists are the daemon's (its --config), r picks up its newest board
+    app = ImaginationInsider(folder, loader=client.load, stats=stats, attached=client)
+    app.run()
+    return 0
+
+
+def _run_workspace(args: argparse.Namespace, settings: LiveSettings) -> int:
+    path = _workspace_path()
+    try:
+        if args.add_campaign:
+            name, folder = args.add_campaign
+            folder = Path(folder).expanduser().resolve()
+            if not folder.is_dir():
+                print(f"error: not a folder: {folder}")
+                return 2
+            campaign = add_campaign(path, name, folder, list(settings.current.characters))
+            print(f"added {campaign.name} ({len(campaign.characters)} characters) -> {path}")
+            return 0
+        if args.remove_campaign:
+            remove_campaign(path, args.remove_campaign)
+            print(f"removed {args.remove_campaign}")
+            return 0
+        campaigns = load_workspace(path)
+    except (OSError, ValueError, KeyError) as exc:
+        print(f"error: {exc}")
+        return 2
+
+    if args.list_campaigns:
+        for campaign in campaigns:
+            print(f"{campaign.name}  {campaign.folder}  ({len(campaign.characters)} characters)")
+        return 0
+    if not campaigns:
+        print(f"error: no campaigns yet, add one with --add-campaign NAME FOLDER ({path})")
+        return 2
+
+    workspace = Workspace(campaigns, _cache_dir(), wordlists=settings.current.words)
+    app = ImaginationInsider(workspace=workspace, settings=settings)
+    app.run()
+    return 0
+
+
 def main(argv: List[str]) -> int:
+    args = _parse_args(argv)
+    if args.sql or args.tension_by_month is not None or args.files_mentioning:
+        return _run_store_query(args)
+    if args.merge:
+        return _run_merge(args)
+    if args.snapshot:
+        return _run_snapshot(args)
+    settings = LiveSettings(_settings_path(args))
+    if settings.error:
+        print(f"error: {settings.error}")
+        return 2
+    if args.workspace or args.add_campaign or args.remove_campaign or args.list_campaigns:
+        return _run_workspace(args, settings)
+
     # no folder arg = use last one or default
-    if len(argv) < 2:
+    if args.folder is None:
         folder = _read_last_folder() or (Path.home() / "imagination_insider" / "game_logs")
     else:
-        folder = Path(argv[1]).expanduser().resolve()
+        folder = Path(args.folder).expanduser().resolve()
 
     if not folder.exists() or not folder.is_dir():
         print(f"error: not a folder: {folder}")
         return 2
 
+    if args.attach or args.stop_daemon:
+        return _run_attached(args, folder)
+    if args.daemon:
+        return _run_daemon(args, folder, settings)
+
+    if args.emit_partial:
+        if args.files:
+            # zip members are written bundle.zip::member.txt
+            files = []
+            for name in args.files:
+                source = resolve_source(str(folder / name))
+                if source is None:
+                    print(f"error: not a file: {folder / name}")
+                    return 2
+                files.append(source)
+        else:
+            files = _scanner(args, folder).list()
+        current = settings.current
+        partial = compute_partial(folder, files, list(current.characters), current.words)
+        write_partial(partial, Path(args.emit_partial).expanduser())
+        print(f"wrote {len(partial.files)} files -> {args.emit_partial}")
+        return 0
+
+    if args.export_snapshot or args.list_duplicates:
+        current = settings.current
+        stats = compute_stats(
+            folder,
+            _scanner(args, folder).list(),
+            list(current.characters),
+            FileCache(_cache_dir()),
+            current.words,
+            backend=args.backend,
+            duplicates="keep" if args.list_duplicates else args.duplicates,
+        )
+        if args.list_duplicates:
+            _print_duplicates(stats)
+            return 0
+        export_snapshot(stats, Path(args.export_snapshot).expanduser())
+        print(f"wrote {len(stats.per_file)} files -> {args.export_snapshot}")
+        return 0
+
     _write_last_folder(folder)
-    app = ImaginationInsider(folder)
+    cache = FileCache(_cache_dir())
+    store = None
+    if args.store is not None:
+        try:
+            store = StoreSync(_store_file(args), folder)
+        except (OSError, sqlite3.Error) as exc:
+            print(f"error: {exc}")
+            return 2
+    scanner = _scanner(args, folder)
+
+    def loader() -> DashboardStats:
+        # always the latest settings, so a config edit that needs a rescan gets one
+        current = settings.current
+        stats = compute_stats(
+            folder, scanner.list(), list(current.characters), cache, current.words, args.backend, args.duplicates
+        )
+        if store is not None:
+            # every load (and refresh) also updates the store in the background, unchanged files are skipped
+            store.submit(stats)
+        return stats
+
+    if args.follow is not None:
+        followpath = (folder / args.follow).resolve() if args.follow else newest_log(folder, scanner)
+        if followpath is None:
+            print(f"error: no .txt logs to follow in {folder}")
+            return 2
+        if not followpath.is_file():
+            print(f"error: not a file: {followpath}")
+            return 2
+
+        def follow() -> LiveBoard:
+            # full load once, after that only the followed file's new lines get read
+            current = settings.current
+            return LiveBoard(loader(), FileFollower(followpath, list(current.characters), current.words))
+
+        try:
+            app = ImaginationInsider(folder, loader=loader, settings=settings, follow=follow, store=store)
+        except OSError as exc:
+            print(f"error: {exc}")
+            return 2
+    elif args.approx:
+        def progressive() -> ProgressiveScan:
+            current = settings.current
+            return ProgressiveScan(
+                scanner.list(), list(current.characters), cache, current.words, duplicates=args.duplicates, backend=args.backend
+            )
+
+        # starts out empty, the first estimate lands as soon as the first few files are done
+        empty = build_dashboard([], list(settings.current.characters))
+        app = ImaginationInsider(folder, loader=loader, stats=empty, settings=settings, progressive=progressive, store=store)
+    else:
+        app = ImaginationInsider(folder, loader=loader, settings=settings, store=store)
     app.run()
     return 0
 
 
 if __name__ == "__main__":
+    # workspace scans run in worker processes, this keeps the frozen exe from relaunching itself
+    multiprocessing.freeze_support()
     raise SystemExit(main(sys.argv))
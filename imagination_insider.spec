@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['config', 'helpers', 'models', 'render', 'widgets', 'app'],
+    hiddenimports=['config', 'helpers', 'models', 'render', 'widgets', 'app', 'partials', 'cache', 'workspace', 'search', 'roster', 'timeline', 'archives', 'store', 'settings', 'snapshot', 'proximity', 'progressive', 'follow', 'lexicon', 'palette', 'backends', 'linesignal', 'daemon', 'termmatrix', 'discovery', 'duplicates'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
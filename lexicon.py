@@ -0,0 +1,163 @@
+# weighted word/phrase lists ("critical hit" = 3, "not safe" = -2) scored in one pass over a line's tokens:
+# every phrase is a path in a trie over token ids, with aho-corasick fallback links so a line is walked once
+# no matter how many thousand entries there are
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import AbstractSet, Dict, FrozenSet, List, Optional, Tuple
+
+from config import _WORD_RE, WordLists
+
+# a negator flips the mood of anything that starts within this many words after it ("not very happy")
+NEGATION_REACH = 3
+
+
+def phrase_tokens(phrase: str) -> Tuple[str, ...]:
+    # same words tokenize() would pull out of a line
+    out = []
+    for match in _WORD_RE.finditer(phrase):
+        word = match.group(0).lower()
+        if len(word) >= 3:
+            out.append(word)
+    return tuple(out)
+
+
+class Lexicon:
+    def __init__(self, entries: Dict[str, int], negators: AbstractSet[str] = frozenset()) -> None:
+        self.negators = frozenset(negators)
+        # word -> token id, only words that are in some phrase get one (anything else resets the automaton)
+        self.ids: Dict[str, int] = {}
+        self._goto: List[Dict[int, int]] = [{}]
+        self._fail: List[int] = [0]
+        # node -> (length, weight) of the longest phrase ending there, found directly or through a fallback link
+        self._hit: List[Optional[Tuple[int, int]]] = [None]
+        self.size = 0
+        for phrase, weight in entries.items():
+            words = phrase_tokens(phrase)
+            if not words:
+                continue
+            self.size = self.size + 1
+            node = 0
+            for word in words:
+                tokenid = self.ids.setdefault(word, len(self.ids))
+                nextnode = self._goto[node].get(tokenid)
+                if nextnode is None:
+                    nextnode = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._hit.append(None)
+                    self._goto[node][tokenid] = nextnode
+                node = nextnode
+            self._hit[node] = (len(words), weight)
+        self._link()
+
+    def _link(self) -> None:
+        # breadth first so every fallback target is done before the nodes under it
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for tokenid, child in self._goto[node].items():
+                back = self._fail[node]
+                while back and tokenid not in self._goto[back]:
+                    back = self._fail[back]
+                self._fail[child] = self._goto[back].get(tokenid, 0)
+                if self._hit[child] is None:
+                    self._hit[child] = self._hit[self._fail[child]]
+                queue.append(child)
+
+    def matches(self, tokens: List[str]) -> List[Tuple[int, int, int]]:
+        # (start, end, weight) of each phrase in tokens, left to right; where phrases overlap the longer one wins
+        ids = self.ids
+        goto = self._goto
+        fail = self._fail
+        hit = self._hit
+        ends: List[Optional[Tuple[int, int]]] = []
+        found = False
+        state = 0
+        for token in tokens:
+            tokenid = ids.get(token)
+            if tokenid is None:
+                state = 0
+                ends.append(None)
+                continue
+            while state and tokenid not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(tokenid, 0)
+            ends.append(hit[state])
+            if hit[state] is not None:
+                found = True
+        if not found:
+            return []
+        # right to left: the longest phrase ending at each spot, unless it runs into one we already took
+        out = []
+        limit = len(tokens)
+        for end in range(len(tokens) - 1, -1, -1):
+            match = ends[end]
+            if match is None or end >= limit:
+                continue
+            length, weight = match
+            out.append((end + 1 - length, end + 1, weight))
+            limit = end + 1 - length
+        out.reverse()
+        return out
+
+    def total(self, tokens: List[str]) -> int:
+        # plain sum of weights (combat words for tension, negation doesnt apply)
+        total = 0
+        for _, _, weight in self.matches(tokens):
+            total = total + weight
+        return total
+
+    def sentiment(self, tokens: List[str]) -> Tuple[int, int]:
+        # (positive weight, negative weight) with anything right after a negator flipped
+        pos = 0
+        neg = 0
+        found = self.matches(tokens)
+        if not found:
+            return (0, 0)
+        negated_at = -NEGATION_REACH - 1
+        scanned = 0
+        for start, end, weight in found:
+            # last negator before this phrase (a negator inside the phrase, like "not safe", is part of its weight)
+            while scanned < start:
+                if tokens[scanned] in self.negators:
+                    negated_at = scanned
+                scanned = scanned + 1
+            if start - negated_at <= NEGATION_REACH:
+                weight = -weight
+            if weight > 0:
+                pos = pos + weight
+            else:
+                neg = neg - weight
+            scanned = max(scanned, end)
+        return (pos, neg)
+
+
+@lru_cache(maxsize=16)
+def _mood(pos: FrozenSet[str], neg: FrozenSet[str], phrases: Tuple[Tuple[str, int], ...], negators: FrozenSet[str]) -> Lexicon:
+    entries: Dict[str, int] = {}
+    for word in pos:
+        entries[word] = 1
+    for word in neg:
+        entries[word] = -1
+    for phrase, weight in phrases:
+        entries[phrase] = weight
+    return Lexicon(entries, negators)
+
+
+@lru_cache(maxsize=16)
+def _combat(words: FrozenSet[str], phrases: Tuple[Tuple[str, int], ...]) -> Lexicon:
+    entries: Dict[str, int] = {}
+    for word in words:
+        entries[word] = 1
+    for phrase, weight in phrases:
+        entries[phrase] = weight
+    return Lexicon(entries)
+
+
+def mood_lexicon(wordlists: WordLists) -> Lexicon:
+    # pos words count +1, neg words -1, mood_phrases override either with their own weight
+    return _mood(wordlists.pos, wordlists.neg, wordlists.mood_phrases, wordlists.negators)
+
+
+def combat_lexicon(wordlists: WordLists) -> Lexicon:
+    return _combat(wordlists.combat, wordlists.combat_phrases)
@@ -0,0 +1,167 @@
+# tension and mood line by line across the whole archive: every session line's own numbers back to back (files in
+# order), running sums for averages and a max pyramid over the smoothed tension, so squeezing any stretch of lines
+# into a panel is a handful of lookups per column no matter how far out you zoom
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+from typing import List, Tuple
+
+# tension gets averaged over this many lines either side (inside the session) before peaks are taken,
+# one shouted line isnt a fight
+SMOOTH_RADIUS = 6
+
+
+class LineSignal:
+    def __init__(self, per_file: List) -> None:
+        # where each file's lines start (plus the end), and the index of each file's first session
+        self.file_lines = array("Q", [0])
+        self.file_sessions = array("Q", [0])
+        # where each session's lines start, plus the end
+        self.session_starts = array("Q", [0])
+        self._tension = array("B")
+        self._tension_sum = array("Q", [0])
+        self._mood_sum = array("q", [0])
+        # level 0 = smoothed tension per line, every level up = max of each pair below it
+        self._peaks: List[array] = [array("B")]
+        for filestats in per_file:
+            self._add_lines(filestats, 0)
+            self._add_sessions(filestats)
+        self._smooth_from(0)
+
+    def __len__(self) -> int:
+        return len(self._tension)
+
+    def _add_lines(self, filestats, skip: int) -> None:
+        tension = self._tension
+        tension_sum = self._tension_sum
+        mood_sum = self._mood_sum
+        moods = filestats.line_mood
+        for i in range(skip, len(filestats.line_tension)):
+            value = filestats.line_tension[i]
+            tension.append(value)
+            tension_sum.append(tension_sum[-1] + value)
+            mood_sum.append(mood_sum[-1] + moods[i])
+
+    def _add_sessions(self, filestats) -> None:
+        pos = self.session_starts[-1]
+        for count in filestats.session_lines:
+            pos = pos + count
+            self.session_starts.append(pos)
+        self.file_lines.append(len(self._tension))
+        self.file_sessions.append(len(self.session_starts) - 1)
+
+    def grow_file(self, fileidx: int, filestats) -> bool:
+        # for live updates: a file got more lines (False = it isnt the last file, build a fresh one instead)
+        if fileidx != len(self.file_lines) - 2:
+            return False
+        had = self.file_lines[-1] - self.file_lines[-2]
+        # the last file's sessions get redone, its open session might have grown
+        del self.file_lines[-1]
+        del self.file_sessions[-1]
+        del self.session_starts[self.file_sessions[-1] + 1:]
+        self._add_lines(filestats, had)
+        self._add_sessions(filestats)
+        self._smooth_from(max(0, self.file_lines[-2] + had - SMOOTH_RADIUS))
+        return True
+
+    def _smooth_from(self, start: int) -> None:
+        # smoothed tension for every line from start on, then the pyramid above it
+        sums = self._tension_sum
+        starts = self.session_starts
+        level = self._peaks[0]
+        del level[start:]
+        session = max(0, bisect_right(starts, start) - 1)
+        for i in range(start, len(self._tension)):
+            while session + 1 < len(starts) - 1 and starts[session + 1] <= i:
+                session = session + 1
+            lo = max(starts[session], i - SMOOTH_RADIUS)
+            hi = min(starts[session + 1], i + SMOOTH_RADIUS + 1)
+            level.append((sums[hi] - sums[lo] + (hi - lo) // 2) // (hi - lo))
+        depth = 1
+        while len(self._peaks[depth - 1]) > 1:
+            below = self._peaks[depth - 1]
+            if depth == len(self._peaks):
+                self._peaks.append(array("B"))
+            above = self._peaks[depth]
+            start = start >> 1
+            del above[start:]
+            for j in range(start, (len(below) + 1) >> 1):
+                if 2 * j + 1 < len(below):
+                    above.append(max(below[2 * j], below[2 * j + 1]))
+                else:
+                    above.append(below[2 * j])
+            depth = depth + 1
+        del self._peaks[depth:]
+
+    def session_span(self, start: int, end: int) -> Tuple[int, int]:
+        # sessions [start, end) -> lines [lo, hi)
+        last = len(self.session_starts) - 1
+        start = max(0, min(start, last))
+        end = max(start, min(end, last))
+        return (self.session_starts[start], self.session_starts[end])
+
+    def mean_mood(self, lo: int, hi: int) -> float:
+        if hi <= lo:
+            return 0.0
+        return (self._mood_sum[hi] - self._mood_sum[lo]) / (hi - lo)
+
+    def mean_tension(self, lo: int, hi: int) -> float:
+        if hi <= lo:
+            return 0.0
+        return (self._tension_sum[hi] - self._tension_sum[lo]) / (hi - lo)
+
+    def peak(self, lo: int, hi: int) -> int:
+        # highest smoothed tension in lines [lo, hi)
+        best = 0
+        depth = 0
+        while lo < hi:
+            level = self._peaks[depth]
+            if lo & 1:
+                best = max(best, level[lo])
+                lo = lo + 1
+            if hi & 1:
+                hi = hi - 1
+                best = max(best, level[hi])
+            lo = lo >> 1
+            hi = hi >> 1
+            depth = depth + 1
+        return best
+
+    def peak_line(self, lo: int, hi: int) -> int:
+        # first line in [lo, hi) where the smoothed tension hits its peak, -1 if there are no lines
+        if hi <= lo:
+            return -1
+        best = self.peak(lo, hi)
+        # walk down the pyramid: widest block on the left that still reaches the peak
+        pos = lo
+        while pos < hi:
+            depth = 0
+            while (pos >> depth) & 1 == 0 and pos + (2 << depth) <= hi and depth + 1 < len(self._peaks):
+                depth = depth + 1
+            if self._peaks[depth][pos >> depth] >= best:
+                while depth > 0:
+                    depth = depth - 1
+                    node = pos >> depth
+                    if self._peaks[depth][node] < best:
+                        pos = pos + (1 << depth)
+                return pos
+            pos = pos + (1 << depth)
+        return -1
+
+    def curve(self, lo: int, hi: int, width: int) -> List[Tuple[int, float]]:
+        # lines [lo, hi) squeezed into at most width columns: (peak smoothed tension, avg mood) per column
+        count = hi - lo
+        columns = min(width, count)
+        out = []
+        for col in range(columns):
+            start = lo + col * count // columns
+            end = lo + (col + 1) * count // columns
+            out.append((self.peak(start, end), self.mean_mood(start, end)))
+        return out
+
+    def locate(self, line: int) -> Tuple[int, int]:
+        # (file index, session index) of a line
+        fileidx = bisect_right(self.file_lines, line) - 1
+        session = bisect_right(self.session_starts, line) - 1
+        return (min(fileidx, len(self.file_lines) - 2), min(session, len(self.session_starts) - 2))
@@ -1,25 +1,77 @@
 # data structures and the main stats
 from __future__ import annotations
 
+import copy
+import os
 import re
-from dataclasses import dataclass
-from pathlib import Path
-from typing import Dict, List, Tuple
+from array import array
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, Callable, Deque, Dict, List, Optional, Set, Tuple
 
-from config import CHARACTERS, NEG_WORDS, POS_WORDS, STOPWORDS
+from archives import MEMBER_SEP, LogPath, is_streamed, parse_source, read_log_bytes, read_log_chunks
+from config import CHARACTERS, DEFAULT_WORDS, Character, WordLists
+from duplicates import Duplicate, content_digest, digester, dropped, find_duplicates, merge_sketch, shingle_hash
 from helpers import (
-    build_alias_regex,
+    SessionSplitter,
+    add_tension_parts,
     calc_tension,
-    count_mentions,
-    extract_lines_with_mentions,
+    clamp,
+    decode_text,
+    line_start_offsets,
     parse_date_from_filename,
-    read_txt,
-    split_sessions,
+    split_session_spans,
+    tension_parts,
+    tension_score,
     tokenize,
+    whole_lines,
 )
+from lexicon import combat_lexicon, mood_lexicon
+from linesignal import LineSignal
+from termmatrix import TermMatrix
+from proximity import SlidingWindow, count_together
+from roster import compile_roster
+from timeline import Timeline
 
+if TYPE_CHECKING:
+    from cache import FileCache
+    from progressive import Estimate
+    from snapshot import Snapshot
 
-@dataclass
+
+# bump this whenever analyze_file starts giving different numbers for the same file
+# (old cache entries and partials from before the bump get ignored/refused)
+ANALYSIS_VERSION = 6
+
+
+class SessionMentions:
+    # per-session {name: count} dicts read straight out of the packed counts (a row only becomes a dict when you ask for it)
+    __slots__ = ("_names", "_counts", "_sessions")
+
+    def __init__(self, names: Tuple[str, ...], counts: array, sessions: int) -> None:
+        self._names = names
+        self._counts = counts
+        self._sessions = sessions
+
+    def __len__(self) -> int:
+        return self._sessions
+
+    def __getitem__(self, index: int) -> Dict[str, int]:
+        if index < 0:
+            index = index + self._sessions
+        if index < 0 or index >= self._sessions:
+            raise IndexError(index)
+        width = len(self._names)
+        row = self._counts[index * width:(index + 1) * width]
+        return dict(zip(self._names, row))
+
+    def __iter__(self):
+        for index in range(self._sessions):
+            yield self[index]
+
+
+@dataclass(slots=True)
 class FileStats:
     filename: str
     date: str
@@ -36,212 +88,875 @@ class FileStats:
     chars: int
     text: str
     session_count: int
-    session_tensions: List[int]
-    session_pos: List[int]
-    session_neg: List[int]
-    session_mentions: List[Dict[str, int]]
+    # one entry per session, arrays instead of lists of ints
+    session_tensions: array
+    session_pos: array
+    session_neg: array
+    # sessions x characters mention counts packed row by row: session i, character j is at i * len(names) + j
+    session_counts: array
+    names: Tuple[str, ...]
+    # where the file came from plus what it added to the shared tables (so files can be merged later)
+    source: str = ""
+    cooc: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    trios: Dict[Tuple[str, str, str], int] = field(default_factory=dict)
+    squads: Dict[Tuple[str, str, str, str], int] = field(default_factory=dict)
+    keywords: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # line index: "@name" or keyword -> line numbers, plus the byte offset each line starts at
+    postings: Dict[str, array] = field(default_factory=dict)
+    line_starts: array = field(default_factory=lambda: array("Q"))
+    # every line that's part of a session, in order: that line's own tension (0-100) and mood (good minus bad,
+    # capped to +-127), plus how many of those lines each session has (see linesignal.py)
+    line_tension: array = field(default_factory=lambda: array("B"))
+    line_mood: array = field(default_factory=lambda: array("b"))
+    session_lines: array = field(default_factory=lambda: array("I"))
+    # fuzzy matching: the typo'd spellings that got counted for each character, and how often
+    variants: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # hash of the file's bytes and minhash sketch of its lines, for spotting copies (see duplicates.py)
+    digest: str = ""
+    sketch: array = field(default_factory=lambda: array("I"))
+
+    @property
+    def session_mentions(self) -> SessionMentions:
+        return SessionMentions(self.names, self.session_counts, self.session_count)
+
+    def session_row(self, index: int) -> array:
+        # one session's counts in roster order, without building a dict
+        width = len(self.names)
+        return self.session_counts[index * width:(index + 1) * width]
 
 
 @dataclass
 class DashboardStats:
     totals: Dict[str, int]
     per_file: List[FileStats]
-    trend: List[Tuple[str, Dict[str, int]]]
-    cooc: Dict[Tuple[str, str], int]
-    keywords: Dict[str, Dict[str, int]]
-    trios: Dict[Tuple[str, str, str], int]
-    squads: Dict[Tuple[str, str, str, str], int]
-
-
-def compute_stats(folder: Path) -> DashboardStats:
-    # gets all those stupid files and sorts them by name
-    allpaths = []
-    for path in folder.iterdir():
-        if path.is_file():
-            allpaths.append(path)
-
-    # pair up (name, path) so we can sort by name
-    filepairs = []
-    for path in allpaths:
-        filepairs.append((path.name.lower(), path))
-    filepairs.sort()
-
-    files = []
-    for _, path in filepairs:
-        files.append(path)
-
-    # build regex for each character so we can find mentions
-    patterns = {}
-    for character in CHARACTERS:
-        patterns[character.name] = build_alias_regex(character.aliases)
-    totals = {}
-    for character in CHARACTERS:
-        totals[character.name] = 0
-    perfiles = []
-    cooc = {}
-    keywords = {}
-    for character in CHARACTERS:
-        keywords[character.name] = {}
-    trios = {}
-    squads = {}
-
-    # now chew through each txt file
-    for filepath in files:
-        if filepath.suffix.lower() != ".txt":
+    # everything else is folded from per_file the first time it gets asked for (see _DERIVED)
+    _derived: Dict[str, object] = field(default_factory=dict, compare=False, repr=False)
+    # set when the board was opened from a snapshot file: no logs behind it, line text comes from the snapshot
+    snapshot: Optional[Snapshot] = field(default=None, compare=False, repr=False)
+    # set while an approximate scan is still going: the numbers are scaled up from a sample (see progressive.py)
+    estimate: Optional[Estimate] = field(default=None, compare=False, repr=False)
+    # copies of other logs that build_dashboard found (the ones not in per_file got left out)
+    duplicates: List[Duplicate] = field(default_factory=list, compare=False, repr=False)
+
+    def _get(self, name: str):
+        if name not in self._derived:
+            self._derived[name] = _DERIVED[name][1](self)
+        return self._derived[name]
+
+    @property
+    def trend(self) -> List[Tuple[str, Dict[str, int]]]:
+        return self._get("trend")
+
+    @property
+    def cooc(self) -> Dict[Tuple[str, str], int]:
+        return self._get("cooc")
+
+    @property
+    def keywords(self) -> Dict[str, Dict[str, int]]:
+        return self._get("keywords")
+
+    @property
+    def trios(self) -> Dict[Tuple[str, str, str], int]:
+        return self._get("trios")
+
+    @property
+    def squads(self) -> Dict[Tuple[str, str, str, str], int]:
+        return self._get("squads")
+
+    @property
+    def neighbors(self) -> Dict[str, Dict[str, int]]:
+        # cooc again but as name -> {other: count}, so ties and the heatmap dont walk every pair
+        return self._get("neighbors")
+
+    @property
+    def timeline(self) -> Timeline:
+        # running sums over sessions and dates, for any time window without re-walking per_file
+        return self._get("timeline")
+
+    @property
+    def variants(self) -> Dict[str, Dict[str, int]]:
+        # typo'd spellings fuzzy matching counted for each character (see roster.FuzzyIndex)
+        return self._get("variants")
+
+    @property
+    def terms(self) -> TermMatrix:
+        # keyword counts as a character x word matrix, for the words that set each character apart
+        return self._get("terms")
+
+    @property
+    def signal(self) -> LineSignal:
+        # line by line tension and mood, for spotting where in a session things blew up
+        return self._get("signal")
+
+    def is_built(self, name: str) -> bool:
+        return name in self._derived
+
+    def with_files(self, perfiles: List[FileStats], changed: Set[str]) -> DashboardStats:
+        # same board over updated file records; derived tables that dont read any changed field are kept
+        out = DashboardStats(
+            totals=self.totals, per_file=perfiles, snapshot=self.snapshot, estimate=self.estimate, duplicates=self.duplicates
+        )
+        for name, value in self._derived.items():
+            if not (_reads(name) & changed):
+                out._derived[name] = value
+        return out
+
+    def with_grown_file(self, fileidx: int, delta: ParseDelta) -> DashboardStats:
+        # per_file[fileidx] grew in place (delta = what LogParser.feed added): patch the tables that are built
+        # instead of refolding every file, anything that cant be patched just gets rebuilt when it's asked for
+        # the old board (and whatever still holds it) keeps its numbers: every table that changes is copied
+        # first, only the records of the files that didnt grow are shared
+        filestats = self.per_file[fileidx]
+        derived = dict(self._derived)
+        totals = dict(self.totals)
+        _add_counts(totals, delta.mentions)
+        for table in ("cooc", "trios", "squads"):
+            if table in derived:
+                derived[table] = dict(derived[table])
+                _add_counts(derived[table], getattr(delta, table))
+        if "keywords" in derived:
+            keywords = dict(derived["keywords"])
+            for name, bag in delta.keywords.items():
+                keywords[name] = dict(keywords[name])
+                _add_counts(keywords[name], bag)
+            derived["keywords"] = keywords
+        if "variants" in derived:
+            variants = dict(derived["variants"])
+            for name, words in delta.variants.items():
+                variants[name] = dict(variants.get(name, {}))
+                _add_counts(variants[name], words)
+            derived["variants"] = variants
+        if "neighbors" in derived:
+            neighbors = dict(derived["neighbors"])
+            for char_a, char_b in delta.cooc:
+                weight = derived["cooc"][(char_a, char_b)]
+                for one, other in ((char_a, char_b), (char_b, char_a)):
+                    neighbors[one] = dict(neighbors.get(one, {}))
+                    neighbors[one][other] = weight
+            derived["neighbors"] = neighbors
+        if "trend" in derived:
+            trend = []
+            grown = False
+            for date, counts in derived["trend"]:
+                if date == filestats.date:
+                    counts = dict(counts)
+                    _add_counts(counts, delta.mentions)
+                    grown = True
+                trend.append((date, counts))
+            if grown:
+                derived["trend"] = trend
+            else:
+                del derived["trend"]
+        # the matrix, timeline and line signal are patched on a copy (arrays and flat lists, a lot cheaper than
+        # building them again from every file)
+        if "terms" in derived:
+            terms = copy.deepcopy(derived["terms"])
+            for name, bag in delta.keywords.items():
+                terms.add(name, bag)
+            derived["terms"] = terms
+        if "timeline" in derived:
+            timeline = copy.deepcopy(derived["timeline"])
+            if timeline.grow_file(fileidx, filestats, delta):
+                derived["timeline"] = timeline
+            else:
+                del derived["timeline"]
+        if "signal" in derived:
+            signal = copy.deepcopy(derived["signal"])
+            if signal.grow_file(fileidx, filestats):
+                derived["signal"] = signal
+            else:
+                del derived["signal"]
+        # a new object so views cached on the old one (PostingsView) get rebuilt
+        return DashboardStats(
+            totals=totals,
+            per_file=self.per_file,
+            _derived=derived,
+            snapshot=self.snapshot,
+            estimate=self.estimate,
+            duplicates=self.duplicates,
+        )
+
+
+def sort_parts(directory: str) -> Tuple[str, ...]:
+    # a folder's part of file_sort_key (the walk works it out once per folder)
+    return tuple(directory.lower().split(os.sep))
+
+
+def file_sort_key(name: str, source: str) -> Tuple[Tuple[str, ...], str]:
+    # files are always processed by lowercase path a folder at a time (so all of season1/ comes before season2/,
+    # and a flat folder is just by name), full path breaks ties. a zip's logs count as sitting next to the zip
+    ondisk = source
+    if MEMBER_SEP in source:
+        archive = source.rsplit(MEMBER_SEP, 1)[0]
+        if archive.lower().endswith(".zip"):
+            ondisk = archive
+    return (sort_parts(os.path.dirname(ondisk)) + (name.lower(),), source)
+
+
+_WORD_RE = re.compile(r"\b\w+\b")
+# line breaks splitlines knows about besides \n (\r is already gone by now)
+_ODD_BREAK_RE = re.compile("[\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
+def _post(postings: Dict[str, array], term: str, lineno: int) -> None:
+    # add a line to a term's postings (lines come in order so only the last one can repeat)
+    plist = postings.get(term)
+    if plist is None:
+        postings[term] = array("I", [lineno])
+    elif plist[-1] != lineno:
+        plist.append(lineno)
+
+
+def _sentiment(text: str, words: WordLists) -> Tuple[int, int]:
+    # weighted positive and negative words/phrases, a line at a time (phrases dont run across lines)
+    lexicon = mood_lexicon(words)
+    pos = 0
+    neg = 0
+    for line in text.splitlines():
+        linepos, lineneg = lexicon.sentiment(tokenize(line))
+        pos += linepos
+        neg += lineneg
+    return (pos, neg)
+
+
+def _split_lines(text: str) -> Tuple[List[str], List[int]]:
+    # same lines as text.splitlines(), but remembering which physical line (for the index) each came from
+    alllines: List[str] = []
+    physno: List[int] = []
+    physical_lines = text.split("\n")
+    lastline = len(physical_lines) - 1
+    for lineno in range(len(physical_lines)):
+        physical = physical_lines[lineno]
+        if not _ODD_BREAK_RE.search(physical):
+            if lineno < lastline or physical:
+                alllines.append(physical)
+                physno.append(lineno)
             continue
-        text = read_txt(filepath)
-        words = len(re.findall(r"\b\w+\b", text))
-        alllines = text.splitlines()
-        nonemptylines = []
-        for line in alllines:
-            if line.strip():
-                nonemptylines.append(line)
-        linescount = len(nonemptylines)
-        tension = calc_tension(text)
-        exclaims = text.count("!")
-        questions = text.count("?")
-        caps = 0
-        for ch in text:
-            if ch.isupper():
-                caps = caps + 1
-        chars_n = len(text)
-        # count positive and negative words
-        pos = 0
-        for t in tokenize(text):
-            if t in POS_WORDS:
-                pos += 1
-        neg = 0
-        for t in tokenize(text):
-            if t in NEG_WORDS:
-                neg += 1
-
-        # chop into sessions, get per-session stats
-        sessions = split_sessions(text)
-        session_tensions: List[int] = []
-        session_pos: List[int] = []
-        session_neg: List[int] = []
-        session_mentions: List[Dict[str, int]] = []
-
-        for sessiontext in sessions:
-            session_tensions.append(calc_tension(sessiontext))
-            sessionpos = 0
-            for token in tokenize(sessiontext):
-                if token in POS_WORDS:
-                    sessionpos += 1
-            sessionneg = 0
-            for token in tokenize(sessiontext):
-                if token in NEG_WORDS:
-                    sessionneg += 1
-            session_pos.append(sessionpos)
-            session_neg.append(sessionneg)
-            sessionmentions: Dict[str, int] = {}
-            for character in CHARACTERS:
-                sessionmentions[character.name] = count_mentions(sessiontext, patterns[character.name])
-            session_mentions.append(sessionmentions)
+        # form feeds and friends split lines too, put the \n back so splitlines sees what it would in the full text
+        if lineno < lastline:
+            physical = physical + "\n"
+        for part in physical.splitlines():
+            alllines.append(part)
+            physno.append(lineno)
+    return (alllines, physno)
+
+
+def _session_texts(alllines: List[str], spans: List[Tuple[int, int]]) -> List[str]:
+    out = []
+    for spanstart, spanend in spans:
+        out.append("\n".join(alllines[spanstart:spanend]).strip())
+    return out
+
 
+def _slide(
+    window: SlidingWindow,
+    position: int,
+    charids: List[int],
+    names: List[str],
+    cooc: Dict[Tuple[str, str], int],
+    trios: Dict[Tuple[str, str, str], int],
+    squads: Dict[Tuple[str, str, str, str], int],
+) -> None:
+    # move the window up to position, put the new mentions in, count who they're together with
+    window.advance(position)
+    fresh = set()
+    for charid in charids:
+        window.add(position, charid)
+        fresh.add(names[charid])
+    present = []
+    for charid in window.counts:
+        present.append(names[charid])
+    present.sort()
+    count_together(present, fresh, cooc, trios, squads)
+
+
+@dataclass
+class ParseDelta:
+    # what one LogParser.feed added, so folded tables can be patched instead of refolding every file
+    mentions: Dict[str, int] = field(default_factory=dict)
+    cooc: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    trios: Dict[Tuple[str, str, str], int] = field(default_factory=dict)
+    squads: Dict[Tuple[str, str, str, str], int] = field(default_factory=dict)
+    keywords: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    variants: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    pos: int = 0
+    neg: int = 0
+    # sessions from this index on are new or changed, and how many the file had before the feed
+    first_session: int = 0
+    sessions_before: int = 0
+
+
+def _trimmed(parts: List[int], line: str) -> List[int]:
+    # tension parts for a line with whitespace cut off its ends (first/last line of a session)
+    out = list(parts)
+    out[0] = len(line)
+    out[5] = 1 if len(line) <= 60 else 0
+    return out
+
+
+class LogParser:
+    # analyze_file a chunk at a time: feed it the bytes as the log grows and .stats stays up to date,
+    # only the new lines ever get looked at (remembers the open session, the blank line run and the window)
+    def __init__(
+        self,
+        filepath: LogPath,
+        characters: List[Character] = CHARACTERS,
+        wordlists: WordLists = DEFAULT_WORDS,
+        keep_text: bool = True,
+    ) -> None:
+        # compiled roster finds everyone on a line in one pass, however many characters there are
+        roster = compile_roster(characters, wordlists.fuzzy, wordlists.fuzzy_ignore)
+        self.roster = roster
+        self.names = roster.names
+        self.wordlists = wordlists
+        self._mood = mood_lexicon(wordlists)
+        self._combat = combat_lexicon(wordlists)
+        # keep_text=False for followed logs, the text is on disk anyway and it only keeps growing
+        self.keep_text = keep_text
         mentions: Dict[str, int] = {}
         linesforselected: Dict[str, List[str]] = {}
-        for character in CHARACTERS:
-            mentioncount = count_mentions(text, patterns[character.name])
-            mentions[character.name] = mentioncount
-            totals[character.name] += mentioncount
-            linesforselected[character.name] = extract_lines_with_mentions(text, patterns[character.name], limit=14)
-
-        # who shows up together on each line -> cooc, trios, squads, keywords
-        for line in nonemptylines:
-            present = []
-            for character in CHARACTERS:
-                found = False
-                for pattern in patterns[character.name]:
-                    if pattern.search(line):
-                        found = True
-                        break
-                if found:
-                    present.append(character.name)
-            if not present:
-                continue
-            present = sorted(set(present))
-            # count pairs (2 together)
-            if len(present) >= 2:
-                for i in range(len(present)):
-                    for j in range(i + 1, len(present)):
-                        key = (present[i], present[j])
-                        if key in cooc:
-                            cooc[key] = cooc[key] + 1
-                        else:
-                            cooc[key] = 1
-            # count trios (3 together)
-            if len(present) >= 3:
-                for i in range(len(present)):
-                    for j in range(i + 1, len(present)):
-                        for k in range(j + 1, len(present)):
-                            key3 = (present[i], present[j], present[k])
-                            if key3 in trios:
-                                trios[key3] = trios[key3] + 1
-                            else:
-                                trios[key3] = 1
-            # count squads (4 together)
-            if len(present) >= 4:
-                for i in range(len(present)):
-                    for j in range(i + 1, len(present)):
-                        for k in range(j + 1, len(present)):
-                            for m in range(k + 1, len(present)):
-                                key4 = (present[i], present[j], present[k], present[m])
-                                if key4 in squads:
-                                    squads[key4] = squads[key4] + 1
-                                else:
-                                    squads[key4] = 1
-            # grab keywords for each character on this line (skip stopwords and their own name)
-            tokens = tokenize(line)
-            if tokens:
-                for charname in present:
-                    keywordbag = keywords[charname]
-                    for token in tokens:
-                        if token in STOPWORDS or token == charname:
-                            continue
-                        if token in keywordbag:
-                            keywordbag[token] = keywordbag[token] + 1
-                        else:
-                            keywordbag[token] = 1
-
-        filestats = FileStats(
+        keywords: Dict[str, Dict[str, int]] = {}
+        for name in self.names:
+            mentions[name] = 0
+            linesforselected[name] = []
+            keywords[name] = {}
+        self.stats = FileStats(
             filename=filepath.name,
             date=parse_date_from_filename(filepath.name),
-            words=words,
-            lines=linescount,
-            tension=tension,
+            words=0,
+            lines=0,
+            tension=0,
             mentions=mentions,
             lines_for_selected=linesforselected,
-            pos=pos,
-            neg=neg,
-            exclaims=exclaims,
-            questions=questions,
-            caps=caps,
-            chars=chars_n,
-            text=text,
-            session_count=len(sessions),
-            session_tensions=session_tensions,
-            session_pos=session_pos,
-            session_neg=session_neg,
-            session_mentions=session_mentions,
+            pos=0,
+            neg=0,
+            exclaims=0,
+            questions=0,
+            caps=0,
+            chars=0,
+            text="",
+            session_count=0,
+            session_tensions=array("B"),
+            session_pos=array("I"),
+            session_neg=array("I"),
+            session_counts=array("I"),
+            names=tuple(self.names),
+            source=str(filepath),
+            keywords=keywords,
+            line_starts=array("Q", [0]),
+        )
+        # bytes and physical lines taken in so far
+        self.offset = 0
+        self.physical = 0
+        self._splitter = SessionSplitter()
+        # who's near who: position = non-blank lines so far (line windows) or words so far (token windows)
+        self._window = SlidingWindow(wordlists.window.size)
+        self._bytoken = wordlists.window.unit == "token"
+        self._position = 0
+        self._tension = [0] * 7
+        # the session still going: tension parts of every line but the last (that one gets rstripped when scoring)
+        self._open = False
+        self._session_tension = [0] * 7
+        self._last_parts: List[int] = []
+        self._last_line = ""
+        # copy spotting: the bytes so far get hashed, every line's words too (merged into the sketch each feed)
+        self._digest = digester()
+        self._shingles: Set[int] = set()
+
+    def feed(self, raw: bytes, final: bool = False) -> ParseDelta:
+        # raw has to end on a line break unless final (then whatever's left is the last line)
+        filestats = self.stats
+        delta = ParseDelta(
+            first_session=filestats.session_count - 1 if self._open else filestats.session_count,
+            sessions_before=filestats.session_count,
         )
-        perfiles.append(filestats)
+        text = decode_text(raw)
+        starts = line_start_offsets(raw)
+        for i in range(1, len(starts)):
+            filestats.line_starts.append(self.offset + starts[i])
+        self.offset = self.offset + len(raw)
+        filestats.words = filestats.words + len(_WORD_RE.findall(text))
+        filestats.exclaims = filestats.exclaims + text.count("!")
+        filestats.questions = filestats.questions + text.count("?")
+        filestats.chars = filestats.chars + len(text)
+        if self.keep_text:
+            filestats.text = filestats.text + text
+
+        # same lines as _split_lines, physical line numbers carry on from the last feed
+        physical_lines = text.split("\n")
+        lastline = len(physical_lines) - 1
+        for i in range(len(physical_lines)):
+            physical = physical_lines[i]
+            lineno = self.physical + i
+            if i == lastline and not (final and physical):
+                break
+            if not _ODD_BREAK_RE.search(physical):
+                self._line(physical, lineno, delta)
+                continue
+            if i < lastline:
+                physical = physical + "\n"
+            for part in physical.splitlines():
+                self._line(part, lineno, delta)
+        self.physical = self.physical + lastline
+
+        if self._open:
+            self._score_session()
+        filestats.tension = tension_score(self._tension)
+        _add_counts(filestats.cooc, delta.cooc)
+        _add_counts(filestats.trios, delta.trios)
+        _add_counts(filestats.squads, delta.squads)
+        for name, bag in delta.keywords.items():
+            _add_counts(filestats.keywords[name], bag)
+        for name, words in delta.variants.items():
+            _add_counts(filestats.variants.setdefault(name, {}), words)
+        self._digest.update(raw)
+        filestats.digest = self._digest.hexdigest()
+        filestats.sketch = merge_sketch(filestats.sketch, self._shingles)
+        self._shingles = set()
+        return delta
+
+    def _line(self, line: str, lineno: int, delta: ParseDelta) -> None:
+        filestats = self.stats
+        names = self.names
+        wordlists = self.wordlists
+        stopwords = wordlists.stop
+        is_break, closed = self._splitter.feed(line)
+        if is_break:
+            if closed is not None:
+                self._score_session()
+                self._open = False
+            # nobody is "near" someone from the last session
+            self._window.clear()
+        if not line.strip():
+            return
+        filestats.lines = filestats.lines + 1
+        # every word goes in the index, even on lines with nobody in them
+        tokens = tokenize(line)
+        for token in tokens:
+            if token not in stopwords:
+                _post(filestats.postings, token, lineno)
+        if tokens:
+            self._shingles.add(shingle_hash(tokens))
+        parts = tension_parts(line, tokens, self._combat)
+        add_tension_parts(self._tension, parts)
+        filestats.caps = filestats.caps + parts[4]
+        pos, neg = self._mood.sentiment(tokens)
+        filestats.pos = filestats.pos + pos
+        filestats.neg = filestats.neg + neg
+        delta.pos = delta.pos + pos
+        delta.neg = delta.neg + neg
+
+        found = {} if self.roster.fuzzy is not None else None
+        counts = self.roster.line_counts(line, found)
+        if found:
+            for charid, words in found.items():
+                _add_counts(delta.variants.setdefault(names[charid], {}), words)
+        if self._bytoken:
+            hits, linetokens = self.roster.line_hits(line)
+            for tokenidx in sorted(hits):
+                _slide(self._window, self._position + tokenidx, hits[tokenidx], names, delta.cooc, delta.trios, delta.squads)
+            self._position = self._position + linetokens
+        else:
+            if counts:
+                _slide(self._window, self._position, list(counts), names, delta.cooc, delta.trios, delta.squads)
+            self._position = self._position + 1
+        # a --- line is a break, not part of any session
+        if not is_break:
+            filestats.line_tension.append(tension_score(parts))
+            filestats.line_mood.append(clamp(pos - neg, -127, 127))
+            self._session_line(line, parts, pos, neg, counts)
+        if not counts:
+            return
+        for charid, count in counts.items():
+            name = names[charid]
+            filestats.mentions[name] = filestats.mentions[name] + count
+            delta.mentions[name] = delta.mentions.get(name, 0) + count
+            snippets = filestats.lines_for_selected[name]
+            if len(snippets) < 14:
+                snippets.append(line.strip()[:180])
+        present = []
+        for charid in counts:
+            present.append(names[charid])
+        present.sort()
+        for charname in present:
+            _post(filestats.postings, "@" + charname, lineno)
+        # grab keywords for each character on this line (skip stopwords, their own name and typo'd names)
+        if tokens:
+            typos = set()
+            if found:
+                for words in found.values():
+                    typos.update(words)
+            for charname in present:
+                keywordbag = delta.keywords.get(charname)
+                if keywordbag is None:
+                    keywordbag = {}
+                    delta.keywords[charname] = keywordbag
+                for token in tokens:
+                    if token in stopwords or token == charname or token in typos:
+                        continue
+                    if token in keywordbag:
+                        keywordbag[token] = keywordbag[token] + 1
+                    else:
+                        keywordbag[token] = 1
+
+    def _session_line(self, line: str, parts: List[int], pos: int, neg: int, counts: Dict[int, int]) -> None:
+        filestats = self.stats
+        width = len(self.names)
+        if not self._open:
+            # first line of a new session
+            self._open = True
+            filestats.session_count = filestats.session_count + 1
+            filestats.session_tensions.append(0)
+            filestats.session_pos.append(0)
+            filestats.session_neg.append(0)
+            filestats.session_counts.extend([0] * width)
+            filestats.session_lines.append(0)
+            self._session_tension = [0] * 7
+            line = line.lstrip()
+            parts = _trimmed(parts, line)
+        else:
+            add_tension_parts(self._session_tension, self._last_parts)
+        self._last_parts = parts
+        self._last_line = line
+        index = filestats.session_count - 1
+        filestats.session_lines[index] = filestats.session_lines[index] + 1
+        filestats.session_pos[index] = filestats.session_pos[index] + pos
+        filestats.session_neg[index] = filestats.session_neg[index] + neg
+        base = index * width
+        for charid, count in counts.items():
+            filestats.session_counts[base + charid] = filestats.session_counts[base + charid] + count
+
+    def _score_session(self) -> None:
+        # same as calc_tension on the session's stripped text
+        total = list(self._session_tension)
+        last = self._last_line.rstrip()
+        add_tension_parts(total, _trimmed(self._last_parts, last))
+        self.stats.session_tensions[self.stats.session_count - 1] = tension_score(total)
+
+
+def analyze_file(
+    filepath: LogPath,
+    characters: List[Character] = CHARACTERS,
+    raw: Optional[bytes] = None,
+    wordlists: WordLists = DEFAULT_WORDS,
+) -> FileStats:
+    # the whole file in one feed (raw = the file's bytes if a reader thread already fetched them),
+    # a compressed log without raw gets streamed instead (see analyze_stream)
+    if raw is None:
+        if is_streamed(filepath):
+            return analyze_stream(filepath, characters, wordlists)
+        raw = read_log_bytes(filepath)
+    parser = LogParser(filepath, characters, wordlists)
+    parser.feed(raw, final=True)
+    return parser.stats
+
+
+def analyze_stream(filepath: LogPath, characters: List[Character] = CHARACTERS, wordlists: WordLists = DEFAULT_WORDS) -> FileStats:
+    # decompressed a chunk at a time, the finished lines of each chunk go to one parser (same numbers as one feed)
+    parser = LogParser(filepath, characters, wordlists)
+    pending = b""
+    for chunk in read_log_chunks(filepath):
+        pending = pending + chunk
+        cut = whole_lines(pending)
+        if cut:
+            parser.feed(pending[:cut])
+            pending = pending[cut:]
+    parser.feed(pending, final=True)
+    return parser.stats
+
+
+def copy_of(filestats: FileStats, filepath: LogPath) -> FileStats:
+    # filepath has the same bytes as filestats' file: same numbers, just a different name (and date) on it.
+    # its own dicts and arrays too, so patching one record later never changes the other
+    clone = copy.deepcopy(filestats)
+    return replace(clone, filename=filepath.name, date=parse_date_from_filename(filepath.name), source=str(filepath))
 
+
+def analyze_raw(
+    filepath: LogPath, raw: Optional[bytes], characters: List[Character], wordlists: WordLists, seen: Dict[str, FileStats]
+) -> FileStats:
+    # analyze_file, unless a file with the exact same bytes was already done (seen: content hash -> its record).
+    # raw=None for compressed logs: they get streamed, their hash is only known once they're parsed
+    if raw is None:
+        filestats = analyze_file(filepath, characters, None, wordlists)
+        seen.setdefault(filestats.digest, filestats)
+        return filestats
+    same = seen.get(content_digest(raw))
+    if same is not None:
+        return copy_of(same, filepath)
+    filestats = analyze_file(filepath, characters, raw, wordlists)
+    seen[filestats.digest] = filestats
+    return filestats
+
+
+def _line_signals(alllines: List[str], wordlists: WordLists) -> Tuple[array, array]:
+    # line_tension / line_mood over again for new word lists, same lines LogParser gives them to
+    mood = mood_lexicon(wordlists)
+    combat = combat_lexicon(wordlists)
+    line_tension = array("B")
+    line_mood = array("b")
+    splitter = SessionSplitter()
+    for line in alllines:
+        is_break, _ = splitter.feed(line)
+        if is_break or not line.strip():
+            continue
+        tokens = tokenize(line)
+        line_tension.append(tension_score(tension_parts(line, tokens, combat)))
+        pos, neg = mood.sentiment(tokens)
+        line_mood.append(clamp(pos - neg, -127, 127))
+    return line_tension, line_mood
+
+
+def file_text(filestats: FileStats, reread: Optional[List[str]] = None) -> str:
+    # the file's whole text. a fresh parse keeps it, but cache entries and followed logs leave it out (it's sitting
+    # on disk anyway) so then the file gets read again (and its source goes in reread, so callers can say so).
+    # OSError if it's gone or isnt what got counted anymore
+    if filestats.text or not filestats.chars:
+        return filestats.text
+    text = decode_text(read_log_bytes(parse_source(filestats.source)))
+    if len(text) != filestats.chars:
+        raise OSError(f"{filestats.source} changed since it was read")
+    if reread is not None:
+        reread.append(filestats.source)
+    return text
+
+
+def rescore_file(filestats: FileStats, text: str, wordlists: WordLists, sentiment: bool = True, tension: bool = True) -> FileStats:
+    # redo only the word-list numbers from the file's text (see file_text), the roster stuff (cooc, trios, index...)
+    # stays as is
+    alllines, _ = _split_lines(text)
+    sessiontexts = _session_texts(alllines, split_session_spans(alllines))
+    changes: Dict[str, object] = {}
+    if sentiment or tension:
+        line_tension, line_mood = _line_signals(alllines, wordlists)
+        if sentiment:
+            changes["line_mood"] = line_mood
+        if tension:
+            changes["line_tension"] = line_tension
+    if sentiment:
+        changes["pos"], changes["neg"] = _sentiment(text, wordlists)
+        session_pos = array("I")
+        session_neg = array("I")
+        for sessiontext in sessiontexts:
+            sessionpos, sessionneg = _sentiment(sessiontext, wordlists)
+            session_pos.append(sessionpos)
+            session_neg.append(sessionneg)
+        changes["session_pos"] = session_pos
+        changes["session_neg"] = session_neg
+    if tension:
+        combat = combat_lexicon(wordlists)
+        changes["tension"] = calc_tension(text, combat)
+        changes["session_tensions"] = array("B", [calc_tension(sessiontext, combat) for sessiontext in sessiontexts])
+    return replace(filestats, **changes)
+
+
+def rekey_file(filestats: FileStats, text: str, characters: List[Character], wordlists: WordLists) -> FileStats:
+    # new stopwords: redo the word index and the keyword bags from the file's text (same walk as LogParser._line),
+    # every count stays as is
+    alllines, physno = _split_lines(text)
+    roster = compile_roster(characters, wordlists.fuzzy, wordlists.fuzzy_ignore)
+    names = roster.names
+    stopwords = wordlists.stop
+    postings: Dict[str, array] = {}
+    keywords: Dict[str, Dict[str, int]] = {}
+    for name in names:
+        keywords[name] = {}
+    for i in range(len(alllines)):
+        line = alllines[i]
+        if not line.strip():
+            continue
+        lineno = physno[i]
+        tokens = tokenize(line)
+        for token in tokens:
+            if token not in stopwords:
+                _post(postings, token, lineno)
+        found = {} if roster.fuzzy is not None else None
+        counts = roster.line_counts(line, found)
+        if not counts:
+            continue
+        present = []
+        for charid in counts:
+            present.append(names[charid])
+        present.sort()
+        for charname in present:
+            _post(postings, "@" + charname, lineno)
+        typos = set()
+        if found:
+            for words in found.values():
+                typos.update(words)
+        for charname in present:
+            keywordbag = keywords[charname]
+            for token in tokens:
+                if token in stopwords or token == charname or token in typos:
+                    continue
+                if token in keywordbag:
+                    keywordbag[token] = keywordbag[token] + 1
+                else:
+                    keywordbag[token] = 1
+    return replace(filestats, postings=postings, keywords=keywords)
+
+
+def _add_counts(target: Dict, counts: Dict) -> None:
+    for key, count in counts.items():
+        if key in target:
+            target[key] = target[key] + count
+        else:
+            target[key] = count
+
+
+def build_dashboard(
+    perfiles: List[FileStats], characters: List[Character] = CHARACTERS, duplicates: str = "skip"
+) -> DashboardStats:
+    # fold the per-file results together (perfiles must already be in file order)
+    # only totals get added up here, the rest waits until a panel (or caller) needs it
+    # duplicates: what happens to copies of other logs, see duplicates.DUPLICATE_MODES
+    found = find_duplicates(perfiles) if duplicates != "off" else {}
+    if found and duplicates != "keep":
+        kept = []
+        for i, filestats in enumerate(perfiles):
+            if i not in found or not dropped(found[i], duplicates):
+                kept.append(filestats)
+        perfiles = kept
+    names = compile_roster(characters).names
+    totals = {}
+    for name in names:
+        totals[name] = 0
+    for filestats in perfiles:
+        for name in names:
+            totals[name] += filestats.mentions[name]
+    return DashboardStats(totals=totals, per_file=perfiles, duplicates=[found[i] for i in sorted(found)])
+
+
+def _fold_table(stats: DashboardStats, attr: str) -> Dict:
+    table: Dict = {}
+    for filestats in stats.per_file:
+        _add_counts(table, getattr(filestats, attr))
+    return table
+
+
+def _fold_variants(stats: DashboardStats) -> Dict[str, Dict[str, int]]:
+    variants: Dict[str, Dict[str, int]] = {}
+    for filestats in stats.per_file:
+        for name, words in filestats.variants.items():
+            _add_counts(variants.setdefault(name, {}), words)
+    return variants
+
+
+def _fold_keywords(stats: DashboardStats) -> Dict[str, Dict[str, int]]:
+    keywords: Dict[str, Dict[str, int]] = {}
+    for name in stats.totals:
+        keywords[name] = {}
+    for filestats in stats.per_file:
+        for charname, keywordbag in filestats.keywords.items():
+            _add_counts(keywords[charname], keywordbag)
+    return keywords
+
+
+def _fold_trend(stats: DashboardStats) -> List[Tuple[str, Dict[str, int]]]:
     # smoosh everything into trend by date
+    names = list(stats.totals)
     trendmap: Dict[str, Dict[str, int]] = {}
-    for filestats in perfiles:
+    for filestats in stats.per_file:
         datestr = filestats.date
         if datestr not in trendmap:
             trendmap[datestr] = {}
-            for character in CHARACTERS:
-                trendmap[datestr][character.name] = 0
-        for character in CHARACTERS:
-            trendmap[datestr][character.name] += filestats.mentions[character.name]
+            for name in names:
+                trendmap[datestr][name] = 0
+        for name in names:
+            trendmap[datestr][name] += filestats.mentions[name]
 
     trenddates = list(trendmap.keys())
     trenddates.sort()
     trend = []
     for date in trenddates:
         trend.append((date, trendmap[date]))
+    return trend
+
+
+def _fold_neighbors(stats: DashboardStats) -> Dict[str, Dict[str, int]]:
+    neighbors: Dict[str, Dict[str, int]] = {}
+    for (char_a, char_b), weight in stats.cooc.items():
+        neighbors.setdefault(char_a, {})[char_b] = weight
+        neighbors.setdefault(char_b, {})[char_a] = weight
+    return neighbors
+
+
+# derived table -> (what it reads: FileStats fields or other derived tables, how to build it)
+_DERIVED: Dict[str, Tuple[Tuple[str, ...], Callable[[DashboardStats], object]]] = {
+    "trend": (("date", "mentions"), _fold_trend),
+    "cooc": (("cooc",), lambda stats: _fold_table(stats, "cooc")),
+    "trios": (("trios",), lambda stats: _fold_table(stats, "trios")),
+    "squads": (("squads",), lambda stats: _fold_table(stats, "squads")),
+    "keywords": (("keywords",), _fold_keywords),
+    "neighbors": (("@cooc",), _fold_neighbors),
+    "terms": (("@keywords",), lambda stats: TermMatrix(stats.keywords, stats.totals)),
+    "variants": (("variants",), _fold_variants),
+    "timeline": (
+        ("date", "mentions", "session_count", "session_pos", "session_neg", "session_tensions", "session_counts"),
+        lambda stats: Timeline(stats.per_file, list(stats.totals)),
+    ),
+    "signal": (("line_tension", "line_mood", "session_lines"), lambda stats: LineSignal(stats.per_file)),
+}
+
+
+def _reads(name: str) -> Set[str]:
+    # every FileStats field a derived table ends up depending on ("@x" = built from derived table x)
+    out: Set[str] = set()
+    for dep in _DERIVED[name][0]:
+        if dep.startswith("@"):
+            out |= _reads(dep[1:])
+        else:
+            out.add(dep)
+    return out
+
+
+# reader threads keep up to PREFETCH_DEPTH files fetched ahead of the one being analyzed
+PREFETCH_READERS = 4
+PREFETCH_DEPTH = 8
+
+
+def _fetch(
+    filepath: LogPath, characters: List[Character], cache: Optional[FileCache], wordlists: WordLists
+) -> Tuple[Optional[FileStats], Optional[bytes]]:
+    # runs on a reader thread: a cache hit, or the raw bytes to analyze (None for compressed logs, those get
+    # decompressed a chunk at a time while they're parsed)
+    if cache is not None:
+        filestats = cache.get(filepath, characters, wordlists)
+        if filestats is not None:
+            return (filestats, None)
+    if is_streamed(filepath):
+        return (None, None)
+    return (None, read_log_bytes(filepath))
+
+
+def analyze_files(
+    files: List[LogPath],
+    characters: List[Character] = CHARACTERS,
+    cache: Optional[FileCache] = None,
+    wordlists: WordLists = DEFAULT_WORDS,
+) -> List[FileStats]:
+    # disk (or nfs) waits overlap with parsing: readers fetch ahead, this thread parses in file order,
+    # and it only ever runs PREFETCH_DEPTH files ahead so memory stays bounded
+    perfiles: List[FileStats] = []
+    if not files:
+        return perfiles
+    # copies of a file already done (cached or parsed) get its numbers without being parsed again
+    seen: Dict[str, FileStats] = {}
+    with ThreadPoolExecutor(max_workers=PREFETCH_READERS, thread_name_prefix="insider-read") as pool:
+        ahead: Deque[Future] = deque()
+        nextidx = 0
+        for filepath in files:
+            while nextidx < len(files) and len(ahead) < PREFETCH_DEPTH:
+                ahead.append(pool.submit(_fetch, files[nextidx], characters, cache, wordlists))
+                nextidx = nextidx + 1
+            filestats, raw = ahead.popleft().result()
+            if filestats is None:
+                filestats = analyze_raw(filepath, raw, characters, wordlists, seen)
+                if cache is not None:
+                    # writing the cache entry is io too, let a reader do it
+                    pool.submit(cache.put, filepath, characters, filestats, wordlists)
+            else:
+                seen.setdefault(filestats.digest, filestats)
+            perfiles.append(filestats)
+    return perfiles
 
-    return DashboardStats(totals=totals, per_file=perfiles, trend=trend, cooc=cooc, keywords=keywords, trios=trios, squads=squads)
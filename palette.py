@@ -0,0 +1,67 @@
+# the ui's fixed colours parsed once into rich styles, every panel gets built as Text out of these
+# (no markup strings, so nothing has to be re-parsed on every update)
+from __future__ import annotations
+
+from typing import Dict, List, Tuple, Union
+
+from rich.style import Style
+from rich.text import Text
+
+from helpers import clamp, heat_color
+
+_STYLES: Dict[str, Style] = {}
+
+# a piece of a line: plain string, Text, or (string, style like "#cbb7ff" / "bold #e9ecff")
+Part = Union[str, Text, Tuple[str, str]]
+
+
+def style(spec: str) -> Style:
+    cached = _STYLES.get(spec)
+    if cached is None:
+        cached = Style.parse(spec)
+        _STYLES[spec] = cached
+    return cached
+
+
+def spans(*parts: Part) -> Text:
+    out = Text()
+    for part in parts:
+        if isinstance(part, str):
+            out.append(part)
+        elif isinstance(part, Text):
+            out.append_text(part)
+        else:
+            out.append(part[0], style(part[1]))
+    return out
+
+
+def join_lines(rows: List[Text]) -> Text:
+    return Text("\n").join(rows)
+
+
+def div(title: str = "") -> Text:
+    # divider line for the ui, optional title in the middle
+    if title:
+        return Text(f"──── {title} ────", style("#6f7398"))
+    return Text("────────────────────", style("#6f7398"))
+
+
+def heat_bar(count: int, max_count: int, width: int = 14) -> Text:
+    if max_count <= 0:
+        filled = 0
+        ratio = 0.0
+    else:
+        ratio = count / max_count
+        filled = int(round(ratio * width))
+        filled = clamp(filled, 0, width)
+    return spans(("#" * filled, heat_color(ratio)), ("·" * (width - filled), "#5c607f"))
+
+
+def entropy_bar(x: float, width: int = 10) -> Text:
+    if x < 0.0:
+        x = 0.0
+    elif x > 1.0:
+        x = 1.0
+    filled = int(round(x * width))
+    filled = clamp(filled, 0, width)
+    return spans(("█" * filled, heat_color(x)), ("·" * (width - filled), "#3b3f5c"))
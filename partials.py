@@ -0,0 +1,174 @@
+# partial stats files so big archives can be crunched as separate jobs and merged after
+from __future__ import annotations
+
+import gzip
+import json
+from array import array
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from archives import LogPath
+from config import CHARACTERS, DEFAULT_WORDS, Character, WordLists, words_fingerprint
+from discovery import list_log_files
+from models import ANALYSIS_VERSION, DashboardStats, FileStats, analyze_files, build_dashboard, file_sort_key
+
+# bump this if the file layout changes
+PARTIAL_VERSION = 8
+
+# these FileStats fields have tuple keys, json cant do that so they get stored as [key..., count] rows
+_TUPLE_KEY_FIELDS = ("cooc", "trios", "squads")
+# array columns and their typecodes (stored as plain lists)
+_ARRAY_FIELDS = {
+    "session_tensions": "B",
+    "session_pos": "I",
+    "session_neg": "I",
+    "session_counts": "I",
+    "line_starts": "Q",
+    "line_tension": "B",
+    "line_mood": "b",
+    "session_lines": "I",
+    "sketch": "I",
+}
+
+
+@dataclass
+class PartialStats:
+    roster: List[Tuple[str, Tuple[str, ...]]]
+    files: List[FileStats]
+    # fingerprint of the word lists the shard was made with (see config.words_fingerprint)
+    words: str = ""
+
+
+def roster_of(characters: List[Character]) -> List[Tuple[str, Tuple[str, ...]]]:
+    out = []
+    for character in characters:
+        out.append((character.name, tuple(character.aliases)))
+    return out
+
+
+def characters_of(roster: List[Tuple[str, Tuple[str, ...]]]) -> List[Character]:
+    out = []
+    for name, aliases in roster:
+        out.append(Character(name, tuple(aliases)))
+    return out
+
+
+def compute_partial(
+    folder: Path,
+    files: Optional[List[LogPath]] = None,
+    characters: List[Character] = CHARACTERS,
+    wordlists: WordLists = DEFAULT_WORDS,
+) -> PartialStats:
+    # same per-file work as compute_stats, just not folded together yet
+    if files is None:
+        files = list_log_files(folder)
+    perfiles = analyze_files(files, characters, wordlists=wordlists)
+    perfiles.sort(key=lambda fs: file_sort_key(fs.filename, fs.source))
+    return PartialStats(roster=roster_of(characters), files=perfiles, words=words_fingerprint(wordlists))
+
+
+def merge_partials(partials: List[PartialStats]) -> PartialStats:
+    # merging is just a union of file records, so the order you merge in never matters
+    if not partials:
+        return PartialStats(roster=roster_of(CHARACTERS), files=[], words=words_fingerprint(DEFAULT_WORDS))
+    roster = partials[0].roster
+    words = partials[0].words
+    bysource: Dict[str, FileStats] = {}
+    for partial in partials:
+        if partial.roster != roster:
+            raise ValueError("partials were made with different character lists")
+        if partial.words != words:
+            raise ValueError("partials were made with different word lists or cooc windows")
+        for filestats in partial.files:
+            seen = bysource.get(filestats.source)
+            if seen is not None and seen != filestats:
+                raise ValueError(f"conflicting copies of {filestats.source}")
+            bysource[filestats.source] = filestats
+
+    perfiles = list(bysource.values())
+    perfiles.sort(key=lambda fs: file_sort_key(fs.filename, fs.source))
+    return PartialStats(roster=roster, files=perfiles, words=words)
+
+
+def partial_to_dashboard(partial: PartialStats, duplicates: str = "skip") -> DashboardStats:
+    # uses the roster the partial was made with, not whatever config.py says right now
+    # (copies from different partials, like two backup drives with the same season on them, only count once)
+    return build_dashboard(partial.files, characters_of(partial.roster), duplicates)
+
+
+def _filestats_to_json(filestats: FileStats) -> Dict:
+    out = {}
+    for f in fields(FileStats):
+        value = getattr(filestats, f.name)
+        if f.name in _TUPLE_KEY_FIELDS:
+            rows = []
+            for key, count in value.items():
+                rows.append([*key, count])
+            value = rows
+        elif f.name == "postings":
+            value = {term: plist.tolist() for term, plist in value.items()}
+        elif f.name in _ARRAY_FIELDS:
+            value = value.tolist()
+        elif f.name == "names":
+            value = list(value)
+        out[f.name] = value
+    return out
+
+
+def _filestats_from_json(data: Dict) -> FileStats:
+    kwargs = {}
+    for f in fields(FileStats):
+        value = data[f.name]
+        if f.name in _TUPLE_KEY_FIELDS:
+            table = {}
+            for row in value:
+                table[tuple(row[:-1])] = row[-1]
+            value = table
+        elif f.name == "postings":
+            value = {term: array("I", plist) for term, plist in value.items()}
+        elif f.name in _ARRAY_FIELDS:
+            value = array(_ARRAY_FIELDS[f.name], value)
+        elif f.name == "names":
+            value = tuple(value)
+        kwargs[f.name] = value
+    return FileStats(**kwargs)
+
+
+def write_partial(partial: PartialStats, path: Path) -> None:
+    files = []
+    for filestats in partial.files:
+        files.append(_filestats_to_json(filestats))
+    payload = {
+        "version": PARTIAL_VERSION,
+        "analysis": ANALYSIS_VERSION,
+        "roster": [[name, list(aliases)] for name, aliases in partial.roster],
+        "words": partial.words,
+        "files": files,
+    }
+    with gzip.open(path, "wt", encoding="utf-8") as fh:
+        json.dump(payload, fh)
+
+
+def read_partial(path: Path) -> PartialStats:
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        payload = json.load(fh)
+    if payload.get("version") != PARTIAL_VERSION:
+        raise ValueError(f"{path} is partial version {payload.get('version')}, expected {PARTIAL_VERSION}")
+    if payload.get("analysis") != ANALYSIS_VERSION:
+        # numbers from an older analyze_file wont line up with fresh ones, redo that shard
+        raise ValueError(f"{path} was made by an older version of the analysis, re-run --emit-partial for it")
+    roster = []
+    for name, aliases in payload["roster"]:
+        roster.append((name, tuple(aliases)))
+    files = []
+    for data in payload["files"]:
+        files.append(_filestats_from_json(data))
+    return PartialStats(roster=roster, files=files, words=payload["words"])
+
+
+def load_merged(paths: List[Path]) -> PartialStats:
+    partials = []
+    for path in paths:
+        partials.append(read_partial(path))
+    return merge_partials(partials)
@@ -0,0 +1,185 @@
+# approximate mode for huge archives: crunch a random sample of files first, scale it up to the whole archive,
+# then keep going in the background until every file is in and the numbers are exact
+from __future__ import annotations
+
+import math
+import random
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from archives import LogPath, decoded_size
+from backends import BACKENDS, pick_backend
+from config import CHARACTERS, DEFAULT_WORDS, Character, WordLists
+from models import DashboardStats, FileStats, build_dashboard
+
+if TYPE_CHECKING:
+    from cache import FileCache
+
+# first sample is this many files, every batch after that is twice the last one
+# (early estimates show up fast, later ones dont refold everything too often)
+FIRST_BATCH = 8
+# 95% confidence
+_Z = 1.96
+
+
+@dataclass
+class Estimate:
+    # how far along an approximate board is and how much to trust it
+    files_done: int
+    files_total: int
+    # +- on each character's scaled total
+    margins: Dict[str, float] = field(default_factory=dict)
+    # +- on the pair/trio/squad counts, as a fraction of the count
+    pairs_margin: float = math.inf
+    # +- on the overall positive share of mood words, as a fraction (0.04 = 4 points)
+    mood_margin: float = math.inf
+
+    @property
+    def fraction(self) -> float:
+        return self.files_done / self.files_total if self.files_total else 1.0
+
+
+def ratio_margin(ys: List[float], xs: List[float], population: int) -> float:
+    # 95% margin on sum(ys) / sum(xs) from a random sample of population items (ratio estimator,
+    # with the finite population correction so it hits 0 once everything is sampled)
+    count = len(ys)
+    if count >= population:
+        return 0.0
+    if count < 2:
+        return math.inf
+    xsum = sum(xs)
+    if xsum <= 0:
+        return math.inf
+    ratio = sum(ys) / xsum
+    spread = 0.0
+    for y, x in zip(ys, xs):
+        spread = spread + (y - ratio * x) ** 2
+    spread = spread / (count - 1)
+    xmean = xsum / count
+    return _Z * math.sqrt((1.0 - count / population) * spread / count) / xmean
+
+
+def estimate_stats(
+    sample: List[FileStats],
+    sizes: List[int],
+    total_files: int,
+    total_size: int,
+    characters: List[Character] = CHARACTERS,
+) -> DashboardStats:
+    # sample (in file order) + each sampled file's size (or 1 each, see ProgressiveScan._run) -> a board scaled up
+    # to the whole archive
+    # (copies stay in, they're part of what the sizes scale by; the exact board at the end drops them)
+    # counts get scaled: totals, pair/trio/squad tables, keywords and typo'd names. the trend, the session timeline
+    # and the line signal only have the sampled files' dates and sessions, those stay as is (the ui marks them ~sample)
+    stats = build_dashboard(sample, characters, "off")
+    samplesize = sum(sizes)
+    scale = total_size / samplesize if samplesize else 1.0
+    estimate = Estimate(files_done=len(sample), files_total=total_files)
+
+    for name in list(stats.totals):
+        ys = [filestats.mentions.get(name, 0) for filestats in sample]
+        estimate.margins[name] = ratio_margin(ys, sizes, total_files) * total_size
+        stats.totals[name] = int(round(stats.totals[name] * scale))
+    for table in ("cooc", "trios", "squads"):
+        scaled = {}
+        for key, count in getattr(stats, table).items():
+            scaled[key] = max(1, int(round(count * scale)))
+        stats._derived[table] = scaled
+    for table in ("keywords", "variants"):
+        scaled = {}
+        for name, bag in getattr(stats, table).items():
+            scaledbag = {}
+            for word, count in bag.items():
+                scaledbag[word] = max(1, int(round(count * scale)))
+            scaled[name] = scaledbag
+        stats._derived[table] = scaled
+
+    pairs = [sum(filestats.cooc.values()) for filestats in sample]
+    pairsum = sum(pairs)
+    if pairsum:
+        estimate.pairs_margin = ratio_margin(pairs, sizes, total_files) * samplesize / pairsum
+    pos = [filestats.pos for filestats in sample]
+    signals = [filestats.pos + filestats.neg for filestats in sample]
+    estimate.mood_margin = ratio_margin(pos, signals, total_files)
+    stats.estimate = estimate
+    return stats
+
+
+class ProgressiveScan:
+    # one background pass over the folder's files in random order, on_update gets every new board
+    # (estimates while it runs, then the exact one, same as compute_stats would give; None = it died, see .error)
+    def __init__(
+        self,
+        files: List[LogPath],
+        characters: List[Character] = CHARACTERS,
+        cache: Optional[FileCache] = None,
+        wordlists: WordLists = DEFAULT_WORDS,
+        seed: int = 0,
+        duplicates: str = "skip",
+        backend: str = "auto",
+    ) -> None:
+        self.files = files
+        self.characters = characters
+        self.cache = cache
+        self.wordlists = wordlists
+        self.seed = seed
+        self.duplicates = duplicates
+        # picked again for every batch (see backends.pick_backend), batches double so later ones go parallel
+        self.backend = backend
+        self.error = ""
+        # set right before the exact board goes out
+        self.finished = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, on_update: Callable[[Optional[DashboardStats]], None]) -> None:
+        self._thread = threading.Thread(target=self._run, args=(on_update,), name="insider-approx", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self, on_update: Callable[[Optional[DashboardStats]], None]) -> None:
+        files = self.files
+        # the sample gets scaled up by decoded bytes when every file's is known up front (plain logs, zip members),
+        # otherwise by file count, a .gz's compressed size would count its logs a few times too small
+        sizes: List[int] = []
+        for filepath in files:
+            size = decoded_size(filepath)
+            if size is None:
+                sizes = [1] * len(files)
+                break
+            sizes.append(size)
+        totalsize = sum(sizes)
+        order = list(range(len(files)))
+        random.Random(self.seed).shuffle(order)
+        done: Dict[int, FileStats] = {}
+        batch = FIRST_BATCH
+        pos = 0
+        while pos < len(order):
+            if self._stop.is_set():
+                return
+            chunk = order[pos:pos + batch]
+            batchfiles = [files[i] for i in chunk]
+            try:
+                analyze = BACKENDS[pick_backend(batchfiles, self.backend)]
+                results = analyze(batchfiles, self.characters, self.cache, self.wordlists)
+            except (OSError, ValueError) as exc:
+                self.error = str(exc)
+                on_update(None)
+                return
+            for i, filestats in zip(chunk, results):
+                done[i] = filestats
+            pos = pos + len(chunk)
+            batch = batch * 2
+            if self._stop.is_set():
+                return
+            if pos < len(order):
+                picked = sorted(done)
+                on_update(
+                    estimate_stats([done[i] for i in picked], [sizes[i] for i in picked], len(files), totalsize, self.characters)
+                )
+        # everything's in: plain fold in file order, no estimate attached
+        self.finished = True
+        on_update(build_dashboard([done[i] for i in range(len(files))], self.characters, self.duplicates))
@@ -0,0 +1,83 @@
+# who counts as "together": characters within the last N lines (or N words) of each other,
+# kept as a sliding window so every mention is added once and dropped once however big N is
+from __future__ import annotations
+
+from collections import deque
+from typing import Deque, Dict, List, Set, Tuple
+
+
+class SlidingWindow:
+    # character id -> mentions still inside the window, positions only ever go forward
+    def __init__(self, size: int) -> None:
+        self.size = max(1, size)
+        self.counts: Dict[int, int] = {}
+        self._queue: Deque[Tuple[int, int]] = deque()
+
+    def clear(self) -> None:
+        self.counts.clear()
+        self._queue.clear()
+
+    def advance(self, position: int) -> None:
+        # drop whatever fell out of the window ending at position
+        queue = self._queue
+        counts = self.counts
+        while queue and queue[0][0] <= position - self.size:
+            _, charid = queue.popleft()
+            left = counts[charid] - 1
+            if left:
+                counts[charid] = left
+            else:
+                del counts[charid]
+
+    def add(self, position: int, charid: int) -> None:
+        self._queue.append((position, charid))
+        self.counts[charid] = self.counts.get(charid, 0) + 1
+
+
+def count_together(
+    present: List[str],
+    fresh: Set[str],
+    cooc: Dict[Tuple[str, str], int],
+    trios: Dict[Tuple[str, str, str], int],
+    squads: Dict[Tuple[str, str, str, str], int],
+) -> None:
+    # present = everyone in the window (sorted), fresh = who just got mentioned
+    # a group counts when at least one of them is fresh, so a pair gets counted each time one of them comes up
+    # near the other (with a 1 line window that's just every group on the line, like it always was)
+    everyone = len(fresh) == len(present)
+    # count pairs (2 together)
+    if len(present) >= 2:
+        for i in range(len(present)):
+            for j in range(i + 1, len(present)):
+                if not everyone and present[i] not in fresh and present[j] not in fresh:
+                    continue
+                key = (present[i], present[j])
+                if key in cooc:
+                    cooc[key] = cooc[key] + 1
+                else:
+                    cooc[key] = 1
+    # count trios (3 together)
+    if len(present) >= 3:
+        for i in range(len(present)):
+            for j in range(i + 1, len(present)):
+                for k in range(j + 1, len(present)):
+                    if not everyone and present[i] not in fresh and present[j] not in fresh and present[k] not in fresh:
+                        continue
+                    key3 = (present[i], present[j], present[k])
+                    if key3 in trios:
+                        trios[key3] = trios[key3] + 1
+                    else:
+                        trios[key3] = 1
+    # count squads (4 together)
+    if len(present) >= 4:
+        for i in range(len(present)):
+            for j in range(i + 1, len(present)):
+                for k in range(j + 1, len(present)):
+                    for m in range(k + 1, len(present)):
+                        if not everyone and present[i] not in fresh and present[j] not in fresh and present[k] not in fresh and present[m] not in fresh:
+                            continue
+                        key4 = (present[i], present[j], present[k], present[m])
+                        if key4 in squads:
+                            squads[key4] = squads[key4] + 1
+                        else:
+                            squads[key4] = 1
@@ -1,10 +1,36 @@
 # drawing the panels (heatmap, meta, mood, etc)
 from __future__ import annotations
 
-from typing import Dict, List, Tuple
+import os
 
-from helpers import div, entropy_bar, entropy_spark, heat_color, shannon_entropy
+from typing import Dict, List, Optional, Tuple
+
+from rich.text import Text
+
+from helpers import entropy_spark, heat_color
 from models import DashboardStats
+from palette import div, entropy_bar, join_lines, spans, style
+
+
+def estimate_mark(stats: DashboardStats) -> Text:
+    # tag for numbers that are still scaled up from a sample (approximate mode)
+    if stats.estimate is None:
+        return Text()
+    return spans(" ", ("~est", "#ffd6a5"))
+
+
+def sample_mark(stats: DashboardStats) -> Text:
+    # tag for numbers that only cover the sampled files and arent scaled up (sessions, dates, lines)
+    if stats.estimate is None:
+        return Text()
+    return spans(" ", ("~sample", "#6f7398"))
+
+
+def margin_text(margin: float, scale: float = 1.0, unit: str = "") -> str:
+    # "±12" / "±4pts", or "±?" when there's too little sampled to say
+    if margin == float("inf"):
+        return "±?"
+    return f"±{margin * scale:.0f}{unit}"
 
 
 def _abbr(name: str) -> str:
@@ -17,84 +43,99 @@ def _abbr(name: str) -> str:
     return (name[0] + name[1]).upper()
 
 
-def render_cooc_heatmap(cooc: Dict[Tuple[str, str], int], names: List[str], selected: str, max_width: int) -> str:
-    # draw the co-occurrence matrix as a little heatmap
+# zoom level -> (cell, gap between cells), 2 is the old roomy look
+HEATMAP_ZOOMS = [("█", ""), ("█", " "), ("██", " ")]
+
+
+def heatmap_columns(max_width: int, zoom: int) -> int:
+    # how many columns fit next to the 3 wide row labels
+    cell, gap = HEATMAP_ZOOMS[zoom]
+    return max(1, (max_width - 3 + len(gap)) // (len(cell) + len(gap)))
+
+
+def render_cooc_heatmap(
+    neighbors: Dict[str, Dict[str, int]],
+    names: List[str],
+    selected: str,
+    max_width: int,
+    max_rows: int = 12,
+    row_offset: int = 0,
+    col_offset: int = 0,
+    zoom: int = 2,
+) -> Text:
+    # draw the co-occurrence matrix as a little heatmap, only the window that fits gets looked at
     if not names:
-        return "[#6f7398]no matrix data[/]"
+        return Text("no matrix data", style("#6f7398"))
 
+    cell, gap = HEATMAP_ZOOMS[zoom]
     namecount = len(names)
-    needed = 3 + namecount * 3
-    if needed > max_width:
-        maxnames = max(3, (max_width - 3) // 3)
-        names = names[:maxnames]
-        namecount = len(names)
-
-    # build the matrix, fill from cooc data
-    matrix = []
-    for i in range(namecount):
-        row = []
-        for j in range(namecount):
-            row.append(0)
-        matrix.append(row)
-
-    nameidx = {}
-    for i in range(namecount):
-        nameidx[names[i]] = i
-    for (char_a, char_b), weight in cooc.items():
-        if char_a in nameidx and char_b in nameidx:
-            rowidx, colidx = nameidx[char_a], nameidx[char_b]
-            matrix[rowidx][colidx] = weight
-            matrix[colidx][rowidx] = weight
-
-    rowmax = []
-    for i in range(namecount):
-        biggest = 0
-        for j in range(namecount):
-            if matrix[i][j] > biggest:
-                biggest = matrix[i][j]
-        rowmax.append(biggest)
+    colcount = min(namecount, heatmap_columns(max_width, zoom))
+    rowcount = min(namecount, max_rows)
+    col_offset = max(0, min(col_offset, namecount - colcount))
+    row_offset = max(0, min(row_offset, namecount - rowcount))
+    rownames = names[row_offset:row_offset + rowcount]
+    colnames = names[col_offset:col_offset + colcount]
+
+    # biggest tie each visible character has (with anyone, so colours dont jump around while scrolling)
+    rowmax: Dict[str, int] = {}
+    for name in rownames + colnames:
+        if name not in rowmax:
+            ties = neighbors.get(name, {})
+            rowmax[name] = max(ties.values()) if ties else 0
+
     headerparts = []
-    for name in names:
-        headerparts.append(_abbr(name))
-    header = "   " + " ".join(headerparts)
-    lines = [f"[#cbb7ff]{header}[/]"]
-
-    for i in range(len(names)):
-        rowname = names[i]
-        rowlabel = _abbr(rowname)
-        rowcells: List[str] = []
-        for j in range(namecount):
-            if i == j:
-                cell = "[#cbb7ff]██[/]"
+    for name in colnames:
+        if len(cell) >= 2:
+            headerparts.append(_abbr(name))
+        else:
+            headerparts.append(_abbr(name)[0])
+    header = "   " + gap.join(headerparts)
+    lines = [Text(header, style("#cbb7ff"))]
+
+    nothing = "·" * len(cell)
+    for rowname in rownames:
+        rowties = neighbors.get(rowname, {})
+        if rowname == selected:
+            row = Text(_abbr(rowname), style("#e9ecff"))
+        else:
+            row = Text(_abbr(rowname), style("#9fe7ff"))
+        row.append(" ")
+        for colidx in range(len(colnames)):
+            colname = colnames[colidx]
+            if colidx:
+                row.append(gap)
+            if rowname == colname:
+                text, color = cell, "#cbb7ff"
             else:
-                weight = matrix[i][j]
+                weight = rowties.get(colname, 0)
                 if weight <= 0:
-                    cell = "[#3b3f5c]··[/]"
+                    text, color = nothing, "#3b3f5c"
                 else:
-                    selectedidx = None
-                    if selected in nameidx:
-                        selectedidx = nameidx[selected]
-                    if selectedidx is not None and (i == selectedidx or j == selectedidx):
-                        denom = rowmax[selectedidx]
+                    if selected == rowname or selected == colname:
+                        denom = rowmax.get(selected, 0)
                     else:
-                        if rowmax[i] > rowmax[j]:
-                            denom = rowmax[i]
+                        if rowmax[rowname] > rowmax[colname]:
+                            denom = rowmax[rowname]
                         else:
-                            denom = rowmax[j]
+                            denom = rowmax[colname]
                     if denom > 0:
                         ratio = weight / denom
                     else:
                         ratio = 0.0
-                    cell = f"[{heat_color(ratio)}]██[/]"
-            if rowname == selected or names[j] == selected:
-                cell = f"[b]{cell}[/b]"
-            rowcells.append(cell)
-        if rowname == selected:
-            labelcolor = "#e9ecff"
-        else:
-            labelcolor = "#9fe7ff"
-        lines.append(f"[{labelcolor}]{rowlabel}[/] " + " ".join(rowcells))
-    return "\n".join(lines)
+                    text, color = cell, heat_color(ratio)
+            if rowname == selected or colname == selected:
+                color = "bold " + color
+            row.append(text, style(color))
+        lines.append(row)
+
+    if rowcount < namecount or colcount < namecount:
+        lines.append(
+            Text(
+                f"rows {row_offset + 1}-{row_offset + rowcount} cols {col_offset + 1}-{col_offset + colcount} of {namecount}  (wasd, +/-)",
+                style("#6f7398"),
+            )
+        )
+    return join_lines(lines)
 
 
 # picks low/mid/high based on how much evidence we have
@@ -134,10 +175,10 @@ def sentiment_label(pos: int, neg: int) -> Tuple[str, str]:
     return (_tier(intensity, "bad", "bleak", "catastrophic"), "#ffb3c1")
 
 
-def render_meta_panel(stats: DashboardStats) -> str:
+def render_meta_panel(stats: DashboardStats) -> Text:
     # meta stats (files, words, lines, etc)
     if not stats.per_file:
-        return "[#6f7398]no files loaded[/]"
+        return Text("no files loaded", style("#6f7398"))
     filescount = len(stats.per_file)
     totalwords = 0
     totallines = 0
@@ -165,54 +206,59 @@ def render_meta_panel(stats: DashboardStats) -> str:
     else:
         capsrate = 0.0
 
-    return f"{div('meta stats')}\n[#cbb7ff]files[/] {filescount}   [#cbb7ff]sessions[/] {sessionstotal}\n[#cbb7ff]words[/] {totalwords}   [#cbb7ff]lines[/] {totallines}\n[#cbb7ff]avg line len[/] {avglinelen}   [#cbb7ff]caps[/] {capsrate:.1f}%\n[#cbb7ff]![/] {exclaimcount}   [#cbb7ff]?[/] {questioncount}"
-
-
-def _latest_session_entropies(stats: DashboardStats, sessioncount: int = 10) -> List[float]:
-    # get entropy for last n sessions
-    out = []
-    for filestats in stats.per_file:
-        for sessionmentions in filestats.session_mentions:
-            out.append(shannon_entropy(sessionmentions))
-    start = len(out) - sessioncount
-    if start < 0:
-        start = 0
-    result = []
-    for i in range(start, len(out)):
-        result.append(out[i])
-    return result
-
-
-def _latest_session_sentiment(stats: DashboardStats, sessioncount: int = 10) -> Tuple[int, int]:
-    # sum pos/neg for last n sessions
-    poslist = []
-    neglist = []
-    for filestats in stats.per_file:
-        for i in range(len(filestats.session_pos)):
-            poslist.append(filestats.session_pos[i])
-            neglist.append(filestats.session_neg[i])
-
-    start = len(poslist) - sessioncount
-    if start < 0:
-        start = 0
-    possum = 0
-    for i in range(start, len(poslist)):
-        possum = possum + poslist[i]
-
-    start = len(neglist) - sessioncount
-    if start < 0:
-        start = 0
-    negsum = 0
-    for i in range(start, len(neglist)):
-        negsum = negsum + neglist[i]
-
-    return (possum, negsum)
+    rows = [
+        div("meta stats"),
+        spans(("files", "#cbb7ff"), f" {filescount}   ", ("sessions", "#cbb7ff"), f" {sessionstotal}"),
+        spans(("words", "#cbb7ff"), f" {totalwords}   ", ("lines", "#cbb7ff"), f" {totallines}"),
+        spans(("avg line len", "#cbb7ff"), f" {avglinelen}   ", ("caps", "#cbb7ff"), f" {capsrate:.1f}%"),
+        spans(("!", "#cbb7ff"), f" {exclaimcount}   ", ("?", "#cbb7ff"), f" {questioncount}"),
+    ]
+    # copies of other logs: which ones got left out by name, the ones still counted just by how many
+    if stats.duplicates:
+        shown = set(filestats.source for filestats in stats.per_file)
+        leftout = []
+        counted = 0
+        for duplicate in stats.duplicates:
+            if duplicate.source in shown:
+                counted = counted + 1
+            else:
+                leftout.append(os.path.basename(duplicate.source))
+        if leftout:
+            more = f" +{len(leftout) - 3} more" if len(leftout) > 3 else ""
+            rows.append(spans(("left out", "#cbb7ff"), " " + ", ".join(leftout[:3]) + more))
+        if counted:
+            rows.append(spans(("copies counted", "#cbb7ff"), f" {counted}"))
+
+    return join_lines(rows)
+
+
+def _session_window(stats: DashboardStats, window: Optional[Tuple[int, int]]) -> Tuple[int, int]:
+    # (start, end) over every session in archive order, default = the last 10
+    timeline = stats.timeline
+    if window is None:
+        return timeline.clamp_window(timeline.session_count(), 10)
+    return window
+
+
+def window_caption(stats: DashboardStats, window: Optional[Tuple[int, int]]) -> str:
+    start, end = _session_window(stats, window)
+    timeline = stats.timeline
+    if end <= start:
+        return "no sessions"
+    if window is None or end == timeline.session_count():
+        head = f"past {end - start} sessions"
+    else:
+        head = f"sessions {start + 1}-{end}"
+    first, last = timeline.date_span(start, end)
+    if first == last:
+        return f"{head} ({first})"
+    return f"{head} ({first}..{last})"
 
 
-def render_mood_panel(stats: DashboardStats) -> str:
+def render_mood_panel(stats: DashboardStats, window: Optional[Tuple[int, int]] = None) -> Text:
     # mood meter from pos/neg words
     if not stats.per_file:
-        return f"{div('mood meter')}\n[#6f7398]no files[/]"
+        return join_lines([div("mood meter"), Text("no files", style("#6f7398"))])
 
     pos_all = 0
     neg_all = 0
@@ -224,7 +270,8 @@ def render_mood_panel(stats: DashboardStats) -> str:
         totalmix = "no signals"
     else:
         totalmix = f"+{pos_all} / -{neg_all}"
-    pos10, neg10 = _latest_session_sentiment(stats, sessioncount=10)
+    start, end = _session_window(stats, window)
+    pos10, neg10 = stats.timeline.sentiment(start, end)
     label10, color10 = sentiment_label(pos10, neg10)
     if pos10 + neg10 == 0:
         tenmix = "no signals"
@@ -235,12 +282,20 @@ def render_mood_panel(stats: DashboardStats) -> str:
     if lastfile.session_pos and lastfile.session_neg:
         lastpos, lastneg = lastfile.session_pos[-1], lastfile.session_neg[-1]
         labellast, colorlast = sentiment_label(lastpos, lastneg)
-        latestline = f"[#cbb7ff]latest session[/]  [{colorlast}]{labellast}[/]  [#6f7398](+{lastpos} / -{lastneg})[/]"
+        latestline = spans(("latest session", "#cbb7ff"), "  ", (labellast, colorlast), "  ", (f"(+{lastpos} / -{lastneg})", "#6f7398"))
     else:
         labellast, colorlast = sentiment_label(lastfile.pos, lastfile.neg)
-        latestline = f"[#cbb7ff]latest file[/]     [{colorlast}]{labellast}[/]  [#6f7398](+{lastfile.pos} / -{lastfile.neg})[/]"
+        latestline = spans(("latest file", "#cbb7ff"), "     ", (labellast, colorlast), "  ", (f"(+{lastfile.pos} / -{lastfile.neg})", "#6f7398"))
 
-    return f"{div('mood meter')}\n[#cbb7ff]overall[/] [{colorall}]{labelall}[/]  [#6f7398]({totalmix})[/]\n[#cbb7ff]past 10 sessions[/] [{color10}]{label10}[/]  [#6f7398]({tenmix})[/]\n{latestline}\n[#6f7398]positive to negative word ratio[/]"
+    if stats.estimate is not None:
+        totalmix = totalmix + f", {margin_text(stats.estimate.mood_margin, 100.0, 'pts')}"
+    return join_lines([
+        div("mood meter"),
+        spans(("overall", "#cbb7ff"), " ", (labelall, colorall), estimate_mark(stats), "  ", (f"({totalmix})", "#6f7398")),
+        spans((window_caption(stats, window), "#cbb7ff"), " ", (label10, color10), sample_mark(stats), "  ", (f"({tenmix})", "#6f7398")),
+        latestline,
+        Text("weighted good vs bad words and phrases, 'not' flips them", style("#6f7398")),
+    ])
 
 
 def _entropy_label(value: float) -> Tuple[str, str]:
@@ -265,14 +320,15 @@ def _entropy_label(value: float) -> Tuple[str, str]:
     return ("sealed", "#b8f2b2")
 
 
-def render_entropy_panel(stats: DashboardStats) -> str:
+def render_entropy_panel(stats: DashboardStats, window: Optional[Tuple[int, int]] = None) -> Text:
     # entropy meter (how spread out mentions are)
     if not stats.per_file:
-        return f"{div('entropy meter')}\n[#6f7398]no data[/]"
+        return join_lines([div("entropy meter"), Text("no data", style("#6f7398"))])
 
-    entropies = _latest_session_entropies(stats, sessioncount=10)
+    start, end = _session_window(stats, window)
+    entropies = stats.timeline.entropy_slice(start, end)
     if not entropies:
-        return f"{div('entropy meter')}\n[#6f7398]no sessions detected[/]"
+        return join_lines([div("entropy meter"), Text("no sessions detected", style("#6f7398"))])
 
     latestentropy = entropies[-1]
     avg10 = 0
@@ -280,20 +336,85 @@ def render_entropy_panel(stats: DashboardStats) -> str:
         avg10 = avg10 + val
     avg10 = avg10 / len(entropies)
 
-    sparkstr = entropy_spark(entropies, width=10)
+    sparkstr = entropy_spark(entropies[-10:], width=10)
     baravg = entropy_bar(avg10, width=10)
     barlatest = entropy_bar(latestentropy, width=10)
 
     labellatest, colorlatest = _entropy_label(latestentropy)
     labelavg, coloravg = _entropy_label(avg10)
 
-    return f"{div('entropy meter')}\n[#cbb7ff]latest 10 sessions[/]  [#e9ecff]{sparkstr}[/]\n{baravg}  [#cbb7ff]{avg10:.2f}[/]  [{coloravg}]{labelavg}[/]  [#6f7398]avg(10)[/]\n{barlatest}  [#cbb7ff]{latestentropy:.2f}[/]  [{colorlatest}]{labellatest}[/]  [#6f7398]latest session[/]\n[#6f7398]higher = attent. spread across more characters (more chaos)[/]"
+    return join_lines([
+        spans(div("entropy meter"), sample_mark(stats)),
+        spans((window_caption(stats, window), "#cbb7ff"), "  ", (sparkstr, "#e9ecff")),
+        spans(baravg, "  ", (f"{avg10:.2f}", "#cbb7ff"), "  ", (labelavg, coloravg), "  ", (f"avg({len(entropies)})", "#6f7398")),
+        spans(barlatest, "  ", (f"{latestentropy:.2f}", "#cbb7ff"), "  ", (labellatest, colorlatest), "  ", ("last in window", "#6f7398")),
+        Text("higher = attent. spread across more characters (more chaos)", style("#6f7398")),
+    ])
 
 
-def render_top_trios(stats: DashboardStats, limit: int = 6) -> str:
+SIGNAL_BLOCKS = "▁▂▃▄▅▆▇█"
+
+
+def render_signal_panel(stats: DashboardStats, window: Optional[Tuple[int, int]] = None, width: int = 80) -> Text:
+    # tension and mood line by line over the window's sessions, squeezed to the panel width
+    # (each column = the peak of the smoothed tension and the average mood of the lines it covers)
+    if not stats.per_file:
+        return join_lines([div("tension by line"), Text("no data", style("#6f7398"))])
+    signal = stats.signal
+    start, end = _session_window(stats, window)
+    lo, hi = signal.session_span(start, end)
+    if hi <= lo:
+        return join_lines([div("tension by line"), Text("no lines in this window", style("#6f7398"))])
+
+    label = 9
+    columns = signal.curve(lo, hi, max(10, width - label))
+    count = hi - lo
+    # bar heights go from the calmest column to the tensest one in view (colours stay absolute)
+    lowest = 100
+    highest = 0
+    maxmood = 0.0
+    for peak, mood in columns:
+        lowest = min(lowest, peak)
+        highest = max(highest, peak)
+        if abs(mood) > maxmood:
+            maxmood = abs(mood)
+
+    tensionrow = Text("tension  ", style("#cbb7ff"))
+    moodrow = Text("mood     ", style("#cbb7ff"))
+    for peak, mood in columns:
+        level = 7 if highest == lowest else (peak - lowest) * 7 // (highest - lowest)
+        tensionrow.append(SIGNAL_BLOCKS[level], style(heat_color(peak / 100.0)))
+        if maxmood == 0.0 or mood == 0.0:
+            moodrow.append("·", style("#5c607f"))
+            continue
+        level = min(7, int(abs(mood) / maxmood * 8))
+        moodrow.append(SIGNAL_BLOCKS[level], style("#b8f2b2" if mood > 0 else "#ffb3c1"))
+
+    # session starts along the bottom (only while there's room to tell them apart) and where the peak is
+    peakline = signal.peak_line(lo, hi)
+    peakcol = (peakline - lo) * len(columns) // count
+    marks = [" "] * len(columns)
+    if end - start <= len(columns):
+        for session in range(start + 1, end):
+            marks[(signal.session_starts[session] - lo) * len(columns) // count] = "╵"
+    marks[peakcol] = "▲"
+    markrow = Text(" " * label)
+    for i, mark in enumerate(marks):
+        markrow.append(mark, style("#ffb3c1" if i == peakcol else "#6f7398"))
+
+    fileidx, session = signal.locate(peakline)
+    peak = signal.peak(lo, hi)
+    caption = spans(
+        ("peak", "#cbb7ff"), " ", (str(peak), heat_color(peak / 100.0)), f" in {stats.per_file[fileidx].filename} (session {session + 1})  ",
+        (f"{count} lines, ~{max(1, round(count / len(columns)))} per column", "#6f7398"),
+    )
+    return join_lines([spans(div("tension by line"), sample_mark(stats)), tensionrow, moodrow, markrow, caption])
+
+
+def render_top_trios(stats: DashboardStats, limit: int = 6) -> Text:
     # top character trios (3 together)
     if not stats.trios:
-        return f"{div('top trios')}\n[#6f7398]none detected[/]"
+        return join_lines([div("top trios"), Text("none detected", style("#6f7398"))])
 
     # sort by count (biggest first) then take top few
     pairs = []
@@ -311,7 +432,7 @@ def render_top_trios(stats: DashboardStats, limit: int = 6) -> str:
         if weight > maxweight:
             maxweight = weight
 
-    lines = [div("top trios")]
+    lines = [spans(div("top trios"), estimate_mark(stats))]
     for trio, weight in items:
         ratio = weight / maxweight
         if maxweight == 0:
@@ -319,14 +440,14 @@ def render_top_trios(stats: DashboardStats, limit: int = 6) -> str:
         char_a = trio[0]
         char_b = trio[1]
         char_c = trio[2]
-        lines.append("  " + char_a + "+" + char_b + "+" + char_c + "  [" + heat_color(ratio) + "]" + str(weight) + "[/]")
-    return "\n".join(lines)
+        lines.append(spans("  " + char_a + "+" + char_b + "+" + char_c + "  ", (str(weight), heat_color(ratio))))
+    return join_lines(lines)
 
 
-def render_top_squads(stats: DashboardStats, limit: int = 6) -> str:
+def render_top_squads(stats: DashboardStats, limit: int = 6) -> Text:
     # top character squads (4 together)
     if not stats.squads:
-        return f"{div('top squads')}\n[#6f7398]none detected[/]"
+        return join_lines([div("top squads"), Text("none detected", style("#6f7398"))])
 
     pairs = []
     for key, weight in stats.squads.items():
@@ -343,7 +464,7 @@ def render_top_squads(stats: DashboardStats, limit: int = 6) -> str:
         if weight > maxweight:
             maxweight = weight
 
-    lines = [div("top squads")]
+    lines = [spans(div("top squads"), estimate_mark(stats))]
     for squad, weight in items:
         ratio = weight / maxweight
         if maxweight == 0:
@@ -353,5 +474,5 @@ def render_top_squads(stats: DashboardStats, limit: int = 6) -> str:
             if i > 0:
                 squadstr = squadstr + "+"
             squadstr = squadstr + squad[i]
-        lines.append("  " + squadstr + "  [" + heat_color(ratio) + "]" + str(weight) + "[/]")
-    return "\n".join(lines)
+        lines.append(spans("  " + squadstr + "  ", (str(weight), heat_color(ratio))))
+    return join_lines(lines)
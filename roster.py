@@ -0,0 +1,235 @@
+# compiled character list: no duplicate names, and alias matching that doesnt slow down as the roster grows
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import AbstractSet, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from config import Character
+
+_TOKEN_RE = re.compile(r"\w+")
+_WORDY_RE = re.compile(r"^\w+$")
+_UNSEEN: List[int] = []
+
+# typo forgiveness for one-word aliases: one slip from this many letters up, two from the second number up
+# (shorter names are too close to real words, "kal" -> "cal" / "kai" / "pal")
+FUZZY_LENGTHS = (5, 9)
+
+
+def dedupe_characters(characters: List[Character]) -> List[Character]:
+    # same name twice = one character with both alias lists (and no alias counted twice)
+    order: List[str] = []
+    aliases: Dict[str, List[str]] = {}
+    for character in characters:
+        if character.name not in aliases:
+            order.append(character.name)
+            aliases[character.name] = []
+        seen = {alias.lower() for alias in aliases[character.name]}
+        for alias in character.aliases:
+            if alias.lower() not in seen:
+                seen.add(alias.lower())
+                aliases[character.name].append(alias)
+    out = []
+    for name in order:
+        out.append(Character(name, tuple(aliases[name])))
+    return out
+
+
+def _allowed_edits(length: int, max_edits: int) -> int:
+    allowed = 0
+    for threshold in FUZZY_LENGTHS:
+        if length >= threshold:
+            allowed = allowed + 1
+    return min(allowed, max_edits)
+
+
+def _deletions(word: str, edits: int) -> Set[str]:
+    # the word with every combination of up to edits letters taken out (itself included)
+    out = {word}
+    frontier = {word}
+    for _ in range(edits):
+        grown = set()
+        for variant in frontier:
+            for i in range(len(variant)):
+                grown.add(variant[:i] + variant[i + 1:])
+        out |= grown
+        frontier = grown
+    return out
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    # insertions, deletions, substitutions and swapped neighbours ("zephry") each cost 1; anything past limit
+    # just comes back as limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        best = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            row[j] = value
+            if value < best:
+                best = value
+        if best > limit:
+            return limit + 1
+        before = prev
+        prev = row
+    return min(prev[len(b)], limit + 1)
+
+
+class FuzzyIndex:
+    # one-word aliases filed under every way of deleting a letter or two from them, so a word's candidates are a
+    # handful of dict lookups (the same deletions of the word) instead of a comparison with every alias, and only
+    # those few get a real edit distance. words get remembered, a log says the same ones over and over
+    def __init__(self, aliases: Dict[str, List[int]], max_edits: int, ignore: AbstractSet[str] = frozenset()) -> None:
+        self.max_edits = max_edits
+        self._aliases = aliases
+        self._ignore = ignore
+        self._shortest = FUZZY_LENGTHS[0] - max_edits
+        self._by_deletion: Dict[str, List[str]] = {}
+        for alias in aliases:
+            for variant in _deletions(alias, _allowed_edits(len(alias), max_edits)):
+                self._by_deletion.setdefault(variant, []).append(alias)
+        # every word looked up so far -> its answer (line_counts checks this itself, it's most of the calls)
+        self.seen: Dict[str, Optional[List[int]]] = {}
+
+    def lookup(self, word: str) -> Optional[List[int]]:
+        # character ids a (lowercase, not an exact alias) word is a typo of, None if it isnt one
+        # (or it's just as close to two different characters)
+        if word in self.seen:
+            return self.seen[word]
+        found = None
+        if len(word) >= self._shortest and word not in self._ignore and not word.isdigit():
+            best = self.max_edits + 1
+            tied = False
+            checked = set()
+            # no alias this word could be a typo of forgives more than this many
+            reach = _allowed_edits(len(word) + self.max_edits, self.max_edits)
+            for variant in _deletions(word, reach):
+                for alias in self._by_deletion.get(variant, ()):
+                    if alias in checked:
+                        continue
+                    checked.add(alias)
+                    limit = _allowed_edits(len(alias), self.max_edits)
+                    distance = edit_distance(word, alias, limit)
+                    if distance > limit:
+                        continue
+                    charids = self._aliases[alias]
+                    if distance < best:
+                        best = distance
+                        found = charids
+                        tied = False
+                    elif distance == best and charids != found:
+                        tied = True
+            if tied:
+                found = None
+        self.seen[word] = found
+        return found
+
+
+class Roster:
+    def __init__(self, characters: List[Character], fuzzy: int = 0, fuzzy_ignore: FrozenSet[str] = frozenset()) -> None:
+        self.characters = dedupe_characters(characters)
+        self.names = [character.name for character in self.characters]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        # plain one-word aliases: lowercase word -> character ids (this is the fast path)
+        self._single: Dict[str, List[int]] = {}
+        # anything with spaces or punctuation gets a regex, but only tried when its first word shows up
+        self._complex_by_token: Dict[str, List[Tuple[int, re.Pattern[str]]]] = {}
+        self._complex_always: List[Tuple[int, re.Pattern[str]]] = []
+        for charid, character in enumerate(self.characters):
+            for alias in character.aliases:
+                if _WORDY_RE.match(alias):
+                    self._single.setdefault(alias.lower(), []).append(charid)
+                    continue
+                pattern = re.compile(rf"\b{re.escape(alias)}\b", re.IGNORECASE)
+                words = _TOKEN_RE.findall(alias)
+                if words:
+                    self._complex_by_token.setdefault(words[0].lower(), []).append((charid, pattern))
+                else:
+                    self._complex_always.append((charid, pattern))
+        # words that are a typo or two off a one-word alias count too, if the config asks for that
+        self.fuzzy: Optional[FuzzyIndex] = None
+        if fuzzy > 0 and self._single:
+            self.fuzzy = FuzzyIndex(self._single, fuzzy, fuzzy_ignore)
+
+    def line_counts(self, line: str, variants: Optional[Dict[int, Dict[str, int]]] = None) -> Dict[int, int]:
+        # character id -> mentions on this line (same numbers as one \balias\b regex per alias), plus typo'd
+        # words with fuzzy on (those also get tallied into variants: character id -> word -> times)
+        counts: Dict[int, int] = {}
+        single = self._single
+        complex_by_token = self._complex_by_token
+        fuzzy = self.fuzzy
+        seen = fuzzy.seen if fuzzy is not None else None
+        candidates = None
+        for word in _TOKEN_RE.findall(line):
+            word = word.lower()
+            hit = single.get(word)
+            if hit is None and seen is not None:
+                hit = seen.get(word, _UNSEEN)
+                if hit is _UNSEEN:
+                    hit = fuzzy.lookup(word)
+                if hit is not None and variants is not None:
+                    for charid in hit:
+                        spellings = variants.setdefault(charid, {})
+                        spellings[word] = spellings.get(word, 0) + 1
+            if hit is not None:
+                for charid in hit:
+                    counts[charid] = counts.get(charid, 0) + 1
+            if complex_by_token and word in complex_by_token:
+                if candidates is None:
+                    candidates = {}
+                for charid, pattern in complex_by_token[word]:
+                    candidates[id(pattern)] = (charid, pattern)
+        if candidates:
+            for charid, pattern in candidates.values():
+                found = len(pattern.findall(line))
+                if found:
+                    counts[charid] = counts.get(charid, 0) + found
+        for charid, pattern in self._complex_always:
+            found = len(pattern.findall(line))
+            if found:
+                counts[charid] = counts.get(charid, 0) + found
+        return counts
+
+    def line_hits(self, line: str) -> Tuple[Dict[int, List[int]], int]:
+        # same matches as line_counts but with where they are: word index -> character ids there, plus how many words
+        hits: Dict[int, List[int]] = {}
+        starts: List[int] = []
+        single = self._single
+        complex_by_token = self._complex_by_token
+        fuzzy = self.fuzzy
+        candidates: Dict[int, Tuple[int, re.Pattern[str]]] = {}
+        for match in _TOKEN_RE.finditer(line):
+            tokenidx = len(starts)
+            starts.append(match.start())
+            word = match.group(0).lower()
+            hit = single.get(word)
+            if hit is None and fuzzy is not None:
+                hit = fuzzy.lookup(word)
+            if hit is not None:
+                hits.setdefault(tokenidx, []).extend(hit)
+            if complex_by_token and word in complex_by_token:
+                for charid, pattern in complex_by_token[word]:
+                    candidates[id(pattern)] = (charid, pattern)
+        for charid, pattern in list(candidates.values()) + self._complex_always:
+            for match in pattern.finditer(line):
+                tokenidx = max(0, bisect_right(starts, match.start()) - 1)
+                hits.setdefault(tokenidx, []).append(charid)
+        return (hits, len(starts))
+
+
+@lru_cache(maxsize=32)
+def _compile(characters: Tuple[Character, ...], fuzzy: int, fuzzy_ignore: FrozenSet[str]) -> Roster:
+    return Roster(list(characters), fuzzy, fuzzy_ignore)
+
+
+def compile_roster(characters: List[Character], fuzzy: int = 0, fuzzy_ignore: FrozenSet[str] = frozenset()) -> Roster:
+    # analyze_file runs once per file, so dont rebuild the lookup tables every time
+    return _compile(tuple(characters), fuzzy, frozenset(fuzzy_ignore))
@@ -0,0 +1,181 @@
+# searching lines with the index built during ingestion (no rescanning the logs)
+from __future__ import annotations
+
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import AbstractSet, Dict, List, Optional, Set, Tuple
+
+from archives import read_source_lines
+from config import STOPWORDS
+from helpers import tokenize
+from models import DashboardStats, FileStats
+
+_QUERY_WORD_RE = re.compile(r"[\w']+")
+
+# words in a query that just glue things together
+_JOINERS = {"and", "&", "with", "lines"}
+# everything after one of these is treated as a keyword, even if it looks like a character
+_KEYWORD_MARKERS = {"mentioning", "about", "saying"}
+
+
+@dataclass
+class Query:
+    required: List[str] = field(default_factory=list)
+    excluded: List[str] = field(default_factory=list)
+    ignored: List[str] = field(default_factory=list)
+
+
+@dataclass
+class SearchResult:
+    total: int
+    hits: List[Tuple[int, int]]  # (index into stats.per_file, line number), newest first
+
+
+def parse_query(text: str, names: List[str], stopwords: AbstractSet[str] = STOPWORDS) -> Query:
+    # "zephyr AND kal mentioning blade", "zephyr kal blade", "cain not blood"
+    namelookup = set(names)
+    query = Query()
+    keyword_mode = False
+    negate = False
+    for word in _QUERY_WORD_RE.findall(text.lower()):
+        if word in _JOINERS:
+            continue
+        if word in _KEYWORD_MARKERS:
+            keyword_mode = True
+            continue
+        if word == "not":
+            negate = True
+            continue
+        if not keyword_mode and word in namelookup:
+            key = "@" + word
+        else:
+            # same rules as the index: 3+ letters, no stopwords
+            tokens = tokenize(word)
+            if not tokens or tokens[0] in stopwords:
+                query.ignored.append(word)
+                negate = False
+                continue
+            key = tokens[0]
+        if negate:
+            query.excluded.append(key)
+        else:
+            query.required.append(key)
+        negate = False
+    return query
+
+
+def _intersect(small: List[int], big: array) -> List[int]:
+    # lists are sorted, so binary search when one side is way smaller, set otherwise
+    if len(small) * 16 < len(big):
+        out = []
+        for lineno in small:
+            pos = bisect_left(big, lineno)
+            if pos < len(big) and big[pos] == lineno:
+                out.append(lineno)
+        return out
+    bigset = set(big)
+    return [lineno for lineno in small if lineno in bigset]
+
+
+def matching_lines(filestats: FileStats, query: Query) -> List[int]:
+    lists = []
+    for key in query.required:
+        plist = filestats.postings.get(key)
+        if plist is None:
+            return []
+        lists.append(plist)
+    if not lists:
+        return []
+    lists.sort(key=len)
+    lines = list(lists[0])
+    for plist in lists[1:]:
+        lines = _intersect(lines, plist)
+        if not lines:
+            return []
+    for key in query.excluded:
+        plist = filestats.postings.get(key)
+        if plist is not None:
+            drop: Set[int] = set(plist)
+            lines = [lineno for lineno in lines if lineno not in drop]
+    return lines
+
+
+def run_query(stats: DashboardStats, query: Query, limit: int = 200) -> SearchResult:
+    total = 0
+    hits: List[Tuple[int, int]] = []
+    for fileidx in range(len(stats.per_file) - 1, -1, -1):
+        lines = matching_lines(stats.per_file[fileidx], query)
+        total = total + len(lines)
+        for lineno in reversed(lines):
+            if len(hits) >= limit:
+                break
+            hits.append((fileidx, lineno))
+    return SearchResult(total=total, hits=hits)
+
+
+class PostingsView:
+    # every line for one term across the whole archive, newest first, without building the list
+    def __init__(self, stats: DashboardStats, term: str) -> None:
+        self.stats = stats
+        self.term = term
+        # ends[i] = how many lines the newest i+1 files have between them
+        self._fileidx: List[int] = []
+        self._ends = array("Q")
+        running = 0
+        for fileidx in range(len(stats.per_file) - 1, -1, -1):
+            plist = stats.per_file[fileidx].postings.get(term)
+            if not plist:
+                continue
+            running = running + len(plist)
+            self._fileidx.append(fileidx)
+            self._ends.append(running)
+
+    def __len__(self) -> int:
+        return self._ends[-1] if self._ends else 0
+
+    def locate(self, pos: int) -> Tuple[int, int]:
+        # position -> (file index, line number)
+        slot = bisect_right(self._ends, pos)
+        fileidx = self._fileidx[slot]
+        before = self._ends[slot - 1] if slot > 0 else 0
+        plist = self.stats.per_file[fileidx].postings[self.term]
+        return (fileidx, plist[len(plist) - 1 - (pos - before)])
+
+    def window(self, start: int, count: int) -> List[Tuple[int, int]]:
+        out = []
+        end = min(len(self), start + count)
+        for pos in range(max(0, start), end):
+            out.append(self.locate(pos))
+        return out
+
+
+def window_texts(stats: DashboardStats, hits: List[Tuple[int, int]]) -> List[Optional[str]]:
+    # only the lines we actually show get read back from disk, one open per file
+    out: List[Optional[str]] = [None] * len(hits)
+    todo = list(range(len(hits)))
+    if stats.snapshot is not None:
+        # only lines that mention someone are in a snapshot, the rest come off disk if the logs are here
+        # (daemon viewers), otherwise they just show where they are
+        todo = []
+        for i, (fileidx, lineno) in enumerate(hits):
+            text = stats.snapshot.line_texts(fileidx, [lineno])[0]
+            out[i] = text if text is not None else ""
+            if text is None:
+                todo.append(i)
+    byfile: Dict[int, List[Tuple[int, int]]] = {}
+    for i in todo:
+        fileidx, lineno = hits[i]
+        if lineno < len(stats.per_file[fileidx].line_starts):
+            byfile.setdefault(fileidx, []).append((i, lineno))
+    for fileidx, wanted in byfile.items():
+        filestats = stats.per_file[fileidx]
+        offsets = [filestats.line_starts[lineno] for _, lineno in wanted]
+        try:
+            texts = read_source_lines(filestats.source, offsets)
+        except OSError:
+            continue
+        for (i, _), text in zip(wanted, texts):
+            out[i] = text.strip()
+    return out
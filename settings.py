@@ -0,0 +1,251 @@
+# roster + word lists from a config file (toml or json) instead of editing config.py,
+# picked up again while the dashboard is running
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import CHARACTERS, COOC_UNITS, DEFAULT_WORDS, Character, CoocWindow, WordLists
+from models import DashboardStats, file_text, rekey_file, rescore_file
+from roster import dedupe_characters
+
+try:
+    import tomllib
+except ImportError:  # python 3.10, json config still works
+    tomllib = None
+
+_DECODE_ERRORS: Tuple[type, ...] = (json.JSONDecodeError,)
+if tomllib is not None:
+    _DECODE_ERRORS = _DECODE_ERRORS + (tomllib.TOMLDecodeError,)
+
+# config file word list keys -> WordLists fields
+_WORD_KEYS = {"pos_words": "pos", "neg_words": "neg", "combat_words": "combat", "stopwords": "stop", "negators": "negators"}
+# weighted phrase keys -> WordLists fields, plus the key for a lexicon file that fills the same field
+_PHRASE_KEYS = {"mood_phrases": ("mood_phrases", "mood_lexicon"), "combat_phrases": ("combat_phrases", "combat_lexicon")}
+
+
+@dataclass(frozen=True)
+class Settings:
+    characters: Tuple[Character, ...]
+    words: WordLists
+
+
+DEFAULT_SETTINGS = Settings(characters=tuple(dedupe_characters(list(CHARACTERS))), words=DEFAULT_WORDS)
+
+
+def _parse_window(value: object, where: str) -> CoocWindow:
+    # 3 / "3 lines" / "40 tokens" (or "words")
+    if isinstance(value, int) and not isinstance(value, bool):
+        size, unit = value, "line"
+    elif isinstance(value, str) and value.split() and value.split()[0].isdigit():
+        parts = value.split()
+        size = int(parts[0])
+        unit = parts[1].lower().rstrip("s") if len(parts) > 1 else "line"
+        if unit == "word":
+            unit = "token"
+    else:
+        raise ValueError(f"{where}: cooc_window should look like \"3 lines\" or \"40 tokens\"")
+    if unit not in COOC_UNITS or size < 1:
+        raise ValueError(f"{where}: cooc_window should look like \"3 lines\" or \"40 tokens\"")
+    return CoocWindow(unit, size)
+
+
+def _parse_fuzzy(value: object, where: str) -> int:
+    # true = forgive one typo, or how many (0-2)
+    if value is True:
+        return 1
+    if value is False:
+        return 0
+    if isinstance(value, int) and 0 <= value <= 2:
+        return value
+    raise ValueError(f"{where}: fuzzy_aliases should be true/false or how many typos to forgive (0-2)")
+
+
+def _weight(value: object, where: str) -> int:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+        raise ValueError(f"{where}: weights should be whole numbers")
+    return int(value)
+
+
+def _read_lexicon(path: Path, where: str) -> Dict[str, int]:
+    # one entry per line, phrase<tab>weight (the afinn word lists look like this), # starts a comment
+    try:
+        text = path.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError) as exc:
+        raise ValueError(f"{where}: {exc}") from exc
+    entries: Dict[str, int] = {}
+    for lineno, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        phrase, _, weight = line.rpartition("\t")
+        try:
+            entries[phrase.strip().lower()] = _weight(float(weight), f"{path.name}:{lineno}")
+        except ValueError as exc:
+            raise ValueError(f"{where}: {path.name}:{lineno} should be phrase<tab>weight") from exc
+    return entries
+
+
+def load_settings(path: Path) -> Settings:
+    # anything the file leaves out keeps the config.py value
+    # {"characters": {"zephyr": ["zephyr", "zeph"], ...}, "pos_words": [...], "neg_words": [...], "combat_words": [...], "stopwords": [...],
+    #  "cooc_window": "3 lines", "mood_phrases": {"well done": 2, ...}, "combat_phrases": {...}, "negators": [...],
+    #  "mood_lexicon": "afinn.txt", "combat_lexicon": "...", "fuzzy_aliases": 1, "fuzzy_ignore": ["brain"]}
+    #  (lexicon files are relative to the config file)
+    if path.suffix.lower() == ".toml" and tomllib is None:
+        raise ValueError(f"{path.name}: toml config needs python 3.11+, use a .json file instead")
+    try:
+        if path.suffix.lower() == ".toml":
+            with open(path, "rb") as fh:
+                data = tomllib.load(fh)
+        else:
+            data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, UnicodeDecodeError, *_DECODE_ERRORS) as exc:
+        raise ValueError(f"{path.name}: {exc}") from exc
+    if not isinstance(data, dict):
+        raise ValueError(f"{path.name}: expected a table/object at the top")
+
+    characters = DEFAULT_SETTINGS.characters
+    if "characters" in data:
+        raw = data["characters"]
+        if not isinstance(raw, dict):
+            raise ValueError(f"{path.name}: characters should map each name to its aliases")
+        roster: List[Character] = []
+        for name, aliases in raw.items():
+            if isinstance(aliases, str):
+                aliases = [aliases]
+            if not aliases:
+                aliases = [name]
+            roster.append(Character(str(name).lower(), tuple(str(alias) for alias in aliases)))
+        characters = tuple(dedupe_characters(roster))
+
+    wordfields: Dict[str, object] = {}
+    for key, attr in _WORD_KEYS.items():
+        if key not in data:
+            continue
+        words = data[key]
+        if not isinstance(words, list):
+            raise ValueError(f"{path.name}: {key} should be a list of words")
+        wordfields[attr] = frozenset(str(word).lower() for word in words)
+    for key, (attr, filekey) in _PHRASE_KEYS.items():
+        if key not in data and filekey not in data:
+            continue
+        # the lexicon file first, then the table on top of it
+        entries: Dict[str, int] = {}
+        if filekey in data:
+            entries.update(_read_lexicon(path.parent / str(data[filekey]), path.name))
+        if key in data:
+            raw = data[key]
+            if not isinstance(raw, dict):
+                raise ValueError(f"{path.name}: {key} should map each phrase to its weight")
+            for phrase, weight in raw.items():
+                entries[str(phrase).lower()] = _weight(weight, f"{path.name}: {key}")
+        wordfields[attr] = tuple(sorted(entries.items()))
+    if "cooc_window" in data:
+        wordfields["window"] = _parse_window(data["cooc_window"], path.name)
+    if "fuzzy_aliases" in data:
+        wordfields["fuzzy"] = _parse_fuzzy(data["fuzzy_aliases"], path.name)
+    if "fuzzy_ignore" in data:
+        words = data["fuzzy_ignore"]
+        if not isinstance(words, list):
+            raise ValueError(f"{path.name}: fuzzy_ignore should be a list of words")
+        wordfields["fuzzy_ignore"] = frozenset(str(word).lower() for word in words)
+    return Settings(characters=characters, words=replace(DEFAULT_WORDS, **wordfields))
+
+
+def changed_parts(old: Settings, new: Settings) -> Set[str]:
+    # which groups of numbers a settings change touches
+    parts = set()
+    if old.characters != new.characters:
+        parts.add("roster")
+    if old.words.stop != new.words.stop:
+        parts.add("keywords")
+    if (old.words.pos, old.words.neg, old.words.mood_phrases, old.words.negators) != (
+        new.words.pos, new.words.neg, new.words.mood_phrases, new.words.negators
+    ):
+        parts.add("sentiment")
+    if old.words.combat != new.words.combat or old.words.combat_phrases != new.words.combat_phrases:
+        parts.add("tension")
+    if old.words.window != new.words.window:
+        parts.add("cooc")
+    if (old.words.fuzzy, old.words.fuzzy_ignore) != (new.words.fuzzy, new.words.fuzzy_ignore):
+        parts.add("aliases")
+    return parts
+
+
+def apply_settings(
+    stats: DashboardStats,
+    parts: Set[str],
+    wordlists: WordLists,
+    characters: List[Character],
+    reread: Optional[List[str]] = None,
+) -> Optional[DashboardStats]:
+    # sentiment/tension/stopword changes get patched from the files' text, the mention counts and cooc/trios are
+    # left alone. logs whose text wasnt kept get read again, their sources go in reread.
+    # None = roster, fuzzy matching or the cooc window changed (or a file cant be read again), that needs a real rescan
+    if "roster" in parts or "aliases" in parts or "cooc" in parts:
+        return None
+    if not parts:
+        return stats
+    perfiles = []
+    changed: Set[str] = set()
+    for filestats in stats.per_file:
+        try:
+            text = file_text(filestats, reread)
+        except OSError:
+            return None
+        if "sentiment" in parts or "tension" in parts:
+            filestats = rescore_file(filestats, text, wordlists, sentiment="sentiment" in parts, tension="tension" in parts)
+        if "keywords" in parts:
+            filestats = rekey_file(filestats, text, characters, wordlists)
+        perfiles.append(filestats)
+    if "keywords" in parts:
+        changed |= {"keywords", "postings"}
+    if "sentiment" in parts:
+        changed |= {"pos", "neg", "session_pos", "session_neg", "line_mood"}
+    if "tension" in parts:
+        changed |= {"tension", "session_tensions", "line_tension"}
+    return stats.with_files(perfiles, changed)
+
+
+class LiveSettings:
+    # the settings file plus its last seen mtime, poll() notices edits (and the file showing up or going away)
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.error = ""
+        self.current = DEFAULT_SETTINGS
+        self._stamp = self._stat()
+        if self._stamp is not None:
+            try:
+                self.current = load_settings(path)
+            except ValueError as exc:
+                self.error = str(exc)
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def poll(self) -> Optional[Settings]:
+        # returns the settings from before the reload when they changed, None otherwise
+        stamp = self._stat()
+        if stamp == self._stamp:
+            return None
+        self._stamp = stamp
+        try:
+            new = load_settings(self.path) if stamp is not None else DEFAULT_SETTINGS
+        except ValueError as exc:
+            # half-saved file or a typo, keep running on the last good settings
+            self.error = str(exc)
+            return None
+        self.error = ""
+        old = self.current
+        self.current = new
+        if new == old:
+            return None
+        return old
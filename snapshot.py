@@ -0,0 +1,386 @@
+# one-file export of a whole dashboard: players can open it without the logs, and it loads instantly
+# layout: magic, header length, json header (names, files, section table), then 8-byte aligned array sections
+# that get memory mapped straight into the stats instead of being parsed
+from __future__ import annotations
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+from duplicates import Duplicate
+from models import DashboardStats, FileStats, file_text
+
+MAGIC = b"IISNAP\x00\x01"
+# bump this if the sections change
+SNAPSHOT_VERSION = 3
+
+# per-file numbers stored as one files x len(_SCALARS) column block
+_SCALARS = ("words", "lines", "tension", "pos", "neg", "exclaims", "questions", "caps", "chars", "session_count")
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+class _Sections:
+    # collects arrays while exporting and remembers where each one goes
+    def __init__(self) -> None:
+        self.arrays: List[Tuple[str, array]] = []
+
+    def add(self, name: str, typecode: str, values) -> None:
+        self.arrays.append((name, values if isinstance(values, array) and values.typecode == typecode else array(typecode, values)))
+
+    def add_strings(self, name: str, strings: List[str]) -> None:
+        # utf-8 blob plus where each string ends
+        blob = bytearray()
+        ends = array("Q")
+        for text in strings:
+            blob.extend(text.encode("utf-8"))
+            ends.append(len(blob))
+        self.add(name + ".ends", "Q", ends)
+        self.add(name + ".blob", "B", array("B", bytes(blob)))
+
+
+def export_snapshot(stats: DashboardStats, path: Path) -> None:
+    names = list(stats.totals)
+    nameid = {name: i for i, name in enumerate(names)}
+    sections = _Sections()
+
+    scalars = array("q")
+    mentions = array("I")
+    for filestats in stats.per_file:
+        for attr in _SCALARS:
+            scalars.append(getattr(filestats, attr))
+        for name in names:
+            mentions.append(filestats.mentions.get(name, 0))
+    sections.add("file.scalars", "q", scalars)
+    sections.add("file.mentions", "I", mentions)
+
+    # sessions, every file's rows back to back
+    session_start = array("Q", [0])
+    tensions = array("B")
+    pos = array("I")
+    neg = array("I")
+    counts = array("I")
+    session_lines = array("I")
+    for filestats in stats.per_file:
+        tensions.extend(filestats.session_tensions)
+        pos.extend(filestats.session_pos)
+        neg.extend(filestats.session_neg)
+        session_lines.extend(filestats.session_lines)
+        for i in range(filestats.session_count):
+            row = filestats.session_mentions[i]
+            for name in names:
+                counts.append(row.get(name, 0))
+        session_start.append(session_start[-1] + filestats.session_count)
+    for name, typecode, values in (
+        ("session.start", "Q", session_start),
+        ("session.tension", "B", tensions),
+        ("session.pos", "I", pos),
+        ("session.neg", "I", neg),
+        ("session.counts", "I", counts),
+        ("session.lines", "I", session_lines),
+    ):
+        sections.add(name, typecode, values)
+
+    # line by line tension and mood (see linesignal.py), every file's lines back to back
+    line_start = array("Q", [0])
+    line_tension = array("B")
+    line_mood = array("b")
+    for filestats in stats.per_file:
+        line_tension.extend(filestats.line_tension)
+        line_mood.extend(filestats.line_mood)
+        line_start.append(len(line_tension))
+    sections.add("line.start", "Q", line_start)
+    sections.add("line.tension", "B", line_tension)
+    sections.add("line.mood", "b", line_mood)
+
+    # where every physical line starts in its log, so a snapshot opened next to the logs can still read any line
+    offset_start = array("Q", [0])
+    offsets = array("Q")
+    for filestats in stats.per_file:
+        offsets.extend(filestats.line_starts)
+        offset_start.append(len(offsets))
+    sections.add("offset.start", "Q", offset_start)
+    sections.add("offset.lines", "Q", offsets)
+
+    # one sorted vocabulary for index terms and keywords
+    vocab_set = set()
+    for filestats in stats.per_file:
+        vocab_set.update(filestats.postings.keys())
+    for bag in stats.keywords.values():
+        vocab_set.update(bag.keys())
+    vocab = sorted(vocab_set)
+    termid = {term: i for i, term in enumerate(vocab)}
+    sections.add_strings("vocab", vocab)
+
+    # postings: per file a directory of (term id, where its lines start) sorted by term id
+    post_file = array("Q", [0])
+    dir_term = array("I")
+    dir_start = array("Q")
+    post_lines = array("I")
+    for filestats in stats.per_file:
+        for term in sorted(filestats.postings, key=lambda t: termid[t]):
+            dir_term.append(termid[term])
+            dir_start.append(len(post_lines))
+            post_lines.extend(filestats.postings[term])
+        post_file.append(len(dir_term))
+    dir_start.append(len(post_lines))
+    sections.add("post.file", "Q", post_file)
+    sections.add("post.term", "I", dir_term)
+    sections.add("post.start", "Q", dir_start)
+    sections.add("post.lines", "I", post_lines)
+
+    # the text of every line that mentions someone (what the articles panel shows), nothing else from the logs
+    text_file = array("Q", [0])
+    text_lineno = array("I")
+    texts: List[str] = []
+    for filestats in stats.per_file:
+        wanted = set()
+        for term, plist in filestats.postings.items():
+            if term.startswith("@"):
+                wanted.update(plist)
+        try:
+            physical = file_text(filestats).split("\n")
+        except OSError:
+            # the file went away since, its lines just dont come along
+            physical = []
+        for lineno in sorted(wanted):
+            if lineno < len(physical):
+                text_lineno.append(lineno)
+                texts.append(physical[lineno].strip()[:400])
+        text_file.append(len(text_lineno))
+    sections.add("text.file", "Q", text_file)
+    sections.add("text.lineno", "I", text_lineno)
+    sections.add_strings("text", texts)
+
+    # folded tables, kept in their original order so ties sort the same way
+    for table in ("cooc", "trios", "squads"):
+        rows = array("I")
+        for key, count in getattr(stats, table).items():
+            for name in key:
+                rows.append(nameid[name])
+            rows.append(count)
+        sections.add("table." + table, "I", rows)
+    kw_start = array("Q", [0])
+    kw_term = array("I")
+    kw_count = array("I")
+    for name in names:
+        for term, count in stats.keywords.get(name, {}).items():
+            kw_term.append(termid[term])
+            kw_count.append(count)
+        kw_start.append(len(kw_term))
+    sections.add("kw.start", "Q", kw_start)
+    sections.add("kw.term", "I", kw_term)
+    sections.add("kw.count", "I", kw_count)
+
+    table: Dict[str, List] = {}
+    offset = 0
+    for name, values in sections.arrays:
+        table[name] = [offset, values.typecode, len(values)]
+        offset = _align(offset + len(values) * values.itemsize)
+    files = [[fs.filename, fs.date, fs.source] for fs in stats.per_file]
+    duplicates = [[dup.source, dup.kept, dup.similarity, dup.exact] for dup in stats.duplicates]
+    # typo'd spellings fuzzy matching folded in, small enough to ride in the header
+    variants = stats.variants
+    header = json.dumps(
+        {
+            "version": SNAPSHOT_VERSION,
+            "byteorder": sys.byteorder,
+            "names": names,
+            "files": files,
+            "variants": variants,
+            "duplicates": duplicates,
+            "sections": table,
+        }
+    ).encode("utf-8")
+    datastart = _align(len(MAGIC) + 8 + len(header))
+
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(MAGIC)
+        fh.write(struct.pack("<Q", len(header)))
+        fh.write(header)
+        fh.write(b"\x00" * (datastart - fh.tell()))
+        for name, values in sections.arrays:
+            where = datastart + table[name][0]
+            fh.write(b"\x00" * (where - fh.tell()))
+            values.tofile(fh)
+    tmp.replace(path)
+
+
+class Snapshot:
+    # an open snapshot file, sections are views straight into the mapping
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, "rb") as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < len(MAGIC) + 8 or self._map[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        (headerlen,) = struct.unpack("<Q", self._map[len(MAGIC) : len(MAGIC) + 8])
+        header = json.loads(self._map[len(MAGIC) + 8 : len(MAGIC) + 8 + headerlen].decode("utf-8"))
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is snapshot version {header.get('version')}, expected {SNAPSHOT_VERSION}")
+        self._swap = header["byteorder"] != sys.byteorder
+        self._datastart = _align(len(MAGIC) + 8 + headerlen)
+        self._table = header["sections"]
+        self.names: List[str] = header["names"]
+        self.files: List[List[str]] = header["files"]
+        self.variants: Dict[str, Dict[str, int]] = header.get("variants", {})
+        self.duplicates: List[Duplicate] = [Duplicate(*row) for row in header.get("duplicates", [])]
+        for offset, typecode, count in self._table.values():
+            if self._datastart + offset + count * array(typecode).itemsize > len(self._map):
+                raise ValueError(f"{path} is cut short")
+        self._view = memoryview(self._map)
+        self._vocab: Optional[Dict[str, int]] = None
+
+    def section(self, name: str):
+        offset, typecode, count = self._table[name]
+        start = self._datastart + offset
+        itemsize = array(typecode).itemsize
+        view = self._view[start : start + count * itemsize]
+        if self._swap:
+            # made on a machine with the other byte order, this one has to be copied
+            values = array(typecode)
+            values.frombytes(view)
+            values.byteswap()
+            return values
+        return view.cast(typecode)
+
+    def _string(self, name: str, index: int) -> str:
+        ends = self.section(name + ".ends")
+        start = ends[index - 1] if index > 0 else 0
+        return bytes(self.section(name + ".blob")[start : ends[index]]).decode("utf-8")
+
+    def term(self, termid: int) -> str:
+        return self._string("vocab", termid)
+
+    def term_id(self, term: str) -> Optional[int]:
+        if self._vocab is None:
+            ends = self.section("vocab.ends")
+            blob = bytes(self.section("vocab.blob"))
+            vocab = {}
+            start = 0
+            for i in range(len(ends)):
+                vocab[blob[start : ends[i]].decode("utf-8")] = i
+                start = ends[i]
+            self._vocab = vocab
+        return self._vocab.get(term)
+
+    def line_texts(self, fileidx: int, linenos: List[int]) -> List[Optional[str]]:
+        file_start = self.section("text.file")
+        stored = self.section("text.lineno")[file_start[fileidx] : file_start[fileidx + 1]]
+        out: List[Optional[str]] = []
+        for lineno in linenos:
+            pos = bisect_left(stored, lineno)
+            if pos < len(stored) and stored[pos] == lineno:
+                out.append(self._string("text", file_start[fileidx] + pos))
+            else:
+                out.append(None)
+        return out
+
+
+class _Postings(Mapping):
+    # a file's line index read out of the snapshot, terms get looked up on demand
+    def __init__(self, snapshot: Snapshot, fileidx: int) -> None:
+        self._snapshot = snapshot
+        file_start = snapshot.section("post.file")
+        self._lo = file_start[fileidx]
+        self._hi = file_start[fileidx + 1]
+
+    def __getitem__(self, term: str):
+        termid = self._snapshot.term_id(term)
+        if termid is None:
+            raise KeyError(term)
+        terms = self._snapshot.section("post.term")
+        pos = bisect_left(terms, termid, self._lo, self._hi)
+        if pos >= self._hi or terms[pos] != termid:
+            raise KeyError(term)
+        starts = self._snapshot.section("post.start")
+        return self._snapshot.section("post.lines")[starts[pos] : starts[pos + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        terms = self._snapshot.section("post.term")
+        for pos in range(self._lo, self._hi):
+            yield self._snapshot.term(terms[pos])
+
+    def __len__(self) -> int:
+        return self._hi - self._lo
+
+
+def load_snapshot(path: Path) -> DashboardStats:
+    snapshot = Snapshot(path)
+    names = snapshot.names
+    width = len(names)
+    scalars = snapshot.section("file.scalars")
+    mentions = snapshot.section("file.mentions")
+    session_start = snapshot.section("session.start")
+    tensions = snapshot.section("session.tension")
+    pos = snapshot.section("session.pos")
+    neg = snapshot.section("session.neg")
+    counts = snapshot.section("session.counts")
+    session_lines = snapshot.section("session.lines")
+    line_start = snapshot.section("line.start")
+    line_tension = snapshot.section("line.tension")
+    line_mood = snapshot.section("line.mood")
+    offset_start = snapshot.section("offset.start")
+    offsets = snapshot.section("offset.lines")
+    nametuple = tuple(names)
+
+    totals = {name: 0 for name in names}
+    perfiles = []
+    for fileidx, (filename, date, source) in enumerate(snapshot.files):
+        values = scalars[fileidx * len(_SCALARS) : (fileidx + 1) * len(_SCALARS)]
+        filementions = dict(zip(names, mentions[fileidx * width : (fileidx + 1) * width]))
+        for name, count in filementions.items():
+            totals[name] = totals[name] + count
+        lo = session_start[fileidx]
+        hi = session_start[fileidx + 1]
+        fields = dict(zip(_SCALARS, values))
+        perfiles.append(
+            FileStats(
+                filename=filename,
+                date=date,
+                mentions=filementions,
+                lines_for_selected={},
+                text="",
+                session_tensions=tensions[lo:hi],
+                session_pos=pos[lo:hi],
+                session_neg=neg[lo:hi],
+                session_counts=counts[lo * width : hi * width],
+                names=nametuple,
+                source=source,
+                postings=_Postings(snapshot, fileidx),
+                line_tension=line_tension[line_start[fileidx] : line_start[fileidx + 1]],
+                line_mood=line_mood[line_start[fileidx] : line_start[fileidx + 1]],
+                line_starts=offsets[offset_start[fileidx] : offset_start[fileidx + 1]],
+                session_lines=session_lines[lo:hi],
+                **fields,
+            )
+        )
+
+    stats = DashboardStats(totals=totals, per_file=perfiles, snapshot=snapshot, duplicates=snapshot.duplicates)
+    # the folded tables come straight from the file, nothing to re-add
+    for table, keylen in (("cooc", 2), ("trios", 3), ("squads", 4)):
+        rows = snapshot.section("table." + table)
+        folded = {}
+        for i in range(0, len(rows), keylen + 1):
+            folded[tuple(names[rows[i + j]] for j in range(keylen))] = rows[i + keylen]
+        stats._derived[table] = folded
+    kw_start = snapshot.section("kw.start")
+    kw_term = snapshot.section("kw.term")
+    kw_count = snapshot.section("kw.count")
+    keywords: Dict[str, Dict[str, int]] = {}
+    for charid, name in enumerate(names):
+        bag = {}
+        for i in range(kw_start[charid], kw_start[charid + 1]):
+            bag[snapshot.term(kw_term[i])] = kw_count[i]
+        keywords[name] = bag
+    stats._derived["keywords"] = keywords
+    stats._derived["variants"] = snapshot.variants
+    return stats
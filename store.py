@@ -0,0 +1,411 @@
+# optional sqlite copy of the stats, so questions across years of logs are a query instead of a rescan.
+# one store can hold several folders (campaigns): every file row says which folder it came from, and syncing a
+# folder only ever touches that folder's rows
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from helpers import shannon_entropy
+from models import DashboardStats, FileStats
+from timeline import bucket_of
+
+# bump this if the tables change (an old store just gets rebuilt)
+STORE_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS folders (folder TEXT PRIMARY KEY, roster TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    folder TEXT NOT NULL,
+    source TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    date TEXT NOT NULL,
+    month TEXT NOT NULL,
+    words INTEGER, lines INTEGER, tension INTEGER, pos INTEGER, neg INTEGER,
+    exclaims INTEGER, questions INTEGER, caps INTEGER, chars INTEGER, session_count INTEGER,
+    UNIQUE (folder, source)
+);
+CREATE TABLE IF NOT EXISTS file_mentions (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    character TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (character, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS file_mentions_file ON file_mentions (file_id);
+CREATE TABLE IF NOT EXISTS file_pairs (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    a TEXT NOT NULL,
+    b TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (a, b, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS file_pairs_file ON file_pairs (file_id);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    month TEXT NOT NULL,
+    tension INTEGER, pos INTEGER, neg INTEGER, entropy REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_month ON sessions (month);
+CREATE INDEX IF NOT EXISTS sessions_file ON sessions (file_id);
+CREATE TABLE IF NOT EXISTS session_mentions (
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    character TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (character, session_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS session_mentions_session ON session_mentions (session_id);
+CREATE TABLE IF NOT EXISTS line_mentions (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    lineno INTEGER NOT NULL,
+    character TEXT NOT NULL,
+    PRIMARY KEY (character, file_id, lineno)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS line_mentions_file ON line_mentions (file_id);
+CREATE TABLE IF NOT EXISTS totals (
+    folder TEXT NOT NULL, character TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (folder, character)
+);
+CREATE TABLE IF NOT EXISTS pairs (
+    folder TEXT NOT NULL, a TEXT NOT NULL, b TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (folder, a, b)
+);
+CREATE INDEX IF NOT EXISTS pairs_b ON pairs (folder, b);
+CREATE INDEX IF NOT EXISTS pairs_count ON pairs (folder, count);
+"""
+
+# child tables first so deleting a file never trips a foreign key
+_TABLES = (
+    "line_mentions",
+    "session_mentions",
+    "sessions",
+    "file_pairs",
+    "file_mentions",
+    "files",
+    "totals",
+    "pairs",
+    "folders",
+    "meta",
+)
+
+
+def _signature(filestats: FileStats) -> str:
+    # fingerprint of everything a file's rows are made from (and its keywords), a file only gets rewritten in the
+    # store when this changes
+    mentionlines = []
+    for term, plist in filestats.postings.items():
+        if term.startswith("@"):
+            mentionlines.append((term, list(plist)))
+    mentionlines.sort()
+    parts = (
+        filestats.filename,
+        filestats.date,
+        filestats.chars,
+        filestats.words,
+        filestats.lines,
+        filestats.tension,
+        filestats.pos,
+        filestats.neg,
+        filestats.exclaims,
+        filestats.questions,
+        filestats.caps,
+        filestats.session_count,
+        list(filestats.session_tensions),
+        list(filestats.session_pos),
+        list(filestats.session_neg),
+        list(filestats.session_counts),
+        sorted(filestats.mentions.items()),
+        sorted(filestats.cooc.items()),
+        sorted((name, sorted(bag.items())) for name, bag in filestats.keywords.items()),
+        mentionlines,
+    )
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def open_store(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path))
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(_SCHEMA)
+    row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    if row is None or row[0] != str(STORE_VERSION):
+        _wipe(conn)
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(STORE_VERSION),))
+    return conn
+
+
+def _wipe(conn: sqlite3.Connection) -> None:
+    with conn:
+        for table in _TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.executescript(_SCHEMA)
+
+
+def _insert_file(conn: sqlite3.Connection, folder: str, filestats: FileStats, signature: str) -> None:
+    cur = conn.execute(
+        "INSERT INTO files (folder, source, signature, filename, date, month, words, lines, tension, pos, neg, exclaims, questions, caps, chars, session_count)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            folder,
+            filestats.source,
+            signature,
+            filestats.filename,
+            filestats.date,
+            bucket_of(filestats.date, "month"),
+            filestats.words,
+            filestats.lines,
+            filestats.tension,
+            filestats.pos,
+            filestats.neg,
+            filestats.exclaims,
+            filestats.questions,
+            filestats.caps,
+            filestats.chars,
+            filestats.session_count,
+        ),
+    )
+    file_id = cur.lastrowid
+    conn.executemany(
+        "INSERT INTO file_mentions VALUES (?, ?, ?)",
+        [(file_id, name, count) for name, count in filestats.mentions.items() if count],
+    )
+    conn.executemany(
+        "INSERT INTO file_pairs VALUES (?, ?, ?, ?)",
+        [(file_id, a, b, count) for (a, b), count in filestats.cooc.items()],
+    )
+    month = bucket_of(filestats.date, "month")
+    for i in range(filestats.session_count):
+        sessionmentions = filestats.session_mentions[i]
+        cur = conn.execute(
+            "INSERT INTO sessions (file_id, idx, date, month, tension, pos, neg, entropy) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                file_id,
+                i,
+                filestats.date,
+                month,
+                filestats.session_tensions[i],
+                filestats.session_pos[i],
+                filestats.session_neg[i],
+                shannon_entropy(sessionmentions),
+            ),
+        )
+        session_id = cur.lastrowid
+        conn.executemany(
+            "INSERT INTO session_mentions VALUES (?, ?, ?)",
+            [(session_id, name, count) for name, count in sessionmentions.items() if count],
+        )
+    for term, plist in filestats.postings.items():
+        if term.startswith("@"):
+            name = term[1:]
+            conn.executemany("INSERT INTO line_mentions VALUES (?, ?, ?)", [(file_id, lineno, name) for lineno in plist])
+
+
+def sync_store(conn: sqlite3.Connection, stats: DashboardStats, folder: Path) -> Tuple[int, int]:
+    # bring folder's rows in line with stats (its board), only touching files that changed; other folders in the
+    # same store are left alone. returns (written, removed)
+    key = str(folder)
+    roster = ",".join(stats.totals.keys())
+    row = conn.execute("SELECT roster FROM folders WHERE folder = ?", (key,)).fetchone()
+    existing: Dict[str, Tuple[int, str]] = {}
+    for file_id, source, signature in conn.execute("SELECT id, source, signature FROM files WHERE folder = ?", (key,)):
+        existing[source] = (file_id, signature)
+
+    written = 0
+    removed = 0
+    with conn:
+        if row is not None and row[0] != roster:
+            # different character list = every row of this folder is stale
+            conn.execute("DELETE FROM files WHERE folder = ?", (key,))
+            removed = len(existing)
+            existing = {}
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(STORE_VERSION),))
+        conn.execute("INSERT OR REPLACE INTO folders VALUES (?, ?)", (key, roster))
+        seen = set()
+        for filestats in stats.per_file:
+            seen.add(filestats.source)
+            signature = _signature(filestats)
+            old = existing.get(filestats.source)
+            if old is not None and old[1] == signature:
+                continue
+            if old is not None:
+                conn.execute("DELETE FROM files WHERE id = ?", (old[0],))
+            _insert_file(conn, key, filestats, signature)
+            written = written + 1
+        for source, (file_id, _) in existing.items():
+            if source not in seen:
+                conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+                removed = removed + 1
+        if written or removed or row is None:
+            # aggregates are tiny next to the per-line rows, just redo this folder's
+            conn.execute("DELETE FROM totals WHERE folder = ?", (key,))
+            conn.execute(
+                "INSERT INTO totals SELECT f.folder, m.character, SUM(m.count) FROM file_mentions m"
+                " JOIN files f ON f.id = m.file_id WHERE f.folder = ? GROUP BY m.character",
+                (key,),
+            )
+            conn.execute("DELETE FROM pairs WHERE folder = ?", (key,))
+            conn.execute(
+                "INSERT INTO pairs SELECT f.folder, p.a, p.b, SUM(p.count) FROM file_pairs p"
+                " JOIN files f ON f.id = p.file_id WHERE f.folder = ? GROUP BY p.a, p.b",
+                (key,),
+            )
+    return (written, removed)
+
+
+def tension_by_month(
+    conn: sqlite3.Connection, present: Sequence[str] = (), folder: Optional[Path] = None
+) -> List[Tuple[str, float, int]]:
+    # (month, avg session tension, sessions) for sessions where everyone in present shows up, in one folder's
+    # logs or (folder=None) everything in the store
+    where = ""
+    params: List[object] = []
+    if folder is not None:
+        where = " WHERE s.file_id IN (SELECT id FROM files WHERE folder = ?)"
+        params.append(str(folder))
+    if not present:
+        sql = "SELECT s.month, AVG(s.tension), COUNT(*) FROM sessions s" + where + " GROUP BY s.month ORDER BY s.month"
+        return conn.execute(sql, params).fetchall()
+    marks = ",".join("?" for _ in present)
+    sql = (
+        "SELECT s.month, AVG(s.tension), COUNT(*) FROM sessions s"
+        " JOIN (SELECT session_id FROM session_mentions WHERE character IN (" + marks + ")"
+        " GROUP BY session_id HAVING COUNT(*) = ?) hit ON hit.session_id = s.id"
+        + where
+        + " GROUP BY s.month ORDER BY s.month"
+    )
+    return conn.execute(sql, (*present, len(set(present)), *params)).fetchall()
+
+
+def store_totals(conn: sqlite3.Connection, folder: Path) -> Dict[str, int]:
+    # mentions per character in folder's logs (characters nobody mentioned arent in it)
+    rows = conn.execute("SELECT character, count FROM totals WHERE folder = ?", (str(folder),))
+    return {name: count for name, count in rows}
+
+
+def store_ties(conn: sqlite3.Connection, folder: Path, name: str, limit: int = 6) -> List[Tuple[str, int]]:
+    # name's strongest ties, biggest first
+    key = str(folder)
+    return conn.execute(
+        "SELECT b, count FROM pairs WHERE folder = ? AND a = ? UNION ALL SELECT a, count FROM pairs WHERE folder = ? AND b = ?"
+        " ORDER BY 2 DESC, 1 LIMIT ?",
+        (key, name, key, name, limit),
+    ).fetchall()
+
+
+def store_top_pairs(conn: sqlite3.Connection, folder: Path, limit: int = 6) -> List[Tuple[str, str, int]]:
+    return conn.execute(
+        "SELECT a, b, count FROM pairs WHERE folder = ? ORDER BY count DESC, a, b LIMIT ?", (str(folder), limit)
+    ).fetchall()
+
+
+def files_mentioning(
+    conn: sqlite3.Connection, name: str, folder: Optional[Path] = None, limit: int = 20
+) -> List[Tuple[str, str, str, int]]:
+    # (folder, file, date, mentions) for the logs that mention name the most, in one folder or the whole store
+    where = ""
+    params: List[object] = [name]
+    if folder is not None:
+        where = " AND f.folder = ?"
+        params.append(str(folder))
+    params.append(limit)
+    return conn.execute(
+        "SELECT f.folder, f.filename, f.date, m.count FROM file_mentions m JOIN files f ON f.id = m.file_id"
+        " WHERE m.character = ?" + where + " ORDER BY m.count DESC, f.date, f.filename LIMIT ?",
+        params,
+    ).fetchall()
+
+
+class StoreSync:
+    # keeps one folder's rows in the store in line with the board, on a background thread so a load never waits on
+    # sqlite. the ui asks its questions (totals, ties) through its own connection, but only once .synced is the
+    # board it's showing, until then the board's own numbers are used
+    def __init__(self, path: Path, folder: Path) -> None:
+        self.path = path
+        self.folder = folder
+        # opened here so an old store gets rebuilt before the writer starts, and stays on this (the ui) thread
+        self.reader = open_store(path)
+        self.synced: Optional[DashboardStats] = None
+        self.error = ""
+        self._pending: Optional[DashboardStats] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="insider-store", daemon=True)
+        self._thread.start()
+
+    def submit(self, stats: DashboardStats) -> None:
+        # only the newest board waiting gets written, one that got replaced before its turn is skipped
+        with self._lock:
+            self._pending = stats
+        self._wake.set()
+
+    def close(self) -> None:
+        # a sync that's waiting or running still gets finished, quitting right after a load shouldnt lose it
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.reader.close()
+
+    def _run(self) -> None:
+        try:
+            conn = open_store(self.path)
+        except (OSError, sqlite3.Error) as exc:
+            self.error = str(exc)
+            return
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                stats = self._pending
+                self._pending = None
+            if stats is not None:
+                try:
+                    sync_store(conn, stats, self.folder)
+                    self.error = ""
+                    self.synced = stats
+                except (OSError, sqlite3.Error) as exc:
+                    # disk full or the file is locked: the board's own numbers keep being used
+                    self.error = str(exc)
+            if self._closed:
+                conn.close()
+                return
+
+    def totals(self, stats: DashboardStats) -> Optional[Dict[str, int]]:
+        # stats' totals out of the store, None if the store isnt on that board (yet) or cant be read
+        if self.synced is not stats:
+            return None
+        try:
+            found = store_totals(self.reader, self.folder)
+        except sqlite3.Error:
+            return None
+        return {name: found.get(name, 0) for name in stats.totals}
+
+    def ties(self, stats: DashboardStats, name: str, limit: int = 6) -> Optional[List[Tuple[str, int]]]:
+        if self.synced is not stats:
+            return None
+        try:
+            return store_ties(self.reader, self.folder, name, limit)
+        except sqlite3.Error:
+            return None
+
+    def top_pairs(self, stats: DashboardStats, limit: int = 6) -> Optional[List[Tuple[str, str, int]]]:
+        if self.synced is not stats:
+            return None
+        try:
+            return store_top_pairs(self.reader, self.folder, limit)
+        except sqlite3.Error:
+            return None
+
+
+def run_sql(conn: sqlite3.Connection, sql: str) -> Tuple[List[str], List[tuple]]:
+    cur = conn.execute(sql)
+    columns = [col[0] for col in cur.description or ()]
+    return (columns, cur.fetchall())
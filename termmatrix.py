@@ -0,0 +1,114 @@
+# which words set a character apart: every character's keyword counts as one sparse character x term matrix
+# (a row per character, only the words it actually has) plus per-word totals, kept up to date as counts come in.
+# words get ranked by weighted log-odds against everyone else (z-scores, with the whole board's counts as the
+# prior), so "said" / "back" / "looked" sink no matter how often they show up, and a word someone used once
+# doesnt shoot to the top either (which is what plain tf-idf does)
+from __future__ import annotations
+
+import heapq
+import math
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+# ranked words kept per character once asked for (the panel shows 10)
+RANKED = 40
+
+
+class TermMatrix:
+    def __init__(self, keywords: Dict[str, Dict[str, int]], names: Iterable[str] = ()) -> None:
+        self.vocab: List[str] = []
+        self.term_ids: Dict[str, int] = {}
+        # row per character: term id -> count
+        self.rows: Dict[str, Dict[int, int]] = {}
+        self.row_totals: Dict[str, int] = {}
+        # per term: count over every character
+        self.term_totals = array("Q")
+        self.total = 0
+        # character names (and "kal's") never count as keywords for anyone
+        self._skip = set()
+        for name in names:
+            self._skip.add(name)
+            self._skip.add(name + "'s")
+        self._ranked: Dict[str, List[Tuple[int, float]]] = {}
+        for name, bag in keywords.items():
+            self.add(name, bag)
+
+    def _term_id(self, term: str) -> int:
+        termid = self.term_ids.get(term)
+        if termid is None:
+            termid = len(self.vocab)
+            self.term_ids[term] = termid
+            self.vocab.append(term)
+            self.term_totals.append(0)
+        return termid
+
+    def add(self, name: str, bag: Dict[str, int]) -> None:
+        # more counts for one character (follow mode patches the matrix with what new lines added)
+        row = self.rows.get(name)
+        if row is None:
+            row = {}
+            self.rows[name] = row
+            self.row_totals[name] = 0
+        added = 0
+        for term, count in bag.items():
+            if term in self._skip or count <= 0:
+                continue
+            termid = self._term_id(term)
+            if termid in row:
+                row[termid] = row[termid] + count
+            else:
+                row[termid] = count
+            self.term_totals[termid] = self.term_totals[termid] + count
+            added = added + count
+        self.row_totals[name] = self.row_totals[name] + added
+        self.total = self.total + added
+        if added:
+            # every score depends on the totals, rank again when asked
+            self._ranked = {}
+
+    def count(self, name: str, term: str) -> int:
+        termid = self.term_ids.get(term)
+        if termid is None:
+            return 0
+        return self.rows.get(name, {}).get(termid, 0)
+
+    def _rank(self, name: str) -> List[Tuple[int, float]]:
+        # z-score of the log-odds of each of the character's words vs everybody else's, highest first
+        row = self.rows.get(name, {})
+        total = self.total
+        mine = self.row_totals.get(name, 0)
+        rest = total - mine
+        if not row or len(self.vocab) < 2:
+            # one word in the whole board, nothing to set anyone apart
+            return []
+        # the prior is the board itself: every word starts out with its overall count on both sides, so a word
+        # needs real evidence to pull away from how often everybody uses it
+        totals = self.term_totals
+        log = math.log
+        scored = []
+        for termid, count in row.items():
+            alpha = totals[termid]
+            other = alpha - count
+            mine_odds = log((count + alpha) / (mine + total - count - alpha))
+            rest_odds = log((other + alpha) / (rest + total - other - alpha))
+            spread = 1.0 / (count + alpha) + 1.0 / (other + alpha)
+            scored.append((termid, (mine_odds - rest_odds) / math.sqrt(spread)))
+        top = heapq.nlargest(RANKED, scored, key=lambda item: item[1])
+        # ties go to the more common word, then alphabetical, so the panel doesnt shuffle around
+        top.sort(key=lambda item: (-item[1], -row[item[0]], self.vocab[item[0]]))
+        return top
+
+    def distinctive(self, name: str, limit: int = 10) -> List[Tuple[str, int, float]]:
+        # (word, how often it shows up with the character, score) for the words that set them apart the most;
+        # only words they use more than everyone else do (score above 0)
+        ranked = self._ranked.get(name)
+        if ranked is None:
+            ranked = self._rank(name)
+            self._ranked[name] = ranked
+        row = self.rows.get(name, {})
+        out = []
+        for termid, score in ranked[:limit]:
+            if score <= 0.0:
+                break
+            out.append((self.vocab[termid], row[termid], score))
+        return out
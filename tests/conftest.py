@@ -0,0 +1,7 @@
+# the modules sit flat next to imagination_insider.py, not in a package, so the tests import them from there
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
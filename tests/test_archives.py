@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import bz2
+import gzip
+import zipfile
+from pathlib import Path
+
+import pytest
+
+import models
+from archives import ArchiveMember, read_log_chunks, read_source_lines, resolve_source, zip_members
+from backends import compute_stats
+from config import Character
+from discovery import list_log_files
+from models import analyze_file, analyze_stream
+
+try:
+    import lzma
+except ImportError:  # same as archives.py, .xz logs just dont get tested then
+    lzma = None
+
+ROSTER = [Character("kal", ("kal",)), Character("bob", ("bob", "robert"))]
+
+LOGS = {
+    "a-2026-01-01.txt": b"kal and bob\r\nrobert draws a blade!\r\n\r\n\r\nkal alone\r\n",
+    "b-2026-01-08.txt": "bob café kal\n---\nkal? kal!\nno final newline bob".encode("utf-8"),
+    "c-2026-01-15.txt": b"\xef\xbb\xbfkal\n\n\nbob\n",
+}
+WRAP = {".gz": gzip.compress, ".bz2": bz2.compress}
+if lzma is not None:
+    WRAP[".xz"] = lzma.compress
+
+
+def _plain(folder: Path) -> Path:
+    folder.mkdir()
+    for name, data in LOGS.items():
+        (folder / name).write_bytes(data)
+    return folder
+
+
+def _numbers(stats) -> list:
+    out = []
+    for filestats in stats.per_file:
+        out.append((
+            filestats.date, filestats.words, filestats.lines, filestats.tension, filestats.mentions,
+            list(filestats.session_tensions), list(filestats.session_counts), filestats.cooc, filestats.keywords,
+            list(filestats.line_starts), filestats.digest,
+        ))
+    return out
+
+
+@pytest.mark.parametrize("suffix", sorted(WRAP))
+def test_compressed_logs_match_plain_ones(tmp_path: Path, suffix: str) -> None:
+    want = compute_stats(_plain(tmp_path / "plain"), characters=ROSTER, backend="python")
+    packed = tmp_path / "packed"
+    packed.mkdir()
+    for name, data in LOGS.items():
+        (packed / (name + suffix)).write_bytes(WRAP[suffix](data))
+    got = compute_stats(packed, characters=ROSTER, backend="python")
+    assert [filestats.filename for filestats in got.per_file] == [name + suffix for name in LOGS]
+    assert _numbers(got) == _numbers(want)
+    assert got.totals == want.totals
+
+
+def test_zip_members_match_plain_logs(tmp_path: Path) -> None:
+    want = compute_stats(_plain(tmp_path / "plain"), characters=ROSTER, backend="python")
+    folder = tmp_path / "zipped"
+    folder.mkdir()
+    with zipfile.ZipFile(folder / "bundle.zip", "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in LOGS.items():
+            zf.writestr("season1/" + name, data)
+        zf.writestr("season1/readme.md", b"kal kal kal")
+    (folder / "broken.zip").write_bytes(b"not a zip")
+
+    assert [member.member for member in zip_members(folder / "bundle.zip")] == ["season1/" + name for name in LOGS]
+    assert zip_members(folder / "broken.zip") == []
+    got = compute_stats(folder, characters=ROSTER, backend="python")
+    assert _numbers(got) == _numbers(want)
+    member = resolve_source(got.per_file[0].source)
+    assert isinstance(member, ArchiveMember)
+    assert member.size == len(LOGS["a-2026-01-01.txt"])
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_streaming_matches_one_read(tmp_path: Path, monkeypatch, size: int) -> None:
+    path = tmp_path / "a-2026-01-01.txt.bz2"
+    data = b"".join(LOGS.values()) * 20
+    path.write_bytes(bz2.compress(data))
+    assert b"".join(read_log_chunks(path, size)) == data
+    # same numbers whether the parser gets the whole thing at once or chunks that cut lines (and \r\n) in half
+    monkeypatch.setattr(models, "read_log_chunks", lambda source: read_log_chunks(source, size))
+    assert analyze_stream(path, ROSTER) == analyze_file(path, ROSTER, data)
+
+
+def test_lines_read_back_out_of_order(tmp_path: Path) -> None:
+    folder = tmp_path / "packed"
+    folder.mkdir()
+    (folder / "a-2026-01-01.txt.gz").write_bytes(gzip.compress(LOGS["a-2026-01-01.txt"]))
+    filestats = analyze_file(list_log_files(folder)[0], ROSTER)
+    starts = list(filestats.line_starts)
+    texts = read_source_lines(filestats.source, [starts[4], starts[0], starts[1]])
+    assert [text.strip() for text in texts] == ["kal alone", "kal and bob", "robert draws a blade!"]
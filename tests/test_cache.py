@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import replace
+from pathlib import Path
+
+from cache import PRUNE_EVERY, FileCache
+from config import DEFAULT_WORDS, Character
+from models import analyze_file
+
+ROSTER = [Character("kal", ("kal",)), Character("bob", ("bob",))]
+
+
+def _entries(directory: Path) -> list:
+    return sorted(directory.glob("*/*.pkl"))
+
+
+def _age(path: Path, seconds: float) -> None:
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_entries_come_back_without_the_text(tmp_path: Path) -> None:
+    log = tmp_path / "a-2026-01-01.txt"
+    log.write_text("kal and bob\n", encoding="utf-8")
+    cache = FileCache(tmp_path / "cache")
+    filestats = analyze_file(log, ROSTER)
+    cache.put(log, ROSTER, filestats)
+    assert cache.get(log, ROSTER) == replace(filestats, text="")
+    # another roster or other word lists are other entries
+    assert cache.get(log, ROSTER[:1]) is None
+    assert cache.get(log, ROSTER, replace(DEFAULT_WORDS, stop=frozenset({"and"}))) is None
+    # so is the same file once it's changed
+    log.write_text("kal and bob and kal\n", encoding="utf-8")
+    assert cache.get(log, ROSTER) is None
+
+
+def test_broken_entries_are_misses(tmp_path: Path) -> None:
+    log = tmp_path / "a-2026-01-01.txt"
+    log.write_text("kal\n", encoding="utf-8")
+    cache = FileCache(tmp_path / "cache")
+    cache.put(log, ROSTER, analyze_file(log, ROSTER))
+    _entries(tmp_path / "cache")[0].write_bytes(b"half a pickl")
+    assert cache.get(log, ROSTER) is None
+
+
+def test_prune_by_age_then_size(tmp_path: Path) -> None:
+    directory = tmp_path / "cache"
+    cache = FileCache(directory)
+    logs = []
+    for i in range(4):
+        log = tmp_path / f"log{i}.txt"
+        log.write_text("kal " * (i + 1) + "\n", encoding="utf-8")
+        cache.put(log, ROSTER, analyze_file(log, ROSTER))
+        logs.append(log)
+    entries = {log: cache._entry_path(log, ROSTER, DEFAULT_WORDS) for log in logs}
+    # log0 hasnt been read in ages, log1 is the least recently read of the rest
+    _age(entries[logs[0]], 40 * 24 * 3600)
+    _age(entries[logs[1]], 3 * 24 * 3600)
+    _age(entries[logs[2]], 2 * 24 * 3600)
+    leftover = directory / "ab" / "dead.123.456.tmp"
+    leftover.parent.mkdir(exist_ok=True)
+    leftover.write_bytes(b"")
+    _age(leftover, PRUNE_EVERY + 60)
+
+    assert cache.prune() == 2
+    assert cache.get(logs[0], ROSTER) is None
+    assert not leftover.exists()
+    # room for about two entries: the older of the remaining three goes
+    size = max(path.stat().st_size for path in _entries(directory))
+    assert cache.prune(max_bytes=2 * size) == 1
+    assert cache.get(logs[1], ROSTER) is None
+    assert cache.get(logs[2], ROSTER) is not None
+    assert cache.get(logs[3], ROSTER) is not None
+
+
+def test_put_prunes_at_most_once_a_day(tmp_path: Path) -> None:
+    directory = tmp_path / "cache"
+    log = tmp_path / "log.txt"
+    log.write_text("kal\n", encoding="utf-8")
+    FileCache(directory).put(log, ROSTER, analyze_file(log, ROSTER))
+    entry = _entries(directory)[0]
+    _age(entry, 60 * 24 * 3600)
+    others = []
+    for i in range(2):
+        other = tmp_path / f"other{i}.txt"
+        other.write_text("bob\n" * (i + 1), encoding="utf-8")
+        others.append(other)
+    # the first put already left the marker, so a new cache within the day leaves the old entry alone
+    FileCache(directory).put(others[0], ROSTER, analyze_file(others[0], ROSTER))
+    assert entry.exists()
+    _age(directory / "pruned", PRUNE_EVERY + 60)
+    FileCache(directory).put(others[1], ROSTER, analyze_file(others[1], ROSTER))
+    assert not entry.exists()
+    assert len(_entries(directory)) == 2
@@ -0,0 +1,74 @@
+# every backend and the chunked (follow mode) parser have to give the python backend's board, down to the last number,
+# and that board has to match the slow reference loop on every field it fills
+from __future__ import annotations
+
+import random
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from backends import BACKENDS, analyze_parallel, analyze_reference, compute_stats
+from cache import FileCache
+from config import CHARACTERS, DEFAULT_WORDS
+from crosscheck import FUZZ_CHARACTERS, FUZZ_WORDS, WINDOWS, check_folder, diff_reference, write_edge_folder, write_fuzz_folder
+from discovery import list_log_files
+from models import analyze_files
+
+
+@pytest.mark.parametrize("window", WINDOWS, ids=lambda window: f"{window.unit}{window.size}")
+def test_edge_cases_agree(tmp_path: Path, window) -> None:
+    write_edge_folder(tmp_path)
+    for characters, wordlists in ((FUZZ_CHARACTERS, FUZZ_WORDS), (CHARACTERS, DEFAULT_WORDS)):
+        rng = random.Random(0)
+        assert check_folder(tmp_path, list(BACKENDS), characters, replace(wordlists, window=window), rng) == []
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_random_logs_agree(tmp_path: Path, seed: int) -> None:
+    rng = random.Random(seed)
+    write_fuzz_folder(tmp_path, rng, 10)
+    for window in WINDOWS:
+        assert check_folder(tmp_path, list(BACKENDS), FUZZ_CHARACTERS, replace(FUZZ_WORDS, window=window), rng) == []
+
+
+def test_exact_copy_left_out_by_every_backend(tmp_path: Path) -> None:
+    # the edge folder has one byte for byte copy in it
+    write_edge_folder(tmp_path)
+    for backend in BACKENDS:
+        stats = compute_stats(tmp_path, characters=FUZZ_CHARACTERS, wordlists=FUZZ_WORDS, backend=backend)
+        assert len(stats.duplicates) == 1
+        assert stats.duplicates[0].exact
+        assert stats.duplicates[0].source not in [filestats.source for filestats in stats.per_file]
+
+
+def test_reference_catches_what_every_backend_gets_wrong(tmp_path: Path) -> None:
+    write_edge_folder(tmp_path)
+    files = list_log_files(tmp_path)
+    want = compute_stats(tmp_path, files, FUZZ_CHARACTERS, wordlists=FUZZ_WORDS, backend="python")
+    reference = analyze_reference(files, FUZZ_CHARACTERS, None, FUZZ_WORDS)
+    assert diff_reference(want, reference) == []
+    # one count off in the shared parser shows up, even though python and parallel would still agree
+    want.per_file[1].mentions["kal"] = want.per_file[1].mentions["kal"] + 1
+    assert any("mentions" in problem for problem in diff_reference(want, reference))
+
+
+def test_parallel_mixes_cache_hits_and_workers(tmp_path: Path) -> None:
+    rng = random.Random(5)
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    write_fuzz_folder(logs, rng, 8)
+    files = list_log_files(logs)
+    cache = FileCache(tmp_path / "cache")
+    # every other file is cached already, the rest go to the workers
+    for i, filestats in enumerate(analyze_files(files[::2], FUZZ_CHARACTERS, None, FUZZ_WORDS)):
+        cache.put(files[i * 2], FUZZ_CHARACTERS, filestats, FUZZ_WORDS)
+    got = analyze_parallel(files, FUZZ_CHARACTERS, cache, FUZZ_WORDS, workers=2)
+    want = analyze_files(files, FUZZ_CHARACTERS, None, FUZZ_WORDS)
+    assert [filestats.source for filestats in got] == [str(path) for path in files]
+    for a, b in zip(got, want):
+        assert a.mentions == b.mentions
+        assert a.cooc == b.cooc
+        assert list(a.session_tensions) == list(b.session_tensions)
+    # and they all went in the cache
+    assert all(cache.get(path, FUZZ_CHARACTERS, FUZZ_WORDS) is not None for path in files)
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import json
+import socket
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import daemon
+from backends import compute_stats
+from config import Character
+from daemon import MAX_REQUEST, DaemonClient, StatsDaemon, daemon_key, socket_path
+from settings import LiveSettings
+
+ROSTER = [Character("kal", ("kal",)), Character("bob", ("bob", "robert"))]
+
+LOGS = {
+    "a-2026-01-03.txt": "kal and bob walk in\nrobert waits\n",
+    "b-2026-01-20.txt": "kal alone\n---\nbob and kal\n",
+}
+
+
+@pytest.fixture
+def running(tmp_path: Path, monkeypatch):
+    # a daemon serving a small folder from a thread, checking for changes often so the test doesnt wait a second
+    monkeypatch.setattr(daemon, "POLL_SECONDS", 0.05)
+    folder = tmp_path / "logs"
+    folder.mkdir()
+    for name, text in LOGS.items():
+        (folder / name).write_text(text, encoding="utf-8")
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"characters": {"kal": ["kal"], "bob": ["bob", "robert"]}}), encoding="utf-8")
+    stats_daemon = StatsDaemon(folder, LiveSettings(config), backend="python")
+    path = socket_path(tmp_path / "run", folder)
+    thread = threading.Thread(target=stats_daemon.serve, args=(path,), daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not path.exists():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    yield stats_daemon, path, folder
+    stats_daemon.stop()
+    thread.join(10)
+
+
+def _same_board(folder: Path, got) -> None:
+    # a snapshot keeps the board, not each file's text and tables
+    want = compute_stats(folder, characters=ROSTER, backend="python")
+    assert got.totals == want.totals
+    for table in ("cooc", "keywords", "neighbors", "trend"):
+        assert getattr(got, table) == getattr(want, table), table
+    assert [(f.filename, f.mentions) for f in got.per_file] == [(f.filename, f.mentions) for f in want.per_file]
+
+
+def _wait_for(client: DaemonClient):
+    deadline = time.monotonic() + 10
+    while True:
+        stats = client.poll()
+        if stats is not None:
+            return stats
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_socket_path_is_per_folder(tmp_path: Path) -> None:
+    one = tmp_path / "one"
+    one.mkdir()
+    assert daemon_key(one) == daemon_key(tmp_path / "x" / ".." / "one")
+    assert daemon_key(one) != daemon_key(tmp_path / "two")
+    assert socket_path(tmp_path, one) == tmp_path / (daemon_key(one) + ".sock")
+
+
+def test_viewer_gets_the_board_and_then_the_news(running) -> None:
+    stats_daemon, path, folder = running
+    client = DaemonClient(path)
+    try:
+        _same_board(folder, client.load())
+        status = client.status
+        assert status["folder"] == str(folder)
+        assert status["files"] == 2
+        assert status["viewers"] == 1
+        assert status["error"] == ""
+        assert client.poll() is None
+
+        (folder / "c-2026-02-02.txt").write_text("bob, robert and kal\n", encoding="utf-8")
+        stats = _wait_for(client)
+        _same_board(folder, stats)
+        assert client.status["generation"] > status["generation"]
+        # only the last couple of generations stay on disk
+        assert len(list(path.parent.glob(daemon_key(folder) + "-*.iis"))) <= daemon.KEEP_SNAPSHOTS
+    finally:
+        client.close()
+
+
+def test_config_change_sends_a_new_board(running, tmp_path: Path) -> None:
+    stats_daemon, path, folder = running
+    client = DaemonClient(path)
+    try:
+        assert set(client.load().totals) == {"kal", "bob"}
+        (tmp_path / "config.json").write_text(json.dumps({"characters": {"kal": ["kal"]}}), encoding="utf-8")
+        assert set(_wait_for(client).totals) == {"kal"}
+        # a broken config keeps the last good board and says why
+        (tmp_path / "config.json").write_text("{oops", encoding="utf-8")
+        deadline = time.monotonic() + 10
+        while not client.board_status()["config_error"]:
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+        assert client.poll() is None
+    finally:
+        client.close()
+
+
+def test_bad_requests_get_an_error(running) -> None:
+    stats_daemon, path, folder = running
+    client = DaemonClient(path)
+    try:
+        with pytest.raises(ValueError, match="unknown op"):
+            client._ask({"op": "dance"})
+        # the connection is still good after a refused request
+        assert "generation" in client.board_status()
+    finally:
+        client.close()
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(10)
+        sock.connect(str(path))
+        reader = sock.makefile("rb")
+        sock.sendall(b"not json\n")
+        assert "error" in json.loads(reader.readline())
+        # an oversized line gets turned away in pieces rather than read into memory whole
+        sock.sendall(b"x" * (MAX_REQUEST + 10) + b"\n")
+        assert "error" in json.loads(reader.readline())
+        assert "error" in json.loads(reader.readline())
+        sock.sendall(b'{"op": "board"}\n')
+        assert "generation" in json.loads(reader.readline())
+        reader.close()
+
+
+def test_stop_request_shuts_it_down(running) -> None:
+    stats_daemon, path, folder = running
+    client = DaemonClient(path)
+    client.load()
+    client.stop_daemon()
+    deadline = time.monotonic() + 10
+    while path.exists():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    # the snapshots go with it
+    assert list(path.parent.glob(daemon_key(folder) + "-*.iis")) == []
+    with pytest.raises(OSError):
+        DaemonClient(path).board_status()
+
+
+def test_second_daemon_is_refused(running) -> None:
+    stats_daemon, path, folder = running
+    other = StatsDaemon(folder, stats_daemon.settings, backend="python")
+    with pytest.raises(OSError, match="already running"):
+        other.serve(path)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os
+import shutil
+import time
+import zipfile
+from pathlib import Path
+
+from discovery import FolderScanner, ScanOptions, list_log_files
+
+
+def _tree(root: Path) -> None:
+    for rel in (
+        "season2/a-2026-05-01.txt",
+        "season1/z-2026-01-01.txt",
+        "season1/arc1/b-2026-02-01.txt",
+        "season1-extra/c-2026-03-01.txt",
+        "top.txt",
+        "Alpha.txt",
+        ".git/ignored.txt",
+        "season1/notes.md",
+    ):
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("kal\n")
+
+
+def _rel(root: Path, files) -> list:
+    return [path.relative_to(root).as_posix() for path in files]
+
+
+def test_recursive_goes_a_folder_at_a_time(tmp_path: Path) -> None:
+    _tree(tmp_path)
+    assert _rel(tmp_path, list_log_files(tmp_path)) == [
+        "Alpha.txt",
+        "season1/arc1/b-2026-02-01.txt",
+        "season1/z-2026-01-01.txt",
+        "season1-extra/c-2026-03-01.txt",
+        "season2/a-2026-05-01.txt",
+        "top.txt",
+    ]
+
+
+def test_top_level_is_by_name(tmp_path: Path) -> None:
+    _tree(tmp_path)
+    files = list_log_files(tmp_path, ScanOptions(recursive=False))
+    assert _rel(tmp_path, files) == ["Alpha.txt", "top.txt"]
+
+
+def test_include_exclude(tmp_path: Path) -> None:
+    _tree(tmp_path)
+    files = list_log_files(tmp_path, ScanOptions(include=("season1/*",), exclude=("arc1",)))
+    assert _rel(tmp_path, files) == ["season1/z-2026-01-01.txt"]
+
+
+def test_manifest_skips_unchanged_folders(tmp_path: Path) -> None:
+    root = tmp_path / "logs"
+    root.mkdir()
+    _tree(root)
+    # folders touched right before a listing arent trusted (see RACY_NS), these ones are an hour old
+    hour_ago = time.time() - 3600
+    for rel in ("", "season1", "season1/arc1", "season1-extra", "season2"):
+        os.utime(root / rel, (hour_ago, hour_ago))
+    manifest = tmp_path / "manifest.json"
+    scanner = FolderScanner(root, manifest=manifest)
+    first = scanner.list()
+    assert scanner.relisted == 5
+    again = FolderScanner(root, manifest=manifest)
+    assert again.list() == first
+    assert again.relisted == 0
+    (root / "season2" / "new-2026-06-01.txt").write_text("bob\n")
+    assert _rel(root, again.list())[-2:] == ["season2/new-2026-06-01.txt", "top.txt"]
+    assert again.relisted == 1
+
+
+def test_zip_members_and_a_rewritten_zip(tmp_path: Path) -> None:
+    root = tmp_path / "logs"
+    root.mkdir()
+    with zipfile.ZipFile(root / "old.zip", "w") as archive:
+        archive.writestr("b-2026-02-01.txt", "kal\n")
+        archive.writestr("notes.md", "not a log\n")
+    (root / "a-2026-01-01.txt").write_text("bob\n")
+    hour_ago = time.time() - 3600
+    os.utime(root, (hour_ago, hour_ago))
+    scanner = FolderScanner(root)
+    assert [str(path) for path in scanner.list()] == [str(root / "a-2026-01-01.txt"), f"{root / 'old.zip'}::b-2026-02-01.txt"]
+    assert list_log_files(root, ScanOptions(exclude=("old.zip",))) == [root / "a-2026-01-01.txt"]
+    # the folder's mtime doesnt move when the zip gets rewritten, the zip's own size/mtime does
+    with zipfile.ZipFile(root / "old.zip", "a") as archive:
+        archive.writestr("c-2026-03-01.txt", "zephyr\n")
+    os.utime(root, (hour_ago, hour_ago))
+    assert [path.name for path in scanner.list()] == ["a-2026-01-01.txt", "b-2026-02-01.txt", "c-2026-03-01.txt"]
+    assert scanner.relisted == 1
+
+
+def test_missing_subfolder_counts_as_empty(tmp_path: Path) -> None:
+    _tree(tmp_path)
+    scanner = FolderScanner(tmp_path)
+    scanner.list()
+    shutil.rmtree(tmp_path / "season1")
+    assert _rel(tmp_path, scanner.list()) == ["Alpha.txt", "season1-extra/c-2026-03-01.txt", "season2/a-2026-05-01.txt", "top.txt"]
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import os
+import random
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from backends import compute_stats
+from config import Character
+from crosscheck import diff_stats
+from follow import FileFollower, LiveBoard, newest_log
+from models import analyze_file, build_dashboard
+
+ROSTER = [Character("kal", ("kal",)), Character("bob", ("bob", "robert")), Character("zeph", ("zephyr",))]
+
+SESSION = (
+    "kal and bob walk in\r\n"
+    "zephyr draws a blade!\n"
+    "\n"
+    "\n"
+    "robert, kal and zephyr\n"
+    "---\n"
+    "KAL WINS\n"
+)
+
+
+def _want(path: Path):
+    # what a fresh read of the file gives, minus the text (a follower doesnt keep it)
+    return replace(analyze_file(path, ROSTER), text="")
+
+
+def _write(path: Path, data: bytes) -> None:
+    with open(path, "ab") as fh:
+        fh.write(data)
+
+
+def _bump(path: Path, seconds: int) -> None:
+    # so a same-size rewrite is seen even on a filesystem with coarse timestamps
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 1_000_000_000))
+
+
+def test_half_written_lines_wait(tmp_path: Path) -> None:
+    path = tmp_path / "live-2026-05-01.txt"
+    path.write_bytes(b"kal and b")
+    follower = FileFollower(path, ROSTER)
+    assert follower.poll() is None
+    assert follower.stats.mentions["kal"] == 0
+    _write(path, b"ob\r")
+    # a \r could still be the start of \r\n
+    assert follower.poll() is None
+    _write(path, b"\n")
+    delta = follower.poll()
+    assert delta.mentions == {"kal": 1, "bob": 1}
+    assert follower.stats == _want(path)
+    assert follower.poll() is None
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_random_writes_add_up_to_one_read(tmp_path: Path, seed: int) -> None:
+    rng = random.Random(seed)
+    path = tmp_path / "live-2026-05-01.txt"
+    path.write_bytes(b"")
+    follower = FileFollower(path, ROSTER)
+    data = (SESSION * 6).encode("utf-8")
+    pos = 0
+    while pos < len(data):
+        step = rng.randint(1, 40)
+        _write(path, data[pos:pos + step])
+        pos = pos + step
+        follower.poll()
+    assert follower.stats == _want(path)
+    assert follower.resyncs == 0
+
+
+def test_truncated_file_starts_over(tmp_path: Path) -> None:
+    path = tmp_path / "live-2026-05-01.txt"
+    path.write_text(SESSION * 3, encoding="utf-8")
+    follower = FileFollower(path, ROSTER)
+    follower.poll()
+    path.write_text("bob again\n", encoding="utf-8")
+    follower.poll()
+    assert follower.resynced
+    assert follower.resyncs == 1
+    assert follower.stats == _want(path)
+
+
+def test_replaced_file_starts_over(tmp_path: Path) -> None:
+    path = tmp_path / "live-2026-05-01.txt"
+    path.write_text(SESSION, encoding="utf-8")
+    follower = FileFollower(path, ROSTER)
+    follower.poll()
+    # an editor saving a new copy over the old one: new inode, longer file
+    swap = tmp_path / "swap.tmp"
+    swap.write_text("zephyr\n" + SESSION * 2, encoding="utf-8")
+    os.replace(swap, path)
+    follower.poll()
+    assert follower.resynced
+    assert follower.stats == _want(path)
+
+
+def test_rewritten_start_is_noticed(tmp_path: Path) -> None:
+    path = tmp_path / "live-2026-05-01.txt"
+    path.write_text(SESSION, encoding="utf-8")
+    follower = FileFollower(path, ROSTER)
+    follower.poll()
+    # same inode, same size and longer, but the first bytes changed
+    with open(path, "r+b") as fh:
+        fh.write(b"bob")
+        fh.seek(0, os.SEEK_END)
+        fh.write(b"kal\n")
+    _bump(path, 5)
+    follower.poll()
+    assert follower.resynced
+    assert follower.stats == _want(path)
+
+
+def test_fetch_runs_ahead_of_feed(tmp_path: Path) -> None:
+    # the app fetches on a worker and feeds on the ui thread, a second fetch can come before the first feed
+    path = tmp_path / "live-2026-05-01.txt"
+    path.write_text("kal\n", encoding="utf-8")
+    follower = FileFollower(path, ROSTER)
+    first = follower.fetch()
+    _write(path, b"bob\n")
+    second = follower.fetch()
+    follower.feed(first)
+    follower.feed(second)
+    assert follower.stats == _want(path)
+
+
+def _folder(tmp_path: Path) -> Path:
+    folder = tmp_path / "logs"
+    folder.mkdir()
+    (folder / "a-2026-04-01.txt").write_text("kal and bob\n", encoding="utf-8")
+    (folder / "z-2026-06-01.txt").write_text("zephyr and bob\n", encoding="utf-8")
+    (folder / "live-2026-05-01.txt").write_text(SESSION, encoding="utf-8")
+    return folder
+
+
+def _fresh(folder: Path):
+    # a rescan of the folder, the followed log without its text
+    stats = compute_stats(folder, characters=ROSTER, backend="python")
+    perfiles = []
+    for filestats in stats.per_file:
+        if filestats.filename.startswith("live"):
+            filestats = replace(filestats, text="")
+        perfiles.append(filestats)
+    return build_dashboard(perfiles, ROSTER, "off")
+
+
+def test_live_board_matches_a_rescan(tmp_path: Path) -> None:
+    folder = _folder(tmp_path)
+    path = folder / "live-2026-05-01.txt"
+    start = compute_stats(folder, characters=ROSTER, backend="python")
+    board = LiveBoard(start, FileFollower(path, ROSTER))
+    assert diff_stats(_fresh(folder), board.stats) == []
+    # build the tables so they get patched rather than refolded
+    old = board.stats
+    for table in ("cooc", "keywords", "neighbors", "trend", "timeline"):
+        getattr(old, table)
+    oldcooc = dict(old.cooc)
+    oldtotals = dict(old.totals)
+
+    assert not board.poll()
+    _write(path, b"bob and kal, again\nzephyr")
+    assert board.poll()
+    # the half-written line isnt in yet
+    assert board.stats.totals == {"kal": oldtotals["kal"] + 1, "bob": oldtotals["bob"] + 1, "zeph": oldtotals["zeph"]}
+    _write(path, b" and kal\n")
+    assert board.poll()
+    assert diff_stats(_fresh(folder), board.stats) == []
+    # whoever still holds the old board (the screen, mid-render) keeps its numbers
+    assert old.cooc == oldcooc
+    assert old.totals == oldtotals
+
+    path.write_text("kal\n", encoding="utf-8")
+    assert board.poll()
+    assert diff_stats(_fresh(folder), board.stats) == []
+
+
+def test_newest_log(tmp_path: Path) -> None:
+    folder = _folder(tmp_path)
+    for i, name in enumerate(("z-2026-06-01.txt", "a-2026-04-01.txt", "live-2026-05-01.txt")):
+        os.utime(folder / name, (1_000_000 + i, 1_000_000 + i))
+    assert newest_log(folder) == folder / "live-2026-05-01.txt"
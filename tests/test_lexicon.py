@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import random
+from typing import Dict, List, Tuple
+
+import pytest
+
+from lexicon import NEGATION_REACH, Lexicon, phrase_tokens
+
+MOOD = Lexicon(
+    {"happy": 1, "glad": 1, "sad": -1, "truly very happy": 4, "not safe": -2, "well done": 2},
+    negators=frozenset({"not", "never"}),
+)
+
+
+@pytest.mark.parametrize("line, want", [
+    ("happy", (1, 0)),
+    ("not happy", (0, 1)),
+    ("never sad", (1, 0)),
+    # the negator reaches NEGATION_REACH words ahead
+    ("not very very happy", (0, 1)),
+    ("not very very very happy", (1, 0)),
+    # a phrase with the negator in it is scored as itself, not flipped
+    ("not safe", (0, 2)),
+    ("never not safe", (2, 0)),
+    # the longer phrase wins over the word inside it, and gets flipped whole
+    ("truly very happy", (4, 0)),
+    ("not truly very happy", (0, 4)),
+    ("not happy but glad", (0, 2)),
+    ("not happy and then glad", (1, 1)),
+])
+def test_sentiment(line: str, want: Tuple[int, int]) -> None:
+    assert MOOD.sentiment(list(phrase_tokens(line))) == want
+
+
+def test_reach_matches_the_constant() -> None:
+    filler = ["very"] * (NEGATION_REACH - 1)
+    assert MOOD.sentiment(["not"] + filler + ["happy"]) == (0, 1)
+    assert MOOD.sentiment(["not"] + filler + ["very", "happy"]) == (1, 0)
+
+
+def test_total_ignores_negators() -> None:
+    combat = Lexicon({"blade": 1, "critical hit": 3, "hit points": 2})
+    assert combat.total(["not", "blade"]) == 1
+    assert combat.total(["critical", "hit"]) == 3
+    # overlapping phrases: the one ending last is taken, the other one loses its shared word
+    assert combat.matches(["critical", "hit", "points"]) == [(1, 3, 2)]
+
+
+def _slow_matches(entries: Dict[Tuple[str, ...], int], tokens: List[str]) -> List[Tuple[int, int, int]]:
+    # every phrase checked at every spot, same longest-wins rule right to left
+    longest = max(len(words) for words in entries)
+    out = []
+    limit = len(tokens)
+    for end in range(len(tokens), 0, -1):
+        if end > limit:
+            continue
+        for length in range(min(longest, end), 0, -1):
+            words = tuple(tokens[end - length:end])
+            if words in entries:
+                out.append((end - length, end, entries[words]))
+                limit = end - length
+                break
+    out.reverse()
+    return out
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_agree_with_a_slow_scan(seed: int) -> None:
+    rng = random.Random(seed)
+    vocab = ["aaa", "bbb", "ccc", "ddd", "eee"]
+    entries: Dict[Tuple[str, ...], int] = {}
+    for _ in range(12):
+        words = tuple(rng.choice(vocab) for _ in range(rng.randint(1, 4)))
+        entries[words] = rng.randint(-3, 3) or 1
+    lexicon = Lexicon({" ".join(words): weight for words, weight in entries.items()})
+    for _ in range(200):
+        tokens = [rng.choice(vocab + ["zzz"]) for _ in range(rng.randint(0, 12))]
+        assert lexicon.matches(tokens) == _slow_matches(entries, tokens)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import gzip
+import json
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from backends import compute_stats
+from config import DEFAULT_WORDS, Character
+from crosscheck import diff_stats
+from discovery import list_log_files
+from partials import compute_partial, merge_partials, partial_to_dashboard, read_partial, write_partial
+
+ROSTER = [
+    Character("kal", ("kal", "kally")),
+    Character("bob", ("bob", "robert")),
+    Character("mrx", ("mr. x",)),
+]
+
+LOGS = {
+    "s1-2026-01-03.txt": "kal and bob walk in\nmr. x waits\n\n\nbob draws a blade!\n",
+    "s2-2026-01-10.txt": "kally laughs\n---\nrobert and kal fight\nmr. x and bob talk\n",
+    "s3-2026-01-10.txt": "nobody here\n",
+    "s4-2026-02-01.txt": "kal kal kal\nbob? robert?\n\n\nmr. x kally bob\n",
+    "s5-2026-02-07.txt": "",
+    "s6-2026-03-01.txt": "the end, kal and mr. x\n",
+}
+
+
+@pytest.fixture
+def logs(tmp_path: Path) -> Path:
+    folder = tmp_path / "logs"
+    folder.mkdir()
+    for name, text in LOGS.items():
+        (folder / name).write_text(text, encoding="utf-8")
+    return folder
+
+
+def _partial(folder: Path, files, path: Path, characters=ROSTER, wordlists=DEFAULT_WORDS):
+    write_partial(compute_partial(folder, files, characters, wordlists), path)
+    return read_partial(path)
+
+
+def test_merge_matches_one_big_run(logs: Path, tmp_path: Path) -> None:
+    files = list_log_files(logs)
+    want = compute_stats(logs, files, ROSTER, backend="python")
+    # overlapping shards, written out and read back in, merged in both orders
+    shards = [files[:3], files[2:5], files[5:]]
+    partials = []
+    for i, shard in enumerate(shards):
+        partials.append(_partial(logs, shard, tmp_path / f"part{i}.json.gz"))
+    for order in (partials, partials[::-1]):
+        assert diff_stats(want, partial_to_dashboard(merge_partials(order))) == []
+
+
+def test_merge_refuses_different_rosters(logs: Path, tmp_path: Path) -> None:
+    files = list_log_files(logs)
+    one = _partial(logs, files[:2], tmp_path / "one.json.gz")
+    other = _partial(logs, files[2:4], tmp_path / "other.json.gz", ROSTER[:2])
+    with pytest.raises(ValueError):
+        merge_partials([one, other])
+
+
+def test_merge_refuses_different_word_lists(logs: Path, tmp_path: Path) -> None:
+    files = list_log_files(logs)
+    one = _partial(logs, files[:2], tmp_path / "one.json.gz")
+    other = _partial(logs, files[2:4], tmp_path / "other.json.gz", wordlists=replace(DEFAULT_WORDS, stop=frozenset({"walk"})))
+    with pytest.raises(ValueError):
+        merge_partials([one, other])
+
+
+def test_merge_refuses_conflicting_copies(logs: Path, tmp_path: Path) -> None:
+    files = list_log_files(logs)
+    before = _partial(logs, files[:1], tmp_path / "before.json.gz")
+    # same log, changed between the two runs
+    with open(files[0], "a", encoding="utf-8") as fh:
+        fh.write("kal is back\n")
+    after = _partial(logs, files[:1], tmp_path / "after.json.gz")
+    with pytest.raises(ValueError):
+        merge_partials([before, after])
+
+
+def test_old_partials_get_refused(logs: Path, tmp_path: Path) -> None:
+    path = tmp_path / "part.json.gz"
+    _partial(logs, None, path)
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        payload = json.load(fh)
+    payload["version"] = payload["version"] - 1
+    with gzip.open(path, "wt", encoding="utf-8") as fh:
+        json.dump(payload, fh)
+    with pytest.raises(ValueError):
+        read_partial(path)
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import math
+import random
+import threading
+from pathlib import Path
+
+import pytest
+
+from backends import compute_stats
+from config import Character
+from crosscheck import diff_stats
+from discovery import list_log_files
+from models import analyze_file
+from progressive import FIRST_BATCH, ProgressiveScan, estimate_stats, ratio_margin
+
+ROSTER = [Character("kal", ("kal",)), Character("bob", ("bob",))]
+
+
+def test_ratio_margin_edges() -> None:
+    assert ratio_margin([1.0, 3.0], [1.0, 1.0], 4) == pytest.approx(1.96 * math.sqrt(0.5))
+    # everything sampled = exact
+    assert ratio_margin([1.0, 3.0], [1.0, 1.0], 2) == 0.0
+    # one item or nothing to divide by says nothing
+    assert ratio_margin([5.0], [1.0], 10) == math.inf
+    assert ratio_margin([0.0, 0.0], [0.0, 0.0], 10) == math.inf
+    # a perfectly steady ratio is known exactly from any two
+    assert ratio_margin([2.0, 4.0, 6.0], [1.0, 2.0, 3.0], 50) == 0.0
+
+
+def test_margin_covers_the_truth_about_95_percent() -> None:
+    rng = random.Random(3)
+    sizes = [rng.randint(100, 5000) for _ in range(400)]
+    counts = [size * rng.uniform(0.001, 0.02) for size in sizes]
+    truth = sum(counts) / sum(sizes)
+    hits = 0
+    for _ in range(300):
+        picked = rng.sample(range(len(sizes)), 40)
+        ys = [counts[i] for i in picked]
+        xs = [sizes[i] for i in picked]
+        if abs(sum(ys) / sum(xs) - truth) <= ratio_margin(ys, xs, len(sizes)):
+            hits = hits + 1
+    assert 0.88 <= hits / 300 <= 0.99
+
+
+def _logs(folder: Path, count: int) -> None:
+    folder.mkdir()
+    for i in range(count):
+        text = "kal and bob\n" * (i % 3 + 1) + "bob alone\n" * (i % 2) + "---\nkal walks\n"
+        (folder / f"log{i:02d}-2026-01-{i % 28 + 1:02d}.txt").write_text(text, encoding="utf-8")
+
+
+def test_estimate_scales_counts_and_margins(tmp_path: Path) -> None:
+    _logs(tmp_path / "logs", 4)
+    sample = [analyze_file(path, ROSTER) for path in list_log_files(tmp_path / "logs")[:2]]
+    sizes = [filestats.chars for filestats in sample]
+    stats = estimate_stats(sample, sizes, 8, sum(sizes) * 4, ROSTER)
+    exact = compute_stats(tmp_path / "logs", list_log_files(tmp_path / "logs")[:2], ROSTER, backend="python")
+    assert stats.totals == {name: count * 4 for name, count in exact.totals.items()}
+    assert stats.cooc == {key: count * 4 for key, count in exact.cooc.items()}
+    assert stats.keywords["kal"]["walks"] == exact.keywords["kal"]["walks"] * 4
+    assert (stats.estimate.files_done, stats.estimate.files_total) == (2, 8)
+    assert stats.estimate.fraction == 0.25
+    assert all(0 < margin < math.inf for margin in stats.estimate.margins.values())
+    # the whole archive = no margins left
+    full = estimate_stats(sample, sizes, 2, sum(sizes), ROSTER)
+    assert full.estimate.margins == {"kal": 0.0, "bob": 0.0}
+    assert full.estimate.pairs_margin == 0.0
+
+
+@pytest.mark.parametrize("backend", ["python", "parallel"])
+def test_scan_ends_on_the_exact_board(tmp_path: Path, backend: str) -> None:
+    folder = tmp_path / "logs"
+    _logs(folder, 30)
+    boards = []
+    done = threading.Event()
+
+    def on_update(stats) -> None:
+        boards.append(stats)
+        if stats is None or stats.estimate is None:
+            done.set()
+
+    scan = ProgressiveScan(list_log_files(folder), ROSTER, backend=backend)
+    scan.start(on_update)
+    assert done.wait(60)
+    assert scan.error == ""
+    # 8 files, then 8 + 16, then the last 6 and the exact board
+    assert [stats.estimate.files_done for stats in boards[:-1]] == [FIRST_BATCH, FIRST_BATCH * 3]
+    assert boards[-1].estimate is None
+    assert diff_stats(compute_stats(folder, characters=ROSTER, backend="python"), boards[-1]) == []
+
+
+def test_stopped_scan_sends_nothing_more(tmp_path: Path) -> None:
+    folder = tmp_path / "logs"
+    _logs(folder, 30)
+    boards = []
+    first = threading.Event()
+
+    def on_update(stats) -> None:
+        boards.append(stats)
+        scan.stop()
+        first.set()
+
+    scan = ProgressiveScan(list_log_files(folder), ROSTER, backend="python")
+    scan.start(on_update)
+    assert first.wait(60)
+    scan._thread.join(60)
+    assert len(boards) == 1
+    assert not scan.finished
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import random
+import re
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytest
+
+from config import DEFAULT_WORDS, Character
+from models import analyze_file
+from roster import FUZZY_LENGTHS, FuzzyIndex, Roster, dedupe_characters, edit_distance
+
+ROSTER = [
+    Character("zeph", ("zephyr",)),
+    Character("ann", ("annabelle", "ann")),
+    Character("kal", ("kal", "Kal-El", "the red knight")),
+    Character("mara", ("marauder",)),
+    Character("mari", ("mariuder",)),
+]
+
+
+def _slow_distance(a: str, b: str) -> int:
+    # plain optimal string alignment, no cutoff
+    d = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a) + 1):
+        d[i][0] = i
+    for j in range(len(b) + 1):
+        d[0][j] = j
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[len(a)][len(b)]
+
+
+def _allowed(length: int, max_edits: int) -> int:
+    allowed = 0
+    for threshold in FUZZY_LENGTHS:
+        if length >= threshold:
+            allowed = allowed + 1
+    return min(allowed, max_edits)
+
+
+def _slow_lookup(aliases: Dict[str, List[int]], max_edits: int, word: str) -> Optional[List[int]]:
+    # every alias compared with the word, closest wins, a tie between different characters is no match
+    best = max_edits + 1
+    found = None
+    tied = False
+    for alias, charids in aliases.items():
+        distance = _slow_distance(word, alias)
+        if distance > _allowed(len(alias), max_edits):
+            continue
+        if distance < best:
+            best = distance
+            found = charids
+            tied = False
+        elif distance == best and charids != found:
+            tied = True
+    return None if tied else found
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_edit_distance_agrees_with_a_slow_one(seed: int) -> None:
+    rng = random.Random(seed)
+    for _ in range(500):
+        a = "".join(rng.choice("abc") for _ in range(rng.randint(0, 7)))
+        b = "".join(rng.choice("abc") for _ in range(rng.randint(0, 7)))
+        limit = rng.randint(0, 3)
+        assert edit_distance(a, b, limit) == min(_slow_distance(a, b), limit + 1)
+
+
+def _typo(rng: random.Random, word: str) -> str:
+    i = rng.randrange(len(word))
+    kind = rng.randrange(4)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + rng.choice("aeirxz") + word[i:]
+    if kind == 2:
+        return word[:i] + rng.choice("aeirxz") + word[i + 1:]
+    if i + 1 < len(word):
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word
+
+
+@pytest.mark.parametrize("max_edits", [1, 2])
+def test_lookup_agrees_with_brute_force(max_edits: int) -> None:
+    rng = random.Random(max_edits)
+    aliases = {"zephyr": [0], "annabelle": [1], "kal": [2], "marauder": [3], "mariuder": [4], "thunderclap": [0]}
+    index = FuzzyIndex(aliases, max_edits)
+    for _ in range(2000):
+        word = rng.choice(list(aliases))
+        for _ in range(rng.randint(1, 3)):
+            if word:
+                word = _typo(rng, word)
+        if not word or word in aliases:
+            continue
+        assert index.lookup(word) == _slow_lookup(aliases, max_edits, word), word
+
+
+def test_lookup_rules() -> None:
+    index = FuzzyIndex({"zephyr": [0], "marauder": [3], "mariuder": [4], "kal": [2]}, 2, frozenset({"zephyrs"}))
+    assert index.lookup("zephry") == [0]
+    # one letter off both of them
+    assert index.lookup("marbuder") is None
+    assert index.lookup("marauders") == [3]
+    # the config says this one is a real word
+    assert index.lookup("zephyrs") is None
+    # short names dont forgive anything, numbers are never names
+    assert index.lookup("kat") is None
+    assert FuzzyIndex({"12345": [0]}, 1).lookup("12346") is None
+    # two slips only from the second length up
+    assert index.lookup("zepyhrr") is None
+    assert FuzzyIndex({"annabelle": [1]}, 2).lookup("anabele") == [1]
+    assert FuzzyIndex({"annabelle": [1]}, 1).lookup("anabele") is None
+
+
+def _regex_counts(characters: List[Character], line: str) -> Dict[int, int]:
+    counts: Dict[int, int] = {}
+    for charid, character in enumerate(characters):
+        for alias in character.aliases:
+            found = len(re.findall(rf"\b{re.escape(alias)}\b", line, re.IGNORECASE))
+            if found:
+                counts[charid] = counts.get(charid, 0) + found
+    return counts
+
+
+@pytest.mark.parametrize("line", [
+    "Kal and ann, and ANNABELLE",
+    "kal-el meets the red knight, then kal",
+    "the red  knight",
+    "zephyr's marauder",
+    "nobody",
+    "",
+])
+def test_line_counts_match_one_regex_per_alias(line: str) -> None:
+    roster = Roster(ROSTER)
+    assert roster.line_counts(line) == _regex_counts(roster.characters, line)
+    hits, words = roster.line_hits(line)
+    assert sum(len(charids) for charids in hits.values()) == sum(roster.line_counts(line).values())
+    assert words == len(re.findall(r"\w+", line))
+
+
+def test_variants_are_tallied() -> None:
+    roster = Roster(ROSTER, fuzzy=2)
+    variants: Dict[int, Dict[str, int]] = {}
+    counts = roster.line_counts("zephry and zehpyr and zephry, also zephyr and annabele", variants)
+    assert counts == {0: 4, 1: 1}
+    assert variants == {0: {"zephry": 2, "zehpyr": 1}, 1: {"annabele": 1}}
+    # line_hits finds the same typos
+    hits, _ = roster.line_hits("zephry and annabele")
+    assert hits == {0: [0], 2: [1]}
+
+
+def test_fuzzy_through_a_log(tmp_path: Path) -> None:
+    path = tmp_path / "a-2026-01-03.txt"
+    path.write_text("zephry waits\nzephyr and zehpyr\n", encoding="utf-8")
+    plain = analyze_file(path, ROSTER)
+    fuzzy = analyze_file(path, ROSTER, wordlists=replace(DEFAULT_WORDS, fuzzy=1))
+    assert plain.mentions["zeph"] == 1
+    assert fuzzy.mentions["zeph"] == 3
+    assert fuzzy.variants == {"zeph": {"zephry": 1, "zehpyr": 1}}
+
+
+def test_dedupe_characters() -> None:
+    merged = dedupe_characters([
+        Character("kal", ("kal", "Kal-El")),
+        Character("bob", ("bob",)),
+        Character("kal", ("KAL", "the red knight")),
+    ])
+    assert merged == [Character("kal", ("kal", "Kal-El", "the red knight")), Character("bob", ("bob",))]
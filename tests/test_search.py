@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from backends import compute_stats
+from config import Character
+from search import PostingsView, Query, parse_query, run_query, window_texts
+
+NAMES = ["kal", "zephyr", "bob"]
+STOP = frozenset({"the", "was"})
+
+
+def test_names_and_keywords() -> None:
+    query = parse_query("Zephyr AND kal mentioning blade", NAMES, STOP)
+    assert query == Query(required=["@zephyr", "@kal", "blade"])
+
+
+def test_not_excludes_the_next_word_only() -> None:
+    query = parse_query("kal not bob blood", NAMES, STOP)
+    assert query.required == ["@kal", "blood"]
+    assert query.excluded == ["@bob"]
+
+
+def test_after_a_marker_names_are_keywords() -> None:
+    # "lines mentioning kal" = the word kal, not every line the character kal is on
+    query = parse_query("zephyr lines mentioning kal", NAMES, STOP)
+    assert query.required == ["@zephyr", "kal"]
+
+
+def test_words_the_index_skips_get_reported() -> None:
+    query = parse_query("kal & the ox with not was", NAMES, STOP)
+    assert query.required == ["@kal"]
+    assert query.ignored == ["the", "ox", "was"]
+    # a dropped word takes a pending "not" with it
+    assert query.excluded == []
+
+
+def test_run_query_newest_first(tmp_path: Path) -> None:
+    (tmp_path / "a-2026-01-01.txt").write_text("kal draws a blade\nbob sleeps\nkal and bob, blade out\n", encoding="utf-8")
+    (tmp_path / "b-2026-02-01.txt").write_text("nothing\nkal sharpens the blade\n", encoding="utf-8")
+    roster = [Character("kal", ("kal",)), Character("bob", ("bob",))]
+    stats = compute_stats(tmp_path, characters=roster, backend="python")
+
+    found = run_query(stats, parse_query("kal blade", ["kal", "bob"], STOP))
+    assert found.total == 3
+    assert found.hits == [(1, 1), (0, 2), (0, 0)]
+    assert window_texts(stats, found.hits) == ["kal sharpens the blade", "kal and bob, blade out", "kal draws a blade"]
+
+    alone = run_query(stats, parse_query("kal not bob", ["kal", "bob"], STOP), limit=1)
+    assert (alone.total, alone.hits) == (2, [(1, 1)])
+
+    view = PostingsView(stats, "@kal")
+    assert len(view) == 3
+    assert view.window(1, 5) == [(0, 2), (0, 0)]
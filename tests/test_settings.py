@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import json
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from backends import compute_stats
+from config import DEFAULT_WORDS, Character, CoocWindow
+from crosscheck import diff_stats
+from models import build_dashboard
+from settings import DEFAULT_SETTINGS, LiveSettings, Settings, apply_settings, changed_parts, load_settings
+
+ROSTER = [Character("kal", ("kal",)), Character("bob", ("bob", "robert"))]
+
+LOGS = {
+    "a-2026-01-03.txt": "kal and bob walk in, happy\nbob struck the wall!\n\n\nkal is not safe here\n",
+    "b-2026-01-20.txt": "robert attacks kal\n---\nKAL WINS, bob is sad\nthe walk home\n",
+}
+
+
+@pytest.fixture
+def logs(tmp_path: Path) -> Path:
+    folder = tmp_path / "logs"
+    folder.mkdir()
+    for name, text in LOGS.items():
+        (folder / name).write_text(text, encoding="utf-8")
+    return folder
+
+
+def _board(folder: Path, wordlists=DEFAULT_WORDS):
+    stats = compute_stats(folder, characters=ROSTER, wordlists=wordlists, backend="python")
+    # tables built before the patch, so the test sees which of them get kept
+    stats.cooc
+    stats.keywords
+    stats.timeline
+    return stats
+
+
+def test_load_json(tmp_path: Path) -> None:
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({
+        "characters": {"Kal": ["kal", "kally"], "bob": "robert", "zed": []},
+        "stopwords": ["The", "walk"],
+        "cooc_window": "40 tokens",
+        "mood_phrases": {"Well Done": 2},
+    }), encoding="utf-8")
+    settings = load_settings(path)
+    assert settings.characters == (Character("kal", ("kal", "kally")), Character("bob", ("robert",)), Character("zed", ("zed",)))
+    assert settings.words.stop == frozenset({"the", "walk"})
+    assert settings.words.window == CoocWindow("token", 40)
+    assert settings.words.mood_phrases == (("well done", 2),)
+    # whatever the file leaves out stays as config.py has it
+    assert settings.words.pos == DEFAULT_WORDS.pos
+
+
+@pytest.mark.parametrize("text", ["{oops", "[1, 2]", '{"characters": ["kal"]}', '{"cooc_window": "3 miles"}', '{"stopwords": "the"}'])
+def test_bad_files_are_value_errors(tmp_path: Path, text: str) -> None:
+    path = tmp_path / "config.json"
+    path.write_text(text, encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_settings(path)
+
+
+def test_changed_parts() -> None:
+    words = DEFAULT_WORDS
+
+    def parts(**changes):
+        return changed_parts(DEFAULT_SETTINGS, replace(DEFAULT_SETTINGS, words=replace(words, **changes)))
+
+    assert parts(stop=words.stop | {"walk"}) == {"keywords"}
+    assert parts(negators=frozenset()) == {"sentiment"}
+    assert parts(combat_phrases=()) == {"tension"}
+    assert parts(window=CoocWindow("line", 3)) == {"cooc"}
+    assert parts(fuzzy=1) == {"aliases"}
+    assert changed_parts(DEFAULT_SETTINGS, Settings(characters=tuple(ROSTER), words=words)) == {"roster"}
+
+
+@pytest.mark.parametrize("changes", [
+    {"stop": DEFAULT_WORDS.stop | {"walk", "wall"}},
+    {"neg": DEFAULT_WORDS.neg | {"walk"}, "negators": frozenset()},
+    {"combat": DEFAULT_WORDS.combat | {"wall"}, "combat_phrases": (("walk home", 5),)},
+])
+def test_patch_matches_a_rescan(logs: Path, changes) -> None:
+    new = replace(DEFAULT_WORDS, **changes)
+    before = _board(logs)
+    parts = changed_parts(DEFAULT_SETTINGS, replace(DEFAULT_SETTINGS, words=new))
+    patched = apply_settings(before, parts, new, ROSTER)
+    assert diff_stats(_board(logs, new), patched) == []
+    # the mentions dont depend on the word lists, their tables are the old board's
+    assert patched.cooc is before.cooc
+    assert patched.totals is before.totals
+
+
+def test_logs_without_text_get_read_again(logs: Path) -> None:
+    new = replace(DEFAULT_WORDS, stop=DEFAULT_WORDS.stop | {"walk"})
+    want = _board(logs, new)
+    # what a board from the cache looks like
+    before = build_dashboard([replace(filestats, text="") for filestats in _board(logs).per_file], ROSTER)
+    reread = []
+    patched = apply_settings(before, {"keywords"}, new, ROSTER, reread)
+    assert reread == [filestats.source for filestats in want.per_file]
+    assert patched.keywords == want.keywords
+    # and if one of them changed since, only a rescan will do
+    with open(logs / "a-2026-01-03.txt", "a", encoding="utf-8") as fh:
+        fh.write("more\n")
+    assert apply_settings(before, {"keywords"}, new, ROSTER) is None
+
+
+@pytest.mark.parametrize("part", ["roster", "aliases", "cooc"])
+def test_mention_changes_need_a_rescan(logs: Path, part: str) -> None:
+    assert apply_settings(_board(logs), {part, "keywords"}, DEFAULT_WORDS, ROSTER) is None
+
+
+def test_live_settings(tmp_path: Path) -> None:
+    path = tmp_path / "config.json"
+    live = LiveSettings(path)
+    assert live.current == DEFAULT_SETTINGS
+    assert live.poll() is None
+
+    path.write_text(json.dumps({"negators": ["nope"]}), encoding="utf-8")
+    assert live.poll() == DEFAULT_SETTINGS
+    assert live.current.words.negators == frozenset({"nope"})
+    # a half-saved file keeps the last good settings
+    path.write_text('{"negators": [', encoding="utf-8")
+    assert live.poll() is None
+    assert live.error
+    assert live.current.words.negators == frozenset({"nope"})
+    # the file going away = back to config.py
+    path.unlink()
+    assert live.poll().words.negators == frozenset({"nope"})
+    assert live.current == DEFAULT_SETTINGS
+    assert live.error == ""
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from backends import compute_stats
+from config import Character
+from search import parse_query, run_query, window_texts
+from snapshot import export_snapshot, load_snapshot
+
+ROSTER = [
+    Character("kal", ("kal", "kally")),
+    Character("bob", ("bob",)),
+    Character("zeph", ("zephyr",)),
+]
+
+LOGS = {
+    "a-2026-01-03.txt": "kal and bob walk in\nzephyr waits by the door\n\n\nbob and zephyr fight!\n",
+    "b-2026-01-20.txt": "kally laughs\n---\nbob, kal and zephyr\nquiet line\n",
+    "c-2026-02-02.txt": "nobody here at all\n",
+}
+
+
+@pytest.fixture
+def logs(tmp_path: Path) -> Path:
+    folder = tmp_path / "logs"
+    folder.mkdir()
+    for name, text in LOGS.items():
+        (folder / name).write_text(text, encoding="utf-8")
+    return folder
+
+
+def _board(folder: Path):
+    return compute_stats(folder, characters=ROSTER, backend="python")
+
+
+def test_round_trip(logs: Path, tmp_path: Path) -> None:
+    stats = _board(logs)
+    path = tmp_path / "board.iis"
+    export_snapshot(stats, path)
+    loaded = load_snapshot(path)
+
+    assert loaded.totals == stats.totals
+    for table in ("cooc", "trios", "squads", "keywords", "neighbors", "trend"):
+        # same contents in the same order, ties in the panels get broken by it
+        assert getattr(loaded, table) == getattr(stats, table), table
+        assert list(getattr(loaded, table)) == list(getattr(stats, table)), table
+    assert loaded.timeline.entropies == stats.timeline.entropies
+    assert loaded.timeline.session_dates == stats.timeline.session_dates
+    assert len(loaded.per_file) == len(stats.per_file)
+    for got, want in zip(loaded.per_file, stats.per_file):
+        assert (got.filename, got.date, got.words, got.mentions) == (want.filename, want.date, want.words, want.mentions)
+        assert list(got.session_tensions) == list(want.session_tensions)
+        assert list(got.session_mentions) == list(want.session_mentions)
+        assert set(got.postings) == set(want.postings)
+        for term in want.postings:
+            assert list(got.postings[term]) == list(want.postings[term])
+
+
+def test_lines_come_from_the_snapshot(logs: Path, tmp_path: Path) -> None:
+    stats = _board(logs)
+    path = tmp_path / "board.iis"
+    export_snapshot(stats, path)
+    # without the logs, only the lines that mention someone are in there
+    shutil.rmtree(logs)
+    loaded = load_snapshot(path)
+    found = run_query(loaded, parse_query("zephyr", list(stats.totals)), limit=20)
+    assert found.hits == run_query(stats, parse_query("zephyr", list(stats.totals)), limit=20).hits
+    assert window_texts(loaded, found.hits) == ["bob, kal and zephyr", "bob and zephyr fight!", "zephyr waits by the door"]
+    plain = run_query(loaded, parse_query("quiet", list(stats.totals)), limit=20)
+    assert window_texts(loaded, plain.hits) == [""]
+
+
+def test_round_trip_keeps_duplicates(logs: Path, tmp_path: Path) -> None:
+    shutil.copy(logs / "a-2026-01-03.txt", logs / "a-2026-01-03 (1).txt")
+    stats = _board(logs)
+    assert len(stats.duplicates) == 1
+    path = tmp_path / "board.iis"
+    export_snapshot(stats, path)
+    assert load_snapshot(path).duplicates == stats.duplicates
+
+
+def test_not_a_snapshot(tmp_path: Path) -> None:
+    path = tmp_path / "board.iis"
+    path.write_bytes(b"definitely not a snapshot")
+    with pytest.raises(ValueError):
+        load_snapshot(path)
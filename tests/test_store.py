@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import time
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from backends import compute_stats
+from config import DEFAULT_WORDS, Character
+from store import (
+    StoreSync,
+    files_mentioning,
+    open_store,
+    store_ties,
+    store_top_pairs,
+    store_totals,
+    sync_store,
+    tension_by_month,
+)
+
+ROSTER = [
+    Character("kal", ("kal",)),
+    Character("bob", ("bob", "robert")),
+    Character("zeph", ("zephyr",)),
+]
+
+LOGS = {
+    "a-2026-01-03.txt": "kal and bob walk in\nzephyr waits\n\n\nbob and zephyr fight!\n",
+    "b-2026-01-20.txt": "kal kal bob\n---\nrobert and kal, again\n",
+    "c-2026-02-02.txt": "zephyr alone\nkal and zephyr\n",
+    "d-2026-02-14.txt": "nobody\n",
+}
+
+
+@pytest.fixture
+def logs(tmp_path: Path) -> Path:
+    folder = tmp_path / "logs"
+    folder.mkdir()
+    for name, text in LOGS.items():
+        (folder / name).write_text(text, encoding="utf-8")
+    return folder
+
+
+def _board(folder: Path, characters=ROSTER, wordlists=DEFAULT_WORDS):
+    return compute_stats(folder, characters=characters, wordlists=wordlists, backend="python")
+
+
+def _rows(conn, folder: Path) -> int:
+    return conn.execute("SELECT COUNT(*) FROM files WHERE folder = ?", (str(folder),)).fetchone()[0]
+
+
+def test_sync_only_rewrites_changes(logs: Path, tmp_path: Path) -> None:
+    conn = open_store(tmp_path / "stats.sqlite")
+    stats = _board(logs)
+    assert sync_store(conn, stats, logs) == (4, 0)
+    assert sync_store(conn, stats, logs) == (0, 0)
+
+    # one log gone, one changed
+    (logs / "d-2026-02-14.txt").unlink()
+    with open(logs / "a-2026-01-03.txt", "a", encoding="utf-8") as fh:
+        fh.write("kal and bob again\n")
+    assert sync_store(conn, _board(logs), logs) == (1, 1)
+    # only the keywords differ (another stopword): still a rewrite
+    assert sync_store(conn, _board(logs, wordlists=replace(DEFAULT_WORDS, stop=DEFAULT_WORDS.stop | {"walk"})), logs) == (1, 0)
+
+
+def test_queries_match_the_board(logs: Path, tmp_path: Path) -> None:
+    conn = open_store(tmp_path / "stats.sqlite")
+    stats = _board(logs)
+    sync_store(conn, stats, logs)
+    assert store_totals(conn, logs) == {name: count for name, count in stats.totals.items() if count}
+    assert store_totals(conn, logs) == {"kal": 5, "bob": 4, "zeph": 4}
+    # biggest first, then by name
+    assert store_ties(conn, logs, "kal") == [("bob", 3), ("zeph", 1)]
+    assert store_top_pairs(conn, logs) == [("bob", "kal", 3), ("bob", "zeph", 1), ("kal", "zeph", 1)]
+    assert store_top_pairs(conn, logs, limit=1) == [("bob", "kal", 3)]
+    found = [(filename, count) for _, filename, _, count in files_mentioning(conn, "kal")]
+    assert found == [("b-2026-01-20.txt", 3), ("a-2026-01-03.txt", 1), ("c-2026-02-02.txt", 1)]
+
+
+def test_folders_dont_touch_each_other(logs: Path, tmp_path: Path) -> None:
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / "x-2026-03-01.txt").write_text("kal kal kal\n", encoding="utf-8")
+    conn = open_store(tmp_path / "stats.sqlite")
+    sync_store(conn, _board(logs), logs)
+    sync_store(conn, _board(other), other)
+    assert (_rows(conn, logs), _rows(conn, other)) == (4, 1)
+    assert store_totals(conn, other) == {"kal": 3}
+    assert len(files_mentioning(conn, "kal")) == 4
+    assert len(files_mentioning(conn, "kal", logs)) == 3
+
+    # a different roster for one folder only redoes that folder
+    assert sync_store(conn, _board(other, ROSTER[:2]), other) == (1, 1)
+    assert _rows(conn, logs) == 4
+    sessions = sum(count for _, _, count in tension_by_month(conn, (), logs))
+    assert sessions == _board(logs).timeline.session_count()
+
+
+def test_background_sync(logs: Path, tmp_path: Path) -> None:
+    stats = _board(logs)
+    store = StoreSync(tmp_path / "stats.sqlite", logs)
+    # nothing from the store until it's caught up with this board
+    assert store.totals(stats) is None
+    assert store.ties(stats, "kal") is None
+    store.submit(stats)
+    deadline = time.time() + 10
+    while store.synced is not stats and time.time() < deadline:
+        time.sleep(0.01)
+    assert store.error == ""
+    assert store.totals(stats) == stats.totals
+    assert store.ties(stats, "kal") == [("bob", 3), ("zeph", 1)]
+    assert store.top_pairs(stats, 1) == [("bob", "kal", 3)]
+    # another board (a refresh, say) isnt answered with the old one's rows
+    assert store.totals(_board(logs)) is None
+
+    # close waits for a sync that's still queued
+    newer = _board(logs, ROSTER[:2])
+    store.submit(newer)
+    store.close()
+    assert store.synced is newer
+    conn = open_store(tmp_path / "stats.sqlite")
+    assert store_totals(conn, logs) == {"kal": 5, "bob": 4}
@@ -0,0 +1,220 @@
+# per-session and per-date tables with running sums, so any time window is a couple of lookups
+from __future__ import annotations
+
+import datetime
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from helpers import shannon_entropy
+
+# trend granularities the ui can flip between
+GRANULARITIES = ("date", "week", "month")
+
+
+class Fenwick:
+    # running-sum tree: prefix sums in O(log n) and you can still change or append values
+    def __init__(self, values: Sequence[float] = ()) -> None:
+        self._tree = [0.0] * (len(values) + 1)
+        for i in range(len(values)):
+            self._tree[i + 1] = self._tree[i + 1] + values[i]
+            parent = (i + 1) + ((i + 1) & -(i + 1))
+            if parent <= len(values):
+                self._tree[parent] = self._tree[parent] + self._tree[i + 1]
+
+    def __len__(self) -> int:
+        return len(self._tree) - 1
+
+    def prefix(self, count: int) -> float:
+        # sum of the first count values
+        total = 0.0
+        i = min(count, len(self))
+        while i > 0:
+            total = total + self._tree[i]
+            i = i - (i & -i)
+        return total
+
+    def range_sum(self, start: int, end: int) -> float:
+        if end <= start:
+            return 0.0
+        return self.prefix(end) - self.prefix(start)
+
+    def add(self, index: int, delta: float) -> None:
+        i = index + 1
+        while i <= len(self):
+            self._tree[i] = self._tree[i] + delta
+            i = i + (i & -i)
+
+    def append(self, value: float) -> None:
+        # new node covers (i - lowbit(i), i], the part before it is already in the tree
+        i = len(self._tree)
+        low = i - (i & -i)
+        self._tree.append(value + self.prefix(i - 1) - self.prefix(low))
+
+
+def bucket_of(date: str, granularity: str) -> str:
+    if granularity == "date" or date == "unknown":
+        return date
+    try:
+        day = datetime.date.fromisoformat(date)
+    except ValueError:
+        return date
+    if granularity == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return date[:7]
+
+
+class Timeline:
+    # session axis: every session in archive order (for "last n sessions")
+    # date axis: every date sorted (for date ranges and week/month buckets)
+    def __init__(self, per_file: List, names: List[str]) -> None:
+        self.names = list(names)
+        self.session_dates: List[str] = []
+        self.session_files: List[int] = []
+        self.entropies: List[float] = []
+        pos: List[float] = []
+        neg: List[float] = []
+        tension: List[float] = []
+        for fileidx in range(len(per_file)):
+            filestats = per_file[fileidx]
+            for i in range(filestats.session_count):
+                self.session_dates.append(filestats.date)
+                self.session_files.append(fileidx)
+                pos.append(filestats.session_pos[i])
+                neg.append(filestats.session_neg[i])
+                tension.append(filestats.session_tensions[i])
+                self.entropies.append(shannon_entropy(filestats.session_mentions[i]))
+        self.pos = Fenwick(pos)
+        self.neg = Fenwick(neg)
+        self.tension = Fenwick(tension)
+        self._build_dates(per_file)
+
+    def _build_dates(self, per_file: List) -> None:
+        # same order as DashboardStats.trend ("unknown" sorts after every real date)
+        dates = sorted({filestats.date for filestats in per_file})
+        self.dates = dates
+        dateidx = {date: i for i, date in enumerate(dates)}
+        mentions = {name: [0.0] * len(dates) for name in self.names}
+        sessions = [0.0] * len(dates)
+        pos = [0.0] * len(dates)
+        neg = [0.0] * len(dates)
+        for filestats in per_file:
+            idx = dateidx.get(filestats.date)
+            if idx is None:
+                continue
+            for name in self.names:
+                mentions[name][idx] = mentions[name][idx] + filestats.mentions.get(name, 0)
+            sessions[idx] = sessions[idx] + filestats.session_count
+            pos[idx] = pos[idx] + filestats.pos
+            neg[idx] = neg[idx] + filestats.neg
+        self.date_mentions = {name: Fenwick(values) for name, values in mentions.items()}
+        self.date_sessions = Fenwick(sessions)
+        self.date_pos = Fenwick(pos)
+        self.date_neg = Fenwick(neg)
+
+    def session_count(self) -> int:
+        return len(self.session_dates)
+
+    def clamp_window(self, end: int, size: int) -> Tuple[int, int]:
+        # (start, end) of a session window that actually exists
+        total = self.session_count()
+        end = max(0, min(end, total))
+        size = max(1, size)
+        return (max(0, end - size), end)
+
+    def sentiment(self, start: int, end: int) -> Tuple[int, int]:
+        return (int(self.pos.range_sum(start, end)), int(self.neg.range_sum(start, end)))
+
+    def avg_tension(self, start: int, end: int) -> int:
+        if end <= start:
+            return 0
+        return int(round(self.tension.range_sum(start, end) / (end - start)))
+
+    def entropy_slice(self, start: int, end: int) -> List[float]:
+        return self.entropies[start:end]
+
+    def date_span(self, start: int, end: int) -> Tuple[str, str]:
+        if end <= start:
+            return ("", "")
+        return (self.session_dates[start], self.session_dates[end - 1])
+
+    def date_range(self, first: str, last: str) -> Tuple[int, int]:
+        # inclusive date strings -> date index range
+        return (bisect_left(self.dates, first), bisect_right(self.dates, last))
+
+    def mentions_between(self, name: str, first: str, last: str) -> int:
+        start, end = self.date_range(first, last)
+        tree = self.date_mentions.get(name)
+        if tree is None:
+            return 0
+        return int(tree.range_sum(start, end))
+
+    def buckets(self, granularity: str) -> List[Tuple[str, int, int]]:
+        # (label, first date index, end date index), dates are sorted so each bucket is a contiguous run
+        out: List[Tuple[str, int, int]] = []
+        for i, date in enumerate(self.dates):
+            label = bucket_of(date, granularity)
+            if out and out[-1][0] == label:
+                out[-1] = (label, out[-1][1], i + 1)
+            else:
+                out.append((label, i, i + 1))
+        return out
+
+    def bucket_series(self, name: str, granularity: str, buckets: Optional[List[Tuple[str, int, int]]] = None) -> List[int]:
+        tree = self.date_mentions.get(name)
+        if tree is None:
+            return []
+        if buckets is None:
+            buckets = self.buckets(granularity)
+        return [int(tree.range_sum(start, end)) for _, start, end in buckets]
+
+    def add_session(self, fileidx: int, date: str, pos: int, neg: int, tension: int, mentions: Dict[str, int]) -> None:
+        # for live updates: one more session at the end, no rebuild
+        self.session_dates.append(date)
+        self.session_files.append(fileidx)
+        self.pos.append(pos)
+        self.neg.append(neg)
+        self.tension.append(tension)
+        self.entropies.append(shannon_entropy(mentions))
+
+    def update_session(self, index: int, pos: int, neg: int, tension: int, mentions: Dict[str, int]) -> None:
+        # for live updates: the last session grew
+        self.pos.add(index, pos - self.pos.range_sum(index, index + 1))
+        self.neg.add(index, neg - self.neg.range_sum(index, index + 1))
+        self.tension.add(index, tension - self.tension.range_sum(index, index + 1))
+        self.entropies[index] = shannon_entropy(mentions)
+
+    def add_to_date(self, date: str, mentions: Dict[str, int], sessions: int, pos: int, neg: int) -> bool:
+        # for live updates: a file on a date we already have grew (False = new date, build a fresh timeline instead)
+        idx = bisect_left(self.dates, date)
+        if idx == len(self.dates) or self.dates[idx] != date:
+            return False
+        for name, count in mentions.items():
+            tree = self.date_mentions.get(name)
+            if tree is not None:
+                tree.add(idx, count)
+        self.date_sessions.add(idx, sessions)
+        self.date_pos.add(idx, pos)
+        self.date_neg.add(idx, neg)
+        return True
+
+    def grow_file(self, fileidx: int, filestats, delta) -> bool:
+        # for live updates: a file grew in place (delta from LogParser.feed), patch its sessions and its date
+        # False = cant patch it (new sessions in a file that isnt the last one, or a date we dont have yet)
+        start = bisect_left(self.session_files, fileidx)
+        end = bisect_right(self.session_files, fileidx)
+        added = filestats.session_count - delta.sessions_before
+        if added and end != len(self.session_files):
+            return False
+        if not self.add_to_date(filestats.date, delta.mentions, added, delta.pos, delta.neg):
+            return False
+        for i in range(delta.first_session, filestats.session_count):
+            pos = filestats.session_pos[i]
+            neg = filestats.session_neg[i]
+            tension = filestats.session_tensions[i]
+            mentions = filestats.session_mentions[i]
+            if start + i < end:
+                self.update_session(start + i, pos, neg, tension, mentions)
+            else:
+                self.add_session(fileidx, filestats.date, pos, neg, tension, mentions)
+        return True
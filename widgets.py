@@ -3,9 +3,13 @@ from __future__ import annotations
 
 from typing import List
 
+from textual.events import MouseScrollDown, MouseScrollUp
+from textual.message import Message
 from textual.reactive import reactive
 from textual.widgets import Static
 
+from palette import spans
+
 
 class Ticker(Static):
     # scrolls through a list of strings
@@ -30,7 +34,7 @@ class Ticker(Static):
     def step(self) -> None:
         # move the scroll position and update the display
         if not self.items:
-            self.update("[b][#cbb7ff]news[/] [#e9ecff]no signals yet[/][/b]")
+            self.update(spans(("news", "bold #cbb7ff"), " ", ("no signals yet", "bold #e9ecff")))
             return
 
         # double the text so we can wrap around when scrolling
@@ -42,4 +46,21 @@ class Ticker(Static):
         payloadwidth = max(10, width - 7)
         payload = (text + text)[self.offset : self.offset + payloadwidth]
         payload = payload.replace("\n", " ").replace("\t", " ")[:payloadwidth]
-        self.update(f"[b][#cbb7ff]news[/] [#e9ecff]{payload}[/][/b]")
+        # runs 8 times a second, built straight from cached styles instead of parsing markup each tick
+        self.update(spans(("news", "bold #cbb7ff"), " ", (payload, "bold #e9ecff")))
+
+
+class ArticleView(Static):
+    # the articles panel, the app only ever hands it the rows that fit, this just reports the mouse wheel
+    class Scrolled(Message):
+        def __init__(self, delta: int) -> None:
+            super().__init__()
+            self.delta = delta
+
+    def on_mouse_scroll_down(self, event: MouseScrollDown) -> None:
+        event.stop()
+        self.post_message(self.Scrolled(3))
+
+    def on_mouse_scroll_up(self, event: MouseScrollUp) -> None:
+        event.stop()
+        self.post_message(self.Scrolled(-3))
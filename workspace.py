@@ -0,0 +1,190 @@
+# workspace = a bunch of campaign folders, each with its own character list
+from __future__ import annotations
+
+import json
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from backends import compute_stats
+from cache import FileCache
+from config import CHARACTERS, DEFAULT_WORDS, Character, WordLists
+from models import DashboardStats, build_dashboard
+from roster import dedupe_characters
+
+
+@dataclass
+class Campaign:
+    name: str
+    folder: Path
+    characters: List[Character]
+
+
+def load_workspace(path: Path) -> List[Campaign]:
+    # workspace.json: {"campaigns": [{"name": ..., "folder": ..., "characters": [{"name": ..., "aliases": [...]}]}]}
+    if not path.exists():
+        return []
+    data = json.loads(path.read_text(encoding="utf-8"))
+    campaigns = []
+    for entry in data.get("campaigns", []):
+        characters = []
+        for raw in entry.get("characters", []):
+            aliases = raw.get("aliases") or [raw["name"]]
+            characters.append(Character(raw["name"], tuple(aliases)))
+        if not characters:
+            # no roster written down, fall back to config.py
+            characters = list(CHARACTERS)
+        campaigns.append(Campaign(name=entry["name"], folder=Path(entry["folder"]).expanduser(), characters=characters))
+    return campaigns
+
+
+def save_workspace(path: Path, campaigns: List[Campaign]) -> None:
+    entries = []
+    for campaign in campaigns:
+        roster = []
+        for character in campaign.characters:
+            roster.append({"name": character.name, "aliases": list(character.aliases)})
+        entries.append({"name": campaign.name, "folder": str(campaign.folder), "characters": roster})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"campaigns": entries}, indent=2), encoding="utf-8")
+
+
+def add_campaign(path: Path, name: str, folder: Path, characters: List[Character] = CHARACTERS) -> Campaign:
+    # new campaigns start with a copy of the current roster, edit workspace.json to change it
+    campaigns = load_workspace(path)
+    for campaign in campaigns:
+        if campaign.name == name:
+            raise ValueError(f"campaign already exists: {name}")
+    campaign = Campaign(name=name, folder=folder, characters=dedupe_characters(list(characters)))
+    campaigns.append(campaign)
+    save_workspace(path, campaigns)
+    return campaign
+
+
+def remove_campaign(path: Path, name: str) -> None:
+    campaigns = load_workspace(path)
+    kept = [campaign for campaign in campaigns if campaign.name != name]
+    if len(kept) == len(campaigns):
+        raise ValueError(f"no campaign called {name}")
+    save_workspace(path, kept)
+
+
+def scan_campaign(folder: Path, characters: List[Character], cache_dir: Optional[Path], wordlists: WordLists) -> DashboardStats:
+    # runs inside a worker process, so only plain picklable args
+    cache = FileCache(cache_dir) if cache_dir is not None else None
+    # campaigns already scan side by side in their own processes, each one stays on the single-process backend
+    return compute_stats(folder, characters=characters, cache=cache, wordlists=wordlists, backend="python")
+
+
+class Workspace:
+    # scans every campaign in worker processes and keeps the finished stats around for instant switching
+    def __init__(
+        self,
+        campaigns: List[Campaign],
+        cache_dir: Optional[Path],
+        max_workers: Optional[int] = None,
+        wordlists: WordLists = DEFAULT_WORDS,
+    ) -> None:
+        self.campaigns = campaigns
+        self.cache_dir = cache_dir
+        # word lists are shared by every campaign (rosters are per campaign)
+        self.wordlists = wordlists
+        self.stats: Dict[str, DashboardStats] = {}
+        self.errors: Dict[str, str] = {}
+        self._pending: Dict[str, Future] = {}
+        # campaigns asked to scan again while a scan was running, that result is stale before it lands
+        self._rescan: Set[str] = set()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._pool = ProcessPoolExecutor(max_workers=max_workers)
+
+    def campaign(self, name: str) -> Campaign:
+        for campaign in self.campaigns:
+            if campaign.name == name:
+                return campaign
+        raise KeyError(name)
+
+    def stats_for(self, name: str) -> DashboardStats:
+        # retained stats if we have them, otherwise an empty board with the right roster
+        stats = self.stats.get(name)
+        if stats is not None:
+            return stats
+        return build_dashboard([], self.campaign(name).characters)
+
+    def is_scanning(self, name: str) -> bool:
+        with self._lock:
+            return name in self._pending
+
+    def set_wordlists(self, wordlists: WordLists) -> None:
+        # scans already running were started with the old lists, they go again when they finish
+        with self._lock:
+            self.wordlists = wordlists
+            for name in self._pending:
+                self._rescan.add(name)
+
+    def replace_stats(self, name: str, old: DashboardStats, new: DashboardStats) -> None:
+        # a board patched on the ui thread, unless a scan landed meanwhile (that one is newer)
+        with self._lock:
+            if self.stats.get(name) is old:
+                self.stats[name] = new
+
+    def scan(self, name: str, on_ready: Callable[[str], None]) -> None:
+        # on_ready(name) gets called from a pool thread once the campaign is done (or failed)
+        with self._lock:
+            if name in self._pending:
+                # the running scan cant see whatever changed, scan again right after it instead of dropping this
+                self._rescan.add(name)
+                return
+            future = self._submit(name)
+        self._watch(name, future, on_ready)
+
+    def _submit(self, name: str) -> Future:
+        # caller holds the lock
+        campaign = self.campaign(name)
+        future = self._pool.submit(scan_campaign, campaign.folder, campaign.characters, self.cache_dir, self.wordlists)
+        self._pending[name] = future
+        return future
+
+    def _watch(self, name: str, future: Future, on_ready: Callable[[str], None]) -> None:
+        # added outside the lock, a future that's already done runs the callback right here
+        def done(fut: Future) -> None:
+            if fut.cancelled():
+                # shut down
+                return
+            try:
+                stats = fut.result()
+                error = None
+            except Exception as exc:  # a broken folder shouldnt take the other campaigns down
+                stats = None
+                error = str(exc)
+            # results go in under the lock too, pool threads finish at the same time
+            again = None
+            with self._lock:
+                self._pending.pop(name, None)
+                if name in self._rescan:
+                    self._rescan.discard(name)
+                    if not self._closed:
+                        # stale: keep the board we have and go again with the current settings
+                        again = self._submit(name)
+                elif stats is not None:
+                    self.stats[name] = stats
+                    self.errors.pop(name, None)
+                else:
+                    self.errors[name] = error
+            if again is not None:
+                self._watch(name, again, on_ready)
+                return
+            on_ready(name)
+
+        future.add_done_callback(done)
+
+    def scan_all(self, on_ready: Callable[[str], None]) -> None:
+        for campaign in self.campaigns:
+            self.scan(campaign.name, on_ready)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+        self._pool.shutdown(wait=False, cancel_futures=True)